@@ -1,40 +1,14 @@
-import json
-import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
     QTableWidget, QTableWidgetItem, QMessageBox, QTabWidget, QDesktopWidget, QHeaderView, QFrame
 )
 from PyQt5.QtCore import Qt
 from config import ARQUIVO_ACESSORIOS
-
-# Novo arquivo de configuração para o preço do KG (certifique-se que exista no config.py ou use o caminho abaixo)
-ARQUIVO_PRECO_KG = os.path.join(os.path.dirname(ARQUIVO_ACESSORIOS), "preco_aluminio.json")
-
-def carregar_acessorios():
-    if os.path.exists(ARQUIVO_ACESSORIOS):
-        try:
-            with open(ARQUIVO_ACESSORIOS, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return []
-    return []
-
-def salvar_acessorios(acessorios):
-    os.makedirs(os.path.dirname(ARQUIVO_ACESSORIOS), exist_ok=True)
-    with open(ARQUIVO_ACESSORIOS, "w", encoding="utf-8") as f:
-        json.dump(acessorios, f, indent=4, ensure_ascii=False)
-
-def carregar_preco_kg():
-    if os.path.exists(ARQUIVO_PRECO_KG):
-        try:
-            with open(ARQUIVO_PRECO_KG, "r", encoding="utf-8") as f:
-                return json.load(f).get("preco_kg", 0.0)
-        except: return 0.0
-    return 0.0
-
-def salvar_preco_kg(valor):
-    with open(ARQUIVO_PRECO_KG, "w", encoding="utf-8") as f:
-        json.dump({"preco_kg": valor}, f, indent=4)
+from catalogo import CodigoDuplicadoError
+from sessao import sessao
+from persistencia import ConflitoDeVersao
+from configuracoes import configuracao_preco
+from instrumentacao import medido
 
 class TelaAcessorios(QWidget):
     def __init__(self):
@@ -42,7 +16,10 @@ class TelaAcessorios(QWidget):
         self.setWindowTitle("Cadastro de Perfis e Itens")
         self.definir_resolucao()
 
-        self.acessorios = carregar_acessorios()
+        # Catálogo compartilhado com as outras telas (sessao.SessaoDados)
+        self.sessao = sessao()
+        self.catalogo = self.sessao.catalogo
+        self.acessorios = self.catalogo.itens
         self.acessorio_em_edicao = None
 
         self.layout_principal = QVBoxLayout()
@@ -65,6 +42,7 @@ class TelaAcessorios(QWidget):
 
         self.layout_principal.addWidget(self.abas)
         self.setLayout(self.layout_principal)
+        self.sessao.catalogo_alterado.connect(self.atualizar_tabela)
 
     def definir_resolucao(self):
         tela = QDesktopWidget().screenGeometry()
@@ -100,6 +78,17 @@ class TelaAcessorios(QWidget):
         self.aba_listagem.setLayout(layout)
         self.atualizar_tabela()
 
+    def gravar(self):
+        """Salva o catálogo (com merge das alterações de outras estações). Em conflito, recarrega."""
+        try:
+            self.sessao.salvar_catalogo()
+            return True
+        except ConflitoDeVersao as e:
+            QMessageBox.warning(self, "Conflito", f"{e}\nO catálogo foi recarregado; refaça a alteração.")
+            self.sessao.recarregar_catalogo()
+            return False
+
+    @medido("acessorios.atualizar_tabela", lambda self: {"linhas": len(self.acessorios)})
     def atualizar_tabela(self):
         self.tabela.setRowCount(0)
         for row, item in enumerate(self.acessorios):
@@ -139,11 +128,15 @@ class TelaAcessorios(QWidget):
             QMessageBox.warning(self, "Erro", "Peso inválido!")
             return
 
-        self.acessorios.append({"codigo": codigo, "nome": nome, "peso": peso})
-        salvar_acessorios(self.acessorios)
+        try:
+            self.catalogo.adicionar({"codigo": codigo, "nome": nome, "peso": peso})
+        except CodigoDuplicadoError as e:
+            QMessageBox.warning(self, "Erro", str(e))
+            return
+        if not self.gravar():
+            return
         QMessageBox.information(self, "Sucesso", "Item cadastrado com sucesso!")
         self.input_codigo.clear(); self.input_nome.clear(); self.input_peso.clear()
-        self.atualizar_tabela()
         self.abas.setCurrentWidget(self.aba_listagem)
 
     def inicializar_aba_preco_kg(self):
@@ -156,7 +149,7 @@ class TelaAcessorios(QWidget):
         
         f_layout.addWidget(QLabel("<b>Defina o valor atual do KG do Alumínio (R$):</b>"))
         self.input_global_kg = QLineEdit()
-        self.input_global_kg.setText(str(carregar_preco_kg()).replace('.', ','))
+        self.input_global_kg.setText(str(configuracao_preco().preco_kg).replace('.', ','))
         self.input_global_kg.setStyleSheet("font-size: 18px; padding: 10px;")
         f_layout.addWidget(self.input_global_kg)
         
@@ -172,7 +165,7 @@ class TelaAcessorios(QWidget):
     def atualizar_preco_kg_global(self):
         try:
             novo_preco = float(self.input_global_kg.text().replace(',', '.'))
-            salvar_preco_kg(novo_preco)
+            configuracao_preco().definir(novo_preco)
             QMessageBox.information(self, "Sucesso", f"Preço do alumínio atualizado para R$ {novo_preco:.2f}/kg")
         except:
             QMessageBox.warning(self, "Erro", "Digite um valor numérico válido!")
@@ -216,20 +209,25 @@ class TelaAcessorios(QWidget):
     def salvar_edicao(self):
         try:
             p = float(self.edit_peso.text().replace(',', '.'))
-            self.acessorios[self.acessorio_em_edicao] = {
-                "codigo": self.edit_codigo.text(),
+        except:
+            QMessageBox.warning(self, "Erro", "Peso inválido!")
+            return
+        try:
+            self.catalogo.atualizar(self.acessorio_em_edicao, {
+                "codigo": self.edit_codigo.text().strip(),
                 "nome": self.edit_nome.text(),
                 "peso": p
-            }
-            salvar_acessorios(self.acessorios)
-            self.atualizar_tabela()
-            self.abas.removeTab(self.abas.indexOf(self.aba_edicao))
-            QMessageBox.information(self, "Sucesso", "Item atualizado!")
-        except: QMessageBox.warning(self, "Erro", "Peso inválido!")
+            })
+        except CodigoDuplicadoError as e:
+            QMessageBox.warning(self, "Erro", str(e))
+            return
+        if not self.gravar():
+            return
+        self.abas.removeTab(self.abas.indexOf(self.aba_edicao))
+        QMessageBox.information(self, "Sucesso", "Item atualizado!")
 
     def excluir_acessorio(self):
         row = self.tabela.currentRow()
         if row >= 0 and QMessageBox.question(self, "Excluir", "Deseja excluir?") == QMessageBox.Yes:
-            self.acessorios.pop(row)
-            salvar_acessorios(self.acessorios)
-            self.atualizar_tabela()
+            self.catalogo.remover(row)
+            self.gravar()
@@ -0,0 +1,296 @@
+"""
+Análise de vendas sobre as linhas (itens) dos pedidos, em colunas NumPy.
+
+Cada item de pedido vira uma linha de TabelaVendas: código do perfil, qtd, peso total,
+subtotal, preço do kg na época, mês/dia e cliente/cidade (códigos inteiros de um
+dicionário). Os totais por mês, cliente, perfil e cidade ficam materializados por ano
+(12 meses x categorias x métricas) e são corrigidos a cada pedido salvo, então comparar
+um ano com o anterior só soma alguns vetores, independente do número de linhas.
+Consultas com outro recorte de datas agrupam as colunas direto (np.bincount).
+"""
+from datetime import date
+
+import numpy as np
+
+from busca import nome_cliente
+from carteira import chave_documento
+from instrumentacao import medido
+
+METRICAS = ("peso_total", "subtotal", "qtd")
+DIMENSOES = ("mes", "cliente", "perfil", "cidade")
+CAPACIDADE_INICIAL = 4096
+SEM_CIDADE = "(sem cidade)"
+
+_COLUNAS = {"mes": np.int32, "dia": np.int32, "cliente": np.int32, "perfil": np.int32, "cidade": np.int32,
+            "qtd": np.float64, "peso_total": np.float64, "subtotal": np.float64,
+            "preco_kg_na_epoca": np.float64, "ativo": np.bool_}
+
+
+def _data(texto):
+    """date de um dd/mm/aaaa (None se inválida)."""
+    try:
+        dia, mes, ano = (int(x) for x in str(texto).split("/"))
+        return date(ano, mes, dia)
+    except ValueError:
+        return None
+
+
+def _numero(valor):
+    try:
+        return float(valor or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class Dicionario:
+    """Códigos inteiros (0, 1, 2...) para os valores de uma coluna de texto."""
+
+    def __init__(self):
+        self.rotulos = []
+        self._codigos = {}
+
+    def codigo(self, chave, rotulo=None):
+        codigo = self._codigos.get(chave)
+        if codigo is None:
+            codigo = self._codigos[chave] = len(self.rotulos)
+            self.rotulos.append(chave if rotulo is None else rotulo)
+        return codigo
+
+    def __len__(self):
+        return len(self.rotulos)
+
+
+class TabelaVendas:
+    """
+    Linhas de todos os pedidos em colunas NumPy, com os totais materializados.
+    - adicionar/substituir/remover mexem só nas linhas do pedido e corrigem os totais;
+    - as linhas de um pedido ficam juntas; as removidas só saem da tabela (ativo=False)
+      quando passam da metade, numa compactação;
+    - comparar_anos lê os totais; agrupar varre as colunas com um filtro de datas.
+    """
+
+    def __init__(self, ids_clientes=None):
+        self.n = 0
+        # Pedidos gravados antes do id gerado do cliente têm a chave antiga (CPF/CNPJ ou nome)
+        # no lugar do id: {chave antiga: id} junta esses pedidos com os novos do mesmo cliente
+        self.ids_clientes = ids_clientes or {}
+        self._colunas = {nome: np.zeros(CAPACIDADE_INICIAL, tipo) for nome, tipo in _COLUNAS.items()}
+        self.dicionarios = {"cliente": Dicionario(), "perfil": Dicionario(), "cidade": Dicionario()}
+        self._faixas = {}      # id do pedido -> (início, fim, rev) das linhas dele
+        self._removidas = 0
+        self._agregados = {dimensao: {} for dimensao in DIMENSOES}  # dimensão -> ano -> (12, categorias, métricas)
+
+    def __len__(self):
+        """Linhas ativas."""
+        return self.n - self._removidas
+
+    def __getitem__(self, nome):
+        """Coluna (só as linhas em uso, ativas ou não)."""
+        return self._colunas[nome][:self.n]
+
+    def pedidos(self):
+        return len(self._faixas)
+
+    # --- Carga ---
+    def _linhas(self, pedido, itens):
+        """Colunas (listas) das linhas de um pedido; pedido sem data válida não entra."""
+        quando = _data(pedido.get("data", ""))
+        if quando is None or not itens:
+            return None
+        cliente = pedido.get("cliente")
+        cliente = cliente if isinstance(cliente, dict) else {"nome": str(cliente or "")}
+        nome = nome_cliente(pedido)
+        id_cliente = cliente.get("id") or chave_documento(cliente) or nome
+        cod_cliente = self.dicionarios["cliente"].codigo(self.ids_clientes.get(id_cliente, id_cliente), nome)
+        cidade = cliente.get("cidade", "").strip()
+        cidade = f"{cidade}/{cliente['estado']}" if cidade and cliente.get("estado") else cidade or SEM_CIDADE
+        cod_cidade = self.dicionarios["cidade"].codigo(cidade.upper())
+        perfis = self.dicionarios["perfil"]
+        quantos = len(itens)
+        return {"mes": [quando.year * 12 + quando.month - 1] * quantos,
+                "dia": [quando.toordinal()] * quantos,
+                "cliente": [cod_cliente] * quantos,
+                "cidade": [cod_cidade] * quantos,
+                "perfil": [perfis.codigo(str(i.get("codigo", "")), f"{i.get('codigo', '')} — {i.get('nome', '')}")
+                           for i in itens],
+                "qtd": [_numero(i.get("qtd")) for i in itens],
+                "peso_total": [_numero(i.get("peso_total")) for i in itens],
+                "subtotal": [_numero(i.get("subtotal")) for i in itens],
+                "preco_kg_na_epoca": [_numero(i.get("preco_kg_na_epoca")) for i in itens]}
+
+    def _acrescentar(self, colunas, quantos):
+        """Acrescenta `quantos` linhas ({coluna: lista}) e soma nos totais. Devolve (início, fim)."""
+        inicio, fim = self.n, self.n + quantos
+        capacidade = len(self._colunas["mes"])
+        if fim > capacidade:
+            while capacidade < fim:
+                capacidade *= 2
+            for nome, coluna in self._colunas.items():
+                nova = np.zeros(capacidade, coluna.dtype)
+                nova[:self.n] = coluna[:self.n]
+                self._colunas[nome] = nova
+        for nome, valores in colunas.items():
+            self._colunas[nome][inicio:fim] = valores
+        self._colunas["ativo"][inicio:fim] = True
+        self.n = fim
+        self._somar(slice(inicio, fim), 1)
+        return inicio, fim
+
+    @medido("analise.carregar", lambda self, pares, *a, **k: {})
+    def carregar(self, pares, ao_progresso=None, total=None):
+        """Monta a tabela de uma vez a partir de (pedido, itens), como os de
+        ArmazemPedidos.itens_em_lote. Pode rodar fora da thread da interface."""
+        colunas = {nome: [] for nome in _COLUNAS if nome != "ativo"}
+        faixas, inicio = {}, self.n
+        for n, (pedido, itens) in enumerate(pares, 1):
+            linhas = self._linhas(pedido, itens)
+            if linhas is not None:
+                quantos = len(itens)
+                for nome, valores in linhas.items():
+                    colunas[nome].extend(valores)
+                faixas[pedido["id"]] = (inicio, inicio + quantos, pedido.get("rev", 0))
+                inicio += quantos
+            if ao_progresso and total and n % 5000 == 0:
+                ao_progresso(int(n * 100 / total))
+        self._acrescentar(colunas, inicio - self.n)
+        self._faixas.update(faixas)
+        return self
+
+    # --- Atualização (pedido salvo/excluído) ---
+    def remover(self, id_pedido):
+        faixa = self._faixas.pop(id_pedido, None)
+        if faixa is None:
+            return
+        linhas = slice(faixa[0], faixa[1])
+        self._somar(linhas, -1)
+        self._colunas["ativo"][linhas] = False
+        self._removidas += faixa[1] - faixa[0]
+        if self._removidas > self.n // 2:
+            self._compactar()
+
+    def substituir(self, pedido, itens):
+        """Troca as linhas do pedido (novo ou alterado); a mesma revisão não é refeita."""
+        faixa = self._faixas.get(pedido["id"])
+        if faixa is not None and faixa[2] == pedido.get("rev", 0):
+            return
+        self.remover(pedido["id"])
+        linhas = self._linhas(pedido, itens)
+        if linhas is not None:
+            inicio, fim = self._acrescentar(linhas, len(itens))
+            self._faixas[pedido["id"]] = (inicio, fim, pedido.get("rev", 0))
+
+    def _compactar(self):
+        ativo = self._colunas["ativo"][:self.n]
+        novo_indice = np.cumsum(ativo) - 1
+        for nome, coluna in self._colunas.items():
+            mantidas = coluna[:self.n][ativo]
+            coluna[:len(mantidas)] = mantidas
+        self._faixas = {i: (int(novo_indice[a]), int(novo_indice[a]) + (b - a), rev)
+                        for i, (a, b, rev) in self._faixas.items()}
+        self.n -= self._removidas
+        self._removidas = 0
+
+    # --- Totais materializados ---
+    def _agregado(self, dimensao, ano):
+        """Totais do ano (12, categorias, métricas), aumentados se o dicionário cresceu."""
+        categorias = 1 if dimensao == "mes" else max(len(self.dicionarios[dimensao]), 1)
+        atual = self._agregados[dimensao].get(ano)
+        if atual is None or atual.shape[1] < categorias:
+            novo = np.zeros((12, max(categorias, 2 * (0 if atual is None else atual.shape[1])), len(METRICAS)))
+            if atual is not None:
+                novo[:, :atual.shape[1]] = atual
+            atual = self._agregados[dimensao][ano] = novo
+        return atual
+
+    def _somar(self, linhas, sinal):
+        mes = self._colunas["mes"][linhas]
+        if not len(mes):
+            return
+        valores = np.stack([self._colunas[m][linhas] for m in METRICAS], axis=1) * sinal
+        anos = mes // 12
+        for ano in np.unique(anos):
+            selecao = anos == ano
+            meses = mes[selecao] % 12
+            for dimensao in DIMENSOES:
+                categorias = 0 if dimensao == "mes" else self._colunas[dimensao][linhas][selecao]
+                np.add.at(self._agregado(dimensao, int(ano)), (meses, categorias), valores[selecao])
+
+    # --- Consultas ---
+    def anos(self):
+        return sorted(a for a, t in self._agregados["mes"].items() if t.any())
+
+    def total_ano(self, ano, ate_mes=12, dimensao="mes"):
+        """(categorias, métricas) somados de janeiro até `ate_mes` do ano (zeros sem dados)."""
+        if ano not in self._agregados[dimensao]:
+            categorias = 1 if dimensao == "mes" else len(self.dicionarios[dimensao])
+            return np.zeros((categorias, len(METRICAS)))
+        return self._agregado(dimensao, ano)[:ate_mes].sum(axis=0)
+
+    @medido("analise.comparar_anos", lambda self, dimensao, ano, *a, **k: {"dimensao": dimensao, "ano": ano})
+    def comparar_anos(self, dimensao, ano, metrica="peso_total", ate_mes=12):
+        """
+        Ano contra o anterior (janeiro até `ate_mes` nos dois), pelos totais materializados.
+        Linhas {"rotulo", "anterior", "atual", "variacao"} (variação em %, None sem base),
+        por mês (na ordem) ou por categoria (do maior para o menor no ano).
+        """
+        m = METRICAS.index(metrica)
+        if dimensao == "mes":
+            atual = self._agregado("mes", ano)[:ate_mes, 0, m] if ano in self._agregados["mes"] else np.zeros(ate_mes)
+            anterior = (self._agregado("mes", ano - 1)[:ate_mes, 0, m] if ano - 1 in self._agregados["mes"]
+                        else np.zeros(ate_mes))
+            rotulos = [f"{mes:02d}" for mes in range(1, ate_mes + 1)]
+            ordem = np.arange(ate_mes)
+        else:
+            quantas = len(self.dicionarios[dimensao])
+            atual = self.total_ano(ano, ate_mes, dimensao)[:quantas, m]
+            anterior = self.total_ano(ano - 1, ate_mes, dimensao)[:quantas, m]
+            if len(atual) < quantas:
+                atual = np.pad(atual, (0, quantas - len(atual)))
+            if len(anterior) < quantas:
+                anterior = np.pad(anterior, (0, quantas - len(anterior)))
+            rotulos = self.dicionarios[dimensao].rotulos
+            ordem = np.lexsort((-anterior, -atual))
+            ordem = ordem[(np.abs(atual[ordem]) > 1e-9) | (np.abs(anterior[ordem]) > 1e-9)]
+        return self._linhas_relatorio(rotulos, anterior, atual, ordem)
+
+    @staticmethod
+    def _linhas_relatorio(rotulos, anterior, atual, ordem):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variacao = np.where(np.abs(anterior) > 1e-9, (atual - anterior) * 100 / anterior, np.nan)
+        return [{"rotulo": rotulos[i], "anterior": float(anterior[i]), "atual": float(atual[i]),
+                 "variacao": None if np.isnan(variacao[i]) else float(variacao[i])} for i in ordem]
+
+    @medido("analise.agrupar", lambda self, dimensao, *a, **k: {"dimensao": dimensao})
+    def agrupar(self, dimensao, de=None, ate=None, metrica="peso_total"):
+        """
+        Totais por dimensão entre as datas `de` e `ate` (date, inclusive), varrendo as colunas.
+        Devolve [(rótulo, valor)] do maior para o menor (por mês: na ordem dos meses, "aaaa-mm").
+        """
+        filtro = self["ativo"].copy()
+        if de is not None:
+            filtro &= self["dia"] >= de.toordinal()
+        if ate is not None:
+            filtro &= self["dia"] <= ate.toordinal()
+        valores = self[metrica][filtro]
+        if dimensao == "mes":
+            meses = self["mes"][filtro]
+            if not len(meses):
+                return []
+            primeiro = int(meses.min())
+            totais = np.bincount(meses - primeiro, weights=valores)
+            return [(f"{(primeiro + i) // 12:04d}-{(primeiro + i) % 12 + 1:02d}", float(v))
+                    for i, v in enumerate(totais) if v]
+        totais = np.bincount(self[dimensao][filtro], weights=valores, minlength=len(self.dicionarios[dimensao]))
+        ordem = np.argsort(-totais, kind="stable")
+        rotulos = self.dicionarios[dimensao].rotulos
+        return [(rotulos[i], float(totais[i])) for i in ordem if totais[i]]
+
+
+def montar_tabela(armazem, abertos, ao_progresso=None, ids_clientes=None):
+    """
+    TabelaVendas com os pedidos `abertos` (cópias tiradas na thread da interface) e os dos
+    meses fechados. Roda fora da thread da interface: os itens vêm de itens_em_lote.
+    `ids_clientes`: carteira.ids_por_chave_antiga(), para os pedidos antigos.
+    """
+    pedidos = armazem.pedidos_fechados() + abertos
+    return TabelaVendas(ids_clientes).carregar(armazem.itens_em_lote(pedidos), ao_progresso, len(pedidos))
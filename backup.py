@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timedelta
+
+from config import (ARQUIVOS_SISTEMA, ARQUIVO_PRECO_KG, ARQUIVO_BANCO, ARQUIVO_PEDIDOS, BACKEND,
+                    RETENCAO_DIARIOS, RETENCAO_SEMANAIS, RETENCAO_MENSAIS)
+from persistencia import arquivos_com_diario, carregar_json, ArquivoCorrompidoError
+from instrumentacao import medido
+
+# Blocos definidos pelo conteúdo: o corte acontece depois de uma quebra de linha ou
+# de um "}," (fim de um registro no JSON compacto) cujo hash cai na máscara.
+# Uma alteração no meio do arquivo só muda os blocos ao redor dela.
+BLOCO_MIN = 16 * 1024
+BLOCO_MAX = 1024 * 1024
+_MASCARA_CORTE = 0x1FF          # ~1 corte a cada 512 candidatos (~64 KB por bloco)
+_CANDIDATOS = re.compile(rb"\n|\},")
+_JANELA = 48
+
+FORMATO_GERACAO = "%Y%m%d_%H%M%S"
+PROTECAO_BLOCO_NOVO = 3600  # segundos
+
+
+class BackupError(Exception):
+    """Falha ao gravar ou ler uma geração de backup."""
+
+
+def dividir_em_blocos(dados):
+    """Divide bytes em blocos de tamanho variável, estáveis a inserções e remoções."""
+    blocos = []
+    inicio, total = 0, len(dados)
+    while total - inicio > BLOCO_MIN:
+        corte = None
+        limite = min(inicio + BLOCO_MAX, total)
+        m = _CANDIDATOS.search(dados, inicio + BLOCO_MIN, limite)
+        while m:
+            fim = m.end()
+            if zlib.crc32(dados[fim - _JANELA:fim]) & _MASCARA_CORTE == 0:
+                corte = fim
+                break
+            m = _CANDIDATOS.search(dados, fim, limite)
+        if corte is None:
+            if limite == total:
+                break
+            corte = limite
+        blocos.append(dados[inicio:corte])
+        inicio = corte
+    if inicio < total or not blocos:
+        blocos.append(dados[inicio:])
+    return blocos
+
+
+def _meses_atras(data, meses):
+    """Primeiro dia do mês `meses` antes de `data`."""
+    indice = data.year * 12 + data.month - 1 - meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _gravar_atomico(caminho, dados):
+    temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(temporario, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+# ==============================
+# Repositório de backups
+# ==============================
+class RepositorioBackup:
+    """
+    Backups por conteúdo numa pasta:
+      blocos/<aa>/<sha256>  -> bloco comprimido (zlib); cada bloco é gravado uma única vez
+      geracoes/<data>.json  -> manifesto: arquivos, tamanhos, sha256 e lista de blocos
+    Uma geração nova só grava os blocos que ainda não existem: dados que não mudaram
+    não ocupam espaço outra vez.
+    """
+
+    def __init__(self, pasta):
+        self.pasta = str(pasta)
+        self.pasta_blocos = os.path.join(self.pasta, "blocos")
+        self.pasta_geracoes = os.path.join(self.pasta, "geracoes")
+
+    @staticmethod
+    def eh_repositorio(pasta):
+        return os.path.isdir(os.path.join(str(pasta), "geracoes"))
+
+    def _caminho_bloco(self, hash_bloco):
+        return os.path.join(self.pasta_blocos, hash_bloco[:2], hash_bloco)
+
+    # --- Gravação ---
+    def _guardar_bloco(self, bloco):
+        """Grava o bloco se ainda não existir. Retorna (hash, bytes gravados)."""
+        hash_bloco = hashlib.sha256(bloco).hexdigest()
+        caminho = self._caminho_bloco(hash_bloco)
+        if os.path.exists(caminho):
+            return hash_bloco, 0
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        comprimido = zlib.compress(bloco, 6)
+        _gravar_atomico(caminho, comprimido)
+        return hash_bloco, len(comprimido)
+
+    def criar_geracao(self, arquivos, quando=None, ao_progresso=None, conhecidos=None):
+        """
+        Cria uma geração com os arquivos {nome: caminho}. Arquivos que sumiram no meio
+        (compactação do diário, por exemplo) são ignorados.
+        `conhecidos` ({nome: sha256}) são arquivos que não mudam depois de gravados (meses
+        fechados): se a geração anterior tem o mesmo nome com o mesmo sha256, a entrada dela
+        é reaproveitada sem ler o arquivo.
+        Retorna {"geracao", "arquivos", "bytes_lidos", "bytes_novos", "blocos_novos", "reaproveitados"}.
+        """
+        quando = quando or datetime.now()
+        os.makedirs(self.pasta_geracoes, exist_ok=True)
+        manifesto = {"criado": quando.isoformat(timespec="seconds"), "arquivos": {}}
+        resumo = {"arquivos": 0, "bytes_lidos": 0, "bytes_novos": 0, "blocos_novos": 0, "reaproveitados": 0}
+        anteriores = {}
+        if conhecidos and self.geracoes():
+            try:
+                anteriores = self.ler_manifesto(self.geracoes()[-1])["arquivos"]
+            except BackupError:
+                pass  # manifesto anterior ilegível: lê tudo de novo
+        for n, (nome, caminho) in enumerate(sorted(arquivos.items()), 1):
+            anterior = anteriores.get(nome)
+            if anterior is not None and conhecidos.get(nome) == anterior.get("sha256") and os.path.exists(caminho):
+                manifesto["arquivos"][nome] = anterior
+                resumo["arquivos"] += 1
+                resumo["reaproveitados"] += 1
+                if ao_progresso:
+                    ao_progresso(int(n * 100 / len(arquivos)))
+                continue
+            try:
+                with open(caminho, "rb") as f:
+                    dados = f.read()
+            except FileNotFoundError:
+                continue
+            hashes = []
+            for bloco in dividir_em_blocos(dados):
+                hash_bloco, gravados = self._guardar_bloco(bloco)
+                hashes.append(hash_bloco)
+                if gravados:
+                    resumo["bytes_novos"] += gravados
+                    resumo["blocos_novos"] += 1
+            manifesto["arquivos"][nome] = {"tamanho": len(dados),
+                                           "sha256": hashlib.sha256(dados).hexdigest(),
+                                           "blocos": hashes}
+            resumo["arquivos"] += 1
+            resumo["bytes_lidos"] += len(dados)
+            if ao_progresso:
+                ao_progresso(int(n * 100 / len(arquivos)))
+
+        nome_geracao = quando.strftime(FORMATO_GERACAO)
+        sufixo = 1
+        while os.path.exists(os.path.join(self.pasta_geracoes, nome_geracao + ".json")):
+            sufixo += 1
+            nome_geracao = f"{quando.strftime(FORMATO_GERACAO)}_{sufixo}"
+        # O manifesto é gravado por último: geração só existe com todos os blocos no disco
+        _gravar_atomico(os.path.join(self.pasta_geracoes, nome_geracao + ".json"),
+                        json.dumps(manifesto, ensure_ascii=False).encode("utf-8"))
+        resumo["geracao"] = nome_geracao
+        return resumo
+
+    # --- Leitura ---
+    def geracoes(self):
+        """Nomes das gerações, da mais antiga para a mais nova."""
+        if not os.path.isdir(self.pasta_geracoes):
+            return []
+        return sorted(n[:-5] for n in os.listdir(self.pasta_geracoes) if n.endswith(".json"))
+
+    def ler_manifesto(self, geracao):
+        try:
+            with open(os.path.join(self.pasta_geracoes, geracao + ".json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise BackupError(f"Manifesto da geração {geracao} ilegível: {e}") from e
+
+    def ler_arquivo(self, entrada):
+        """Remonta um arquivo do manifesto, conferindo o sha256 de cada bloco e do todo."""
+        partes = []
+        for hash_bloco in entrada["blocos"]:
+            try:
+                with open(self._caminho_bloco(hash_bloco), "rb") as f:
+                    bloco = zlib.decompress(f.read())
+            except (OSError, zlib.error) as e:
+                raise BackupError(f"Bloco {hash_bloco[:12]} ausente ou danificado: {e}") from e
+            if hashlib.sha256(bloco).hexdigest() != hash_bloco:
+                raise BackupError(f"Bloco {hash_bloco[:12]} não confere com o hash.")
+            partes.append(bloco)
+        dados = b"".join(partes)
+        if len(dados) != entrada["tamanho"] or hashlib.sha256(dados).hexdigest() != entrada["sha256"]:
+            raise BackupError("Arquivo remontado não confere com o manifesto.")
+        return dados
+
+    def extrair(self, geracao, pasta_destino):
+        """Remonta todos os arquivos da geração em pasta_destino."""
+        os.makedirs(pasta_destino, exist_ok=True)
+        for nome, entrada in self.ler_manifesto(geracao)["arquivos"].items():
+            with open(os.path.join(pasta_destino, nome), "wb") as f:
+                f.write(self.ler_arquivo(entrada))
+
+    # --- Retenção ---
+    def aplicar_retencao(self, diarios=RETENCAO_DIARIOS, semanais=RETENCAO_SEMANAIS,
+                         mensais=RETENCAO_MENSAIS, hoje=None):
+        """
+        Avô-pai-filho: mantém a geração mais nova de cada um dos últimos `diarios` dias,
+        `semanais` semanas e `mensais` meses. Remove o resto e os blocos órfãos.
+        Retorna as gerações removidas.
+        """
+        hoje = (hoje or datetime.now()).date()
+        datas = {}
+        for g in self.geracoes():
+            try:
+                datas[g] = datetime.strptime(g[:15], FORMATO_GERACAO).date()
+            except ValueError:
+                continue
+
+        niveis = (
+            (diarios, lambda d: d, lambda i: hoje - timedelta(days=i)),
+            (semanais, lambda d: tuple(d.isocalendar()[:2]), lambda i: hoje - timedelta(weeks=i)),
+            (mensais, lambda d: (d.year, d.month), lambda i: _meses_atras(hoje, i)),
+        )
+        manter = set()
+        for quantidade, chave, recuar in niveis:
+            validos = {chave(recuar(i)) for i in range(max(quantidade, 0))}
+            mais_nova = {}
+            for g, d in datas.items():
+                k = chave(d)
+                if k in validos and (k not in mais_nova or g > mais_nova[k]):
+                    mais_nova[k] = g
+            manter.update(mais_nova.values())
+        if datas:
+            manter.add(max(datas))  # a última geração nunca é removida
+
+        removidas = [g for g in datas if g not in manter]
+        for g in removidas:
+            os.remove(os.path.join(self.pasta_geracoes, g + ".json"))
+        if removidas:
+            self.coletar_blocos_orfaos()
+        return removidas
+
+    def coletar_blocos_orfaos(self):
+        """Apaga os blocos que nenhuma geração usa mais. Retorna quantos foram apagados."""
+        usados = set()
+        for g in self.geracoes():
+            for entrada in self.ler_manifesto(g)["arquivos"].values():
+                usados.update(entrada["blocos"])
+        apagados = 0
+        if not os.path.isdir(self.pasta_blocos):
+            return 0
+        for prefixo in os.listdir(self.pasta_blocos):
+            pasta = os.path.join(self.pasta_blocos, prefixo)
+            for nome in os.listdir(pasta):
+                caminho = os.path.join(pasta, nome)
+                # Blocos recentes podem ser de uma geração ainda sendo gravada (manifesto vem por último)
+                if nome not in usados and time.time() - os.path.getmtime(caminho) > PROTECAO_BLOCO_NOVO:
+                    os.remove(caminho)
+                    apagados += 1
+        return apagados
+
+    def tamanho_em_disco(self):
+        total = 0
+        for raiz, _, arquivos in os.walk(self.pasta):
+            total += sum(os.path.getsize(os.path.join(raiz, a)) for a in arquivos)
+        return total
+
+
+# ==============================
+# Backup dos dados do sistema
+# ==============================
+def arquivos_para_backup():
+    """{nome no backup: caminho} com os arquivos de dados atuais (JSON, diários e preço)."""
+    arquivos = {}
+    for arquivo in list(ARQUIVOS_SISTEMA) + [ARQUIVO_PRECO_KG]:
+        for caminho in arquivos_com_diario(arquivo):
+            if os.path.exists(caminho):
+                arquivos[os.path.basename(caminho)] = caminho
+    return arquivos
+
+
+@medido("backup.fazer_backup")
+def fazer_backup(pasta, ao_progresso=None, retencao=True):
+    """
+    Cria uma geração com os dados atuais no repositório `pasta` e aplica a retenção.
+    Pode rodar fora da thread da interface: o banco SQLite é copiado por uma conexão própria.
+    """
+    repo = RepositorioBackup(pasta)
+    arquivos = arquivos_para_backup()
+    # Meses fechados não mudam: o sha256 do manifesto deles dispensa relê-los
+    try:
+        periodos = carregar_json(f"{ARQUIVO_PEDIDOS}.periodos") if BACKEND != "sqlite" else []
+    except ArquivoCorrompidoError:
+        periodos = []
+    conhecidos = {e["arquivo"]: e["sha256"] for e in periodos}
+    temporaria = None
+    try:
+        if BACKEND == "sqlite" and os.path.exists(ARQUIVO_BANCO):
+            temporaria = tempfile.mkdtemp(prefix="perfibras_backup_")
+            copia = os.path.join(temporaria, "perfibras.db")
+            fonte, destino = sqlite3.connect(str(ARQUIVO_BANCO)), sqlite3.connect(copia)
+            with destino:
+                fonte.backup(destino)
+            fonte.close(); destino.close()
+            arquivos["perfibras.db"] = copia
+        resumo = repo.criar_geracao(arquivos, ao_progresso=ao_progresso, conhecidos=conhecidos)
+    finally:
+        if temporaria:
+            shutil.rmtree(temporaria, ignore_errors=True)
+    resumo["removidas"] = repo.aplicar_retencao() if retencao else []
+    return resumo
@@ -0,0 +1,572 @@
+import itertools
+import json
+import os
+import re
+import sqlite3
+import uuid
+
+from persistencia import ArquivoVersionado, ConflitoDeVersao, CacheItens, PRIMEIRO_NUMERO, chave_numero
+from config import ARQUIVO_BANCO, ARQUIVO_CLIENTES, ARQUIVO_ACESSORIOS, ARQUIVO_PEDIDOS
+
+CAMPOS_CLIENTE = ["nome", "cpf_cnpj", "email", "telefone", "endereco", "numero", "bairro", "cidade", "estado", "ie"]
+CAMPOS_ITEM = ["codigo", "nome", "peso_unit", "qtd", "peso_total", "subtotal", "preco_kg_na_epoca"]
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY,
+    uid TEXT,                            -- id gerado do cliente (carteira.novo_id_cliente)
+    nome TEXT NOT NULL DEFAULT '',
+    cpf_cnpj TEXT NOT NULL DEFAULT '',
+    documento TEXT NOT NULL DEFAULT '',  -- CPF/CNPJ só com dígitos
+    email TEXT, telefone TEXT, endereco TEXT, numero TEXT,
+    bairro TEXT, cidade TEXT, estado TEXT, ie TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_clientes_documento ON clientes(documento);
+CREATE INDEX IF NOT EXISTS ix_clientes_nome ON clientes(nome COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS acessorios (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT NOT NULL,
+    codigo_normalizado TEXT NOT NULL UNIQUE,
+    nome TEXT NOT NULL DEFAULT '',
+    peso REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_acessorios_nome ON acessorios(nome COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id TEXT PRIMARY KEY,
+    numero INTEGER,
+    data TEXT,                -- dd/mm/aaaa, como exibido
+    data_iso TEXT,            -- aaaa-mm-dd
+    cliente_nome TEXT,
+    cliente_documento TEXT,
+    cliente_json TEXT,
+    total REAL NOT NULL DEFAULT 0,
+    posicao INTEGER NOT NULL, -- ordem de cadastro
+    rev INTEGER NOT NULL DEFAULT 0  -- revisão, para a concorrência otimista
+);
+CREATE INDEX IF NOT EXISTS ix_pedidos_numero ON pedidos(numero);
+CREATE INDEX IF NOT EXISTS ix_pedidos_posicao ON pedidos(posicao);
+-- Histórico filtrado por data, mês ou CPF/CNPJ (Banco.filtrar_pedidos); o resto da busca
+-- e os relatórios rodam na memória (busca.py, analise.py)
+CREATE INDEX IF NOT EXISTS ix_pedidos_data ON pedidos(data_iso);
+CREATE INDEX IF NOT EXISTS ix_pedidos_cliente_documento ON pedidos(cliente_documento);
+DROP INDEX IF EXISTS ix_pedidos_cliente_nome;
+
+CREATE TABLE IF NOT EXISTS itens_pedido (
+    pedido_id TEXT NOT NULL REFERENCES pedidos(id) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    codigo TEXT, nome TEXT,
+    peso_unit REAL, qtd REAL, peso_total REAL, subtotal REAL, preco_kg_na_epoca REAL,
+    PRIMARY KEY (pedido_id, posicao)
+);
+DROP INDEX IF EXISTS ix_itens_codigo;
+"""
+
+
+_DATA = re.compile(r"\d{1,2}/\d{1,2}/\d{4}")
+_MES = re.compile(r"(\d{1,2})/(\d{4})")
+_DOCUMENTO = re.compile(r"[\d./ -]+")  # CPF/CNPJ digitado, com ou sem pontuação
+
+
+def _digitos(texto):
+    return "".join(ch for ch in str(texto or "") if ch.isdigit())
+
+
+def data_iso(data):
+    """'05/10/2026' -> '2026-10-05' (texto fora do padrão vira '')."""
+    partes = str(data or "").split("/")
+    if len(partes) != 3:
+        return ""
+    dia, mes, ano = partes
+    return f"{ano}-{mes.zfill(2)}-{dia.zfill(2)}"
+
+
+def _normalizar_codigo(codigo):
+    return str(codigo).strip().upper()
+
+
+# ==============================
+# Banco SQLite
+# ==============================
+class Banco:
+    """Banco único (WAL) com clientes, catálogo, pedidos e itens dos pedidos."""
+
+    def __init__(self, caminho=ARQUIVO_BANCO):
+        self.caminho = str(caminho)
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        self.con = sqlite3.connect(self.caminho)
+        self.con.row_factory = sqlite3.Row
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA foreign_keys=ON")
+        self.con.executescript(ESQUEMA)
+        colunas = {l["name"] for l in self.con.execute("PRAGMA table_info(pedidos)")}
+        if "rev" not in colunas:
+            self.con.execute("ALTER TABLE pedidos ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+        if "uid" not in {l["name"] for l in self.con.execute("PRAGMA table_info(clientes)")}:
+            self.con.execute("ALTER TABLE clientes ADD COLUMN uid TEXT")
+        if self._meta("migracao_json") is None:
+            self.migrar_json()
+        if self._meta("referencia_cliente") is None:
+            self.migrar_referencias()
+        with self.con:
+            # Sequência dos números de pedido: começa no maior número já gravado
+            self.con.execute("INSERT OR IGNORE INTO meta VALUES ('ultimo_numero', "
+                             "(SELECT COALESCE(MAX(numero), ?) FROM pedidos))", (PRIMEIRO_NUMERO - 1,))
+
+    def _meta(self, chave):
+        linha = self.con.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return linha["valor"] if linha else None
+
+    def fechar(self):
+        self.con.close()
+
+    def copiar_para(self, destino):
+        """Cópia consistente do banco (API de backup do SQLite), mesmo com o programa aberto."""
+        copia = sqlite3.connect(str(destino))
+        with copia:
+            self.con.backup(copia)
+        copia.close()
+
+    def restaurar_de(self, origem):
+        """Substitui o conteúdo do banco pelo de uma cópia feita com copiar_para.
+        A sequência dos números de pedido e as versões das listas não voltam com a cópia."""
+        ultimo = self.ultimo_numero()
+        versoes = dict(self.con.execute("SELECT chave, valor FROM meta WHERE chave LIKE 'versao_%'").fetchall())
+        fonte = sqlite3.connect(str(origem))
+        fonte.backup(self.con)
+        fonte.close()
+        with self.con:
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('ultimo_numero', "
+                             "MAX(?, (SELECT COALESCE(MAX(numero), 0) FROM pedidos)))", (ultimo,))
+            # Listas trocadas por fora: a versão avança para as janelas abertas fazerem merge
+            for chave, valor in versoes.items():
+                self.con.execute("INSERT OR REPLACE INTO meta VALUES (?, MAX(CAST(? AS INTEGER), "
+                                 "COALESCE((SELECT CAST(valor AS INTEGER) FROM meta WHERE chave = ?), 0)) + 1)",
+                                 (chave, valor, chave))
+
+    def ultimo_numero(self):
+        return chave_numero(self._meta("ultimo_numero")) or PRIMEIRO_NUMERO - 1
+
+    def _tirar_numero(self):
+        """Próximo número de pedido. Chamar dentro da transação que grava o pedido: o UPDATE
+        trava o banco para escrita, então duas estações nunca levam o mesmo número."""
+        self.con.execute("UPDATE meta SET valor = CAST(valor AS INTEGER) + 1 WHERE chave = 'ultimo_numero'")
+        return self.ultimo_numero()
+
+    # --- Migração ---
+    def migrar_json(self):
+        """Importa clientes.json, acessorios.json e pedidos.json (uma única vez)."""
+        from persistencia import carregar_json, ArmazemPedidos
+
+        armazem = ArmazemPedidos(ARQUIVO_PEDIDOS)
+        pedidos = armazem.carregar() if os.path.exists(ARQUIVO_PEDIDOS) else []
+        # Meses fechados (periodos.py) vêm antes, como estavam antes de sair da foto
+        pedidos = armazem.pedidos_fechados() + pedidos
+        armazem.fechar()
+        with self.con:
+            self._gravar_clientes(carregar_json(ARQUIVO_CLIENTES))
+            vistos = set()
+            acessorios = []
+            for a in carregar_json(ARQUIVO_ACESSORIOS):
+                # Códigos repetidos no JSON antigo: vale o primeiro, como no catálogo
+                cod = _normalizar_codigo(a.get("codigo", ""))
+                if cod not in vistos:
+                    vistos.add(cod)
+                    acessorios.append(a)
+            self._gravar_acessorios(acessorios)
+            for posicao, p in enumerate(pedidos):
+                self._gravar_pedido(armazem.completo(p), posicao)
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('migracao_json', datetime('now'))")
+
+    def migrar_referencias(self):
+        """Pedidos gravados com o cadastro inteiro do cliente passam a guardar só a
+        referência (carteira.referencia_cliente). Roda uma única vez."""
+        from carteira import referencia_cliente
+
+        with self.con:
+            linhas = self.con.execute("SELECT id, cliente_json FROM pedidos").fetchall()
+            self.con.executemany(
+                "UPDATE pedidos SET cliente_json = ? WHERE id = ?",
+                [(json.dumps(referencia_cliente(json.loads(l["cliente_json"])), ensure_ascii=False), l["id"])
+                 for l in linhas]
+            )
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('referencia_cliente', datetime('now'))")
+
+    # --- Clientes ---
+    @staticmethod
+    def _cliente(linha):
+        """Linha de clientes -> dict do cadastro (o id gerado fica em "id", se houver)."""
+        cliente = {k: linha[k] for k in CAMPOS_CLIENTE}
+        if linha["uid"]:
+            cliente["id"] = linha["uid"]
+        return cliente
+
+    def _gravar_clientes(self, clientes):
+        """
+        Grava só a diferença para a tabela: cada cliente é casado com a linha de mesma
+        carteira.chave_cliente (id gerado ou, sem ele, CPF/CNPJ/nome) e só as linhas novas,
+        alteradas ou que sumiram da lista são escritas. A ordem é a do id da linha: clientes
+        novos vão para o fim.
+        """
+        from carteira import chave_cliente
+
+        existentes = {}
+        for l in self.con.execute(f"SELECT id AS linha, uid, {', '.join(CAMPOS_CLIENTE)} FROM clientes ORDER BY id"):
+            existentes.setdefault(chave_cliente(self._cliente(l)), []).append(l)
+        novos, alterados = [], []
+        for c in clientes:
+            valores = (c.get("id") or None, _digitos(c.get("cpf_cnpj")), *(c.get(k, "") for k in CAMPOS_CLIENTE))
+            linhas = existentes.get(chave_cliente(c))
+            linha = linhas.pop(0) if linhas else None  # documentos repetidos: na ordem em que aparecem
+            if linha is None:
+                novos.append(valores)
+            elif (linha["uid"], *(linha[k] for k in CAMPOS_CLIENTE)) != (valores[0], *valores[2:]):
+                alterados.append((*valores, linha["linha"]))
+        self.con.executemany("DELETE FROM clientes WHERE id = ?",
+                             [(l["linha"],) for linhas in existentes.values() for l in linhas])
+        self.con.executemany(
+            f"UPDATE clientes SET uid = ?, documento = ?, {', '.join(f'{k} = ?' for k in CAMPOS_CLIENTE)} WHERE id = ?",
+            alterados
+        )
+        self.con.executemany(
+            f"INSERT INTO clientes (uid, documento, {', '.join(CAMPOS_CLIENTE)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in CAMPOS_CLIENTE)})", novos
+        )
+
+    def listar_clientes(self):
+        linhas = self.con.execute(f"SELECT uid, {', '.join(CAMPOS_CLIENTE)} FROM clientes ORDER BY id")
+        return [self._cliente(l) for l in linhas]
+
+    def lista_clientes(self, chave):
+        """Clientes com a interface de persistencia.ArquivoVersionado (ListaSQLite)."""
+        return ListaSQLite(self, "clientes", chave, self.listar_clientes, self._gravar_clientes)
+
+    # --- Acessórios ---
+    def _gravar_acessorios(self, acessorios):
+        """Grava só a diferença para a tabela, casando as linhas pelo código normalizado."""
+        existentes = {l["codigo_normalizado"]: l for l in
+                      self.con.execute("SELECT id, codigo, codigo_normalizado, nome, peso FROM acessorios")}
+        novos, alterados = [], []
+        for a in acessorios:
+            valores = (str(a.get("codigo", "")), a.get("nome", ""), float(a.get("peso", 0) or 0))
+            linha = existentes.pop(_normalizar_codigo(valores[0]), None)
+            if linha is None:
+                novos.append((valores[0], _normalizar_codigo(valores[0]), *valores[1:]))
+            elif (linha["codigo"], linha["nome"], linha["peso"]) != valores:
+                alterados.append((*valores, linha["id"]))
+        self.con.executemany("DELETE FROM acessorios WHERE id = ?", [(l["id"],) for l in existentes.values()])
+        self.con.executemany("UPDATE acessorios SET codigo = ?, nome = ?, peso = ? WHERE id = ?", alterados)
+        self.con.executemany(
+            "INSERT INTO acessorios (codigo, codigo_normalizado, nome, peso) VALUES (?, ?, ?, ?)", novos
+        )
+
+    def listar_acessorios(self):
+        return [dict(l) for l in self.con.execute("SELECT codigo, nome, peso FROM acessorios ORDER BY id")]
+
+    def lista_acessorios(self, chave):
+        """Catálogo com a interface de persistencia.ArquivoVersionado (ListaSQLite)."""
+        return ListaSQLite(self, "acessorios", chave, self.listar_acessorios, self._gravar_acessorios)
+
+    # --- Pedidos ---
+    def _gravar_pedido(self, pedido, posicao):
+        cli = pedido.get("cliente", "")
+        cli_dict = cli if isinstance(cli, dict) else {"nome": str(cli)}
+        self.con.execute(
+            "INSERT OR REPLACE INTO pedidos (id, numero, data, data_iso, cliente_nome, cliente_documento, "
+            "cliente_json, total, posicao, rev) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (pedido["id"], pedido.get("numero"), pedido.get("data", ""), data_iso(pedido.get("data")),
+             cli_dict.get("nome", ""), _digitos(cli_dict.get("cpf_cnpj")), json.dumps(cli, ensure_ascii=False),
+             float(pedido.get("total", 0) or 0), posicao, pedido.get("rev", 0))
+        )
+        self.con.execute("DELETE FROM itens_pedido WHERE pedido_id = ?", (pedido["id"],))
+        self.con.executemany(
+            f"INSERT INTO itens_pedido (pedido_id, posicao, {', '.join(CAMPOS_ITEM)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in CAMPOS_ITEM)})",
+            [(pedido["id"], i, *(item.get(k) for k in CAMPOS_ITEM)) for i, item in enumerate(pedido.get("itens", []))]
+        )
+
+    def _montar_pedidos(self, linhas, com_itens=True):
+        pedidos = []
+        por_id = {}
+        clientes = {}  # mesmo JSON de cliente -> mesmo dict (lido uma vez por cliente)
+        for l in linhas:
+            cliente = clientes.get(l["cliente_json"])
+            if cliente is None:
+                cliente = clientes[l["cliente_json"]] = json.loads(l["cliente_json"])
+            p = {"id": l["id"], "numero": l["numero"], "data": l["data"],
+                 "cliente": cliente, "total": l["total"], "rev": l["rev"]}
+            if com_itens:
+                p["itens"] = []
+            pedidos.append(p)
+            por_id[p["id"]] = p
+        if por_id and com_itens:
+            ids = list(por_id)
+            # Itens de todos os pedidos do resultado, em lotes (limite de parâmetros do SQLite)
+            for inicio in range(0, len(ids), 500):
+                lote = ids[inicio:inicio + 500]
+                itens = self.con.execute(
+                    f"SELECT pedido_id, {', '.join(CAMPOS_ITEM)} FROM itens_pedido "
+                    f"WHERE pedido_id IN ({', '.join('?' for _ in lote)}) ORDER BY pedido_id, posicao", lote
+                )
+                for item in itens:
+                    por_id[item["pedido_id"]]["itens"].append({k: item[k] for k in CAMPOS_ITEM})
+        return pedidos
+
+    def itens_do_pedido(self, id_pedido):
+        linhas = self.con.execute(
+            f"SELECT {', '.join(CAMPOS_ITEM)} FROM itens_pedido WHERE pedido_id = ? ORDER BY posicao", (id_pedido,)
+        )
+        return [{k: l[k] for k in CAMPOS_ITEM} for l in linhas]
+
+    def consultar_pedidos(self, com_itens=True):
+        """Todos os pedidos na ordem de cadastro. com_itens=False traz só os cabeçalhos
+        (os itens saem de itens_do_pedido)."""
+        linhas = self.con.execute("SELECT * FROM pedidos ORDER BY posicao")
+        return self._montar_pedidos(linhas, com_itens)
+
+    def filtrar_pedidos(self, texto):
+        """Ids (na ordem de cadastro) dos pedidos de uma busca que os índices respondem:
+        data completa "dd/mm/aaaa", mês "mm/aaaa" ou CPF/CNPJ completo. None para as demais."""
+        texto = texto.strip()
+        dia, mes = _DATA.fullmatch(texto), _MES.fullmatch(texto)
+        if dia:
+            filtro, valores = "data_iso = ?", (data_iso(texto),)
+        elif mes and 1 <= int(mes[1]) <= 12:
+            m, ano = int(mes[1]), int(mes[2])
+            filtro = "data_iso >= ? AND data_iso < ?"
+            valores = (f"{ano:04d}-{m:02d}-01", f"{ano + m // 12:04d}-{m % 12 + 1:02d}-01")
+        elif _DOCUMENTO.fullmatch(texto) and len(_digitos(texto)) in (11, 14):
+            filtro, valores = "cliente_documento = ?", (_digitos(texto),)
+        else:
+            return None
+        linhas = self.con.execute(f"SELECT id FROM pedidos WHERE {filtro} ORDER BY posicao", valores)
+        return [l["id"] for l in linhas]
+
+
+_banco = None
+
+def banco_padrao():
+    """Conexão única do processo com o banco configurado em config.ARQUIVO_BANCO."""
+    global _banco
+    if _banco is None:
+        _banco = Banco()
+    return _banco
+
+
+class ListaSQLite(ArquivoVersionado):
+    """
+    Tabela do banco com a interface de persistencia.ArquivoVersionado. A versão fica na
+    linha "versao_<nome>" de meta e é conferida dentro da transação que grava (BEGIN
+    IMMEDIATE: uma estação por vez). Versão diferente da carregada: merge de três vias
+    com o que está no banco, e ConflitoDeVersao se o mesmo registro mudou dos dois lados.
+    """
+
+    def __init__(self, banco, nome, chave, listar, gravar):
+        super().__init__(f"{banco.caminho}#{nome}", chave)
+        self.banco = banco
+        self.chave_meta = f"versao_{nome}"
+        self._listar, self._gravar = listar, gravar
+
+    def _ler_versao(self):
+        return chave_numero(self.banco._meta(self.chave_meta)) or 0
+
+    def _ler(self):
+        return self._ler_versao(), self._listar()
+
+    def salvar(self, dados):
+        con = self.banco.con
+        with con:
+            con.execute("BEGIN IMMEDIATE")
+            versao_atual = self._ler_versao()
+            if versao_atual != self.versao:
+                deles = self._listar()
+                dados = self._mesclar(dados, deles)  # ConflitoDeVersao desfaz a transação
+                self._definir_base(deles, versao_atual)
+            self._gravar(dados)
+            con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (self.chave_meta, str(versao_atual + 1)))
+        self._definir_base(dados, versao_atual + 1)
+        return dados
+
+
+# ==============================
+# Pedidos no SQLite (mesma interface de persistencia.ArmazemPedidos)
+# ==============================
+class ArmazemPedidosSQLite:
+    def __init__(self, banco=None):
+        self.banco = banco or banco_padrao()
+        self.pedidos = []
+        self._por_id = {}
+        self._por_numero = {}
+        self.cache_itens = CacheItens()
+        self._versao_dados = None
+        self.ao_aplicar = None
+
+    def carregar(self):
+        # Só os cabeçalhos: os itens são lidos sob demanda (itens/completo)
+        self.pedidos = self.banco.consultar_pedidos(com_itens=False)
+        self.cache_itens.limpar()
+        self._por_id = {p["id"]: p for p in self.pedidos}
+        self._por_numero = {}
+        for p in self.pedidos:
+            self._por_numero.setdefault(chave_numero(p.get("numero")), p)
+        self._versao_dados = self._data_version()
+        return self.pedidos
+
+    def recarregar(self):
+        """Relê tudo do banco e avisa o ouvinte ("recarregar")."""
+        self.carregar()
+        if self.ao_aplicar:
+            self.ao_aplicar("recarregar", None)
+        return self.pedidos
+
+    def _data_version(self):
+        # Muda quando OUTRA conexão (janela/estação) altera o banco
+        return self.banco.con.execute("PRAGMA data_version").fetchone()[0]
+
+    def sincronizar(self):
+        if self._data_version() == self._versao_dados:
+            return 0
+        self.carregar()
+        if self.ao_aplicar:
+            self.ao_aplicar("recarregar", None)
+        return len(self.pedidos)
+
+    def _avisar(self, op, pedido):
+        if self.ao_aplicar:
+            self.ao_aplicar(op, pedido)
+
+    def obter(self, id_pedido):
+        return self._por_id.get(id_pedido)
+
+    def itens(self, pedido):
+        if "itens" in pedido:
+            return pedido["itens"]
+        # (id, rev): uma revisão nova do pedido nunca reaproveita itens da anterior
+        return self.cache_itens.obter((pedido["id"], pedido.get("rev", 0)),
+                                      lambda: self.banco.itens_do_pedido(pedido["id"]))
+
+    def itens_em_lote(self, pedidos):
+        """(pedido, itens) de cada pedido numa única consulta, por uma conexão própria
+        (pode rodar fora da thread da interface)."""
+        por_id = {p["id"]: p for p in pedidos}
+        con = sqlite3.connect(self.banco.caminho)
+        con.row_factory = sqlite3.Row
+        try:
+            linhas = con.execute(f"SELECT pedido_id, {', '.join(CAMPOS_ITEM)} FROM itens_pedido "
+                                 f"ORDER BY pedido_id, posicao")
+            for id_pedido, itens in itertools.groupby(linhas, key=lambda l: l["pedido_id"]):
+                pedido = por_id.pop(id_pedido, None)
+                if pedido is not None:
+                    yield pedido, [{k: l[k] for k in CAMPOS_ITEM} for l in itens]
+        finally:
+            con.close()
+        for pedido in por_id.values():
+            yield pedido, pedido.get("itens", [])
+
+    def completo(self, pedido):
+        return dict(pedido, itens=self.itens(pedido))
+
+    def por_numero(self, numero):
+        """Pedido pelo número (ou None). Em bancos antigos com números repetidos, o primeiro."""
+        return self._por_numero.get(chave_numero(numero))
+
+    def proximo_numero(self):
+        """Número que a próxima inserção deve receber (só informativo)."""
+        return self.banco.ultimo_numero() + 1
+
+    # --- Meses fechados: no banco todos os pedidos ficam na mesma tabela ---
+    def meses_fechados(self):
+        return []
+
+    def quantidade_fechados(self):
+        return 0
+
+    def pedidos_fechados(self, periodos=None):
+        return []
+
+    def obter_fechado(self, id_pedido):
+        return None
+
+    def localizar_numero(self, numero):
+        return self.por_numero(numero)
+
+    def filtrar(self, texto):
+        """Pedidos carregados que casam com a busca, quando ela é por data, mês ou CPF/CNPJ
+        (consulta indexada no banco). None: a tela usa o índice em memória (busca.py)."""
+        ids = self.banco.filtrar_pedidos(texto)
+        if ids is None:
+            return None
+        return [self._por_id[i] for i in ids if i in self._por_id]
+
+    def selecionar_para_arquivar(self, hoje=None):
+        return {}
+
+    def _proxima_posicao(self):
+        linha = self.banco.con.execute("SELECT COALESCE(MAX(posicao), -1) + 1 FROM pedidos").fetchone()
+        return linha[0]
+
+    def inserir(self, pedido):
+        self.sincronizar()
+        pedido.setdefault("id", uuid.uuid4().hex)
+        pedido["rev"] = 1
+        with self.banco.con:
+            pedido["numero"] = self.banco._tirar_numero()
+            self.banco._gravar_pedido(pedido, self._proxima_posicao())
+        self.pedidos.append(pedido)
+        self._por_id[pedido["id"]] = pedido
+        self._por_numero.setdefault(pedido["numero"], pedido)
+        self._avisar("inserir", pedido)
+        return pedido
+
+    def atualizar(self, id_pedido, dados, rev_base):
+        self.sincronizar()
+        atual = self._por_id.get(id_pedido)
+        if atual is None:
+            raise ConflitoDeVersao("O pedido foi excluído em outra janela/estação.")
+        novo = dict(atual, **dados)
+        if "itens" not in novo:
+            novo["itens"] = self.itens(atual)  # _gravar_pedido regrava os itens
+        novo["rev"] = rev_base + 1
+        with self.banco.con:
+            linha = self.banco.con.execute(
+                "SELECT posicao FROM pedidos WHERE id = ? AND rev = ?", (id_pedido, rev_base)
+            ).fetchone()
+            if linha is None:
+                raise ConflitoDeVersao("O pedido foi alterado em outra janela/estação.")
+            self.banco._gravar_pedido(novo, linha["posicao"])
+        atual.clear()
+        atual.update(novo)
+        self._avisar("atualizar", atual)
+        return atual
+
+    def remover(self, id_pedido, rev_base):
+        self.sincronizar()
+        with self.banco.con:
+            apagados = self.banco.con.execute(
+                "DELETE FROM pedidos WHERE id = ? AND rev = ?", (id_pedido, rev_base)
+            ).rowcount
+        atual = self._por_id.get(id_pedido)
+        if not apagados and atual is not None:
+            raise ConflitoDeVersao("O pedido foi alterado em outra janela/estação.")
+        if atual is not None:
+            del self._por_id[id_pedido]
+            self.pedidos.remove(atual)
+            numero = chave_numero(atual.get("numero"))
+            if self._por_numero.get(numero) is atual:
+                del self._por_numero[numero]
+                outro = next((p for p in self.pedidos if chave_numero(p.get("numero")) == numero), None)
+                if outro is not None:
+                    self._por_numero[numero] = outro
+            self._avisar("remover", atual)
+
+    def compactar(self, aguardar=False):
+        self.banco.con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def fechar(self):
+        pass
@@ -0,0 +1,339 @@
+"""
+Benchmarks dos caminhos mais usados, sem abrir janelas (QT_QPA_PLATFORM=offscreen).
+
+Gera uma massa de dados sintética numa pasta própria (nunca a pasta do sistema),
+mede carga/gravação, filtros e tabelas das três telas, PDF e backup e grava os
+tempos num JSON. Com --comparar, mostra a variação em relação a um JSON anterior.
+
+Uso:
+    python benchmark.py [--clientes 10000] [--acessorios 20000] [--pedidos 200000]
+                        [--repeticoes 3] [--pasta PASTA] [--saida benchmark.json]
+                        [--comparar ANTERIOR.json] [--semente 42]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+# Variação (em relação ao JSON anterior) a partir da qual o resultado é apontado
+LIMITE_REGRESSAO = 0.10
+
+_NOMES = ["Ana", "Bruno", "Carla", "Diego", "Eduardo", "Fernanda", "Gabriel", "Helena", "Igor", "Joana",
+          "Lucas", "Marina", "Nelson", "Otávio", "Paula", "Rafael", "Sônia", "Tiago", "Vânia", "Wagner"]
+_SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Carvalho", "Ferreira",
+               "Rodrigues", "Almeida", "Costa", "Gomes", "Martins", "Araújo", "Rosa", "Barbosa"]
+_EMPRESAS = ["Esquadrias", "Vidraçaria", "Alumínios", "Serralheria", "Construtora", "Box & Cia"]
+_CIDADES = [("Goiânia", "GO"), ("Anápolis", "GO"), ("Brasília", "DF"), ("Uberlândia", "MG"),
+            ("Belo Horizonte", "MG"), ("São Paulo", "SP"), ("Campinas", "SP"), ("Cuiabá", "MT")]
+_BAIRROS = ["Centro", "Setor Bueno", "Jardim América", "Vila Nova", "Setor Oeste", "Industrial"]
+_PERFIS = ["Trilho superior", "Trilho inferior", "Montante", "Travessa", "Marco", "Baguete",
+           "Cantoneira", "Tubo", "Perfil U", "Perfil T", "Contramarco", "Folha de correr"]
+_LINHAS = ["Suprema", "Gold", "Linha 25", "Linha 30", "Linha 42", "Max", "Slim"]
+
+
+# ==============================
+# Massa de dados sintética
+# ==============================
+def _documento(rnd, n):
+    if n % 3 == 0:  # um terço de empresas
+        d = f"{rnd.randrange(10**13, 10**14):014d}"
+        return f"{d[:2]}.{d[2:5]}.{d[5:8]}/{d[8:12]}-{d[12:]}"
+    d = f"{rnd.randrange(10**10, 10**11):011d}"
+    return f"{d[:3]}.{d[3:6]}.{d[6:9]}-{d[9:]}"
+
+
+def gerar_clientes(rnd, quantidade):
+    clientes = []
+    for n in range(quantidade):
+        nome = f"{rnd.choice(_NOMES)} {rnd.choice(_SOBRENOMES)} {rnd.choice(_SOBRENOMES)}"
+        if n % 3 == 0:
+            nome = f"{rnd.choice(_EMPRESAS)} {rnd.choice(_SOBRENOMES)}"
+        nome = f"{nome} {n + 1}"  # nomes únicos: o pedido acha o cliente pelo nome
+        cidade, estado = rnd.choice(_CIDADES)
+        clientes.append({
+            "nome": nome, "cpf_cnpj": _documento(rnd, n),
+            "email": f"cliente{n + 1}@exemplo.com.br",
+            "telefone": f"(62) 9{rnd.randrange(10**7, 10**8)}",
+            "endereco": f"Rua {rnd.randrange(1, 300)}", "numero": str(rnd.randrange(1, 2000)),
+            "bairro": rnd.choice(_BAIRROS), "cidade": cidade, "estado": estado,
+            "ie": str(rnd.randrange(10**8, 10**9)) if n % 3 == 0 else "",
+        })
+    return clientes
+
+
+def gerar_acessorios(rnd, quantidade):
+    return [{"codigo": f"P{n + 1:05d}",
+             "nome": f"{rnd.choice(_PERFIS)} {rnd.choice(_LINHAS)} {rnd.randrange(10, 99)}mm",
+             "peso": round(rnd.uniform(0.2, 6.0), 3)}
+            for n in range(quantidade)]
+
+
+def gerar_pedidos(rnd, quantidade, clientes, acessorios, preco_kg):
+    from carteira import referencia_cliente
+
+    pedidos = []
+    inicio = date(2023, 1, 1)
+    for n in range(quantidade):
+        itens = []
+        for acessorio in rnd.sample(acessorios, rnd.randint(1, 8)):
+            qtd = float(rnd.randint(1, 40))
+            peso_total = acessorio["peso"] * qtd
+            itens.append({"codigo": acessorio["codigo"], "nome": acessorio["nome"],
+                          "peso_unit": acessorio["peso"], "qtd": qtd, "peso_total": peso_total,
+                          "subtotal": peso_total * preco_kg, "preco_kg_na_epoca": preco_kg})
+        data = inicio + timedelta(days=n * 1000 // max(quantidade, 1))
+        pedidos.append({"numero": n + 1001, "data": data.strftime("%d/%m/%Y"),
+                        "cliente": referencia_cliente(rnd.choice(clientes)), "itens": itens,
+                        "total": sum(i["subtotal"] for i in itens),
+                        "id": uuid.UUID(int=rnd.getrandbits(128)).hex, "rev": 1})
+    return pedidos
+
+
+def gerar_dados(pasta, clientes=10000, acessorios=20000, pedidos=200000, semente=42, preco_kg=45.0):
+    """Grava clientes.json, acessorios.json, pedidos.json e o preço do kg em `pasta`."""
+    from persistencia import salvar_json, anexar_itens, FORMATO_PEDIDOS
+
+    rnd = random.Random(semente)
+    lista_clientes = gerar_clientes(rnd, clientes)
+    lista_acessorios = gerar_acessorios(rnd, acessorios)
+    lista_pedidos = gerar_pedidos(rnd, pedidos, lista_clientes, lista_acessorios, preco_kg)
+    salvar_json(lista_clientes, os.path.join(pasta, "clientes.json"))
+    salvar_json(lista_acessorios, os.path.join(pasta, "acessorios.json"))
+    # Cabeçalhos na foto, itens no arquivo de itens (como o armazém grava)
+    for p, posicao in zip(lista_pedidos, anexar_itens(os.path.join(pasta, "pedidos.json.itens"),
+                                                      [p.pop("itens") for p in lista_pedidos])):
+        p["itens_pos"] = posicao
+    salvar_json({"formato": FORMATO_PEDIDOS, "geracao": 1, "posicoes": {}, "pedidos": lista_pedidos},
+                os.path.join(pasta, "pedidos.json"), indent=None)
+    salvar_json({"preco_kg": preco_kg}, os.path.join(pasta, "preco_aluminio.json"))
+
+
+# ==============================
+# Medição
+# ==============================
+def cronometrar(funcao, repeticoes, preparar=None):
+    """Tempos de `funcao` em ms ({mediana, minimo, maximo, repeticoes}). `preparar` roda antes
+    de cada repetição, fora da medição."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {"mediana": statistics.median(tempos), "minimo": min(tempos), "maximo": max(tempos),
+            "repeticoes": repeticoes}
+
+
+def _versao():
+    """Commit atual (quando rodando de um clone git), para identificar o JSON."""
+    try:
+        saida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return saida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def executar(pasta, repeticoes, ao_medir=None):
+    """Roda todos os benchmarks sobre os dados de `pasta` (já apontada por PERFIBRAS_DADOS)."""
+    from PyQt5.QtWidgets import QApplication
+    import persistencia
+    from carteira import abrir_arquivo_clientes
+    from catalogo import CatalogoAcessorios
+    from backup import RepositorioBackup, arquivos_para_backup
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    resultados = {}
+
+    def medir(nome, funcao, vezes=repeticoes, preparar=None):
+        resultados[nome] = cronometrar(funcao, vezes, preparar)
+        if ao_medir:
+            ao_medir(nome, resultados[nome])
+
+    # --- JSON ---
+    arquivo_clientes = abrir_arquivo_clientes()
+    medir("json.carregar_clientes", arquivo_clientes.carregar)
+    medir("json.carregar_catalogo", CatalogoAcessorios.carregar)
+    armazem = persistencia.abrir_armazem_pedidos()
+    medir("json.carregar_pedidos", armazem.carregar)
+    lista_clientes = arquivo_clientes.carregar()
+    contador = iter(range(10**9))
+
+    def alterar_cliente():
+        lista_clientes[0] = dict(lista_clientes[0], telefone=f"(62) {next(contador)}")
+        arquivo_clientes.salvar(lista_clientes)
+    medir("json.salvar_clientes", alterar_cliente)
+
+    def inserir_pedido():
+        modelo = armazem.pedidos[-1]
+        armazem.inserir({"data": modelo["data"],
+                         "cliente": modelo["cliente"], "itens": armazem.itens(modelo), "total": modelo["total"]})
+    medir("json.inserir_pedido", inserir_pedido, vezes=max(repeticoes, 20))
+    medir("json.compactar_pedidos", lambda: armazem.compactar(aguardar=True))
+    armazem.fechar()
+
+    # --- Telas ---
+    from clientes import TelaClientes
+    from acessorios import TelaAcessorios
+    from pedidos import TelaPedidos
+
+    tela_clientes = TelaClientes()
+    medir("telas.clientes.atualizar_tabela", tela_clientes.atualizar_tabela)
+    tela_acessorios = TelaAcessorios()
+    medir("telas.acessorios.atualizar_tabela", tela_acessorios.atualizar_tabela)
+    medir("telas.pedidos.abrir", lambda: TelaPedidos().deleteLater(), vezes=1)
+    tela_pedidos = TelaPedidos()
+    app.processEvents()
+
+    def digitar_busca(termo):
+        tela_pedidos.input_busca.blockSignals(True)
+        tela_pedidos.input_busca.setText(termo)
+        tela_pedidos.input_busca.blockSignals(False)
+
+    nome = tela_pedidos.pedidos[len(tela_pedidos.pedidos) // 2]["cliente"]["nome"]
+    for rotulo, termo in (("vazio", ""), ("nome", nome), ("cidade", "goiania"), ("numero", "15"), ("data", "10/2024")):
+        digitar_busca(termo)
+        # Sem o resultado da repetição anterior: mede a busca do zero, não o atalho de IndiceBusca
+        medir(f"telas.pedidos.atualizar_hist.{rotulo}", tela_pedidos.atualizar_hist,
+              preparar=tela_pedidos.indice_busca.esquecer_ultima)
+
+    def busca_anterior():
+        # Uma letra a menos já pesquisada: mede o caminho incremental (a consulta só restringe a anterior)
+        tela_pedidos.indice_busca.esquecer_ultima()
+        digitar_busca(nome[:-1])
+        tela_pedidos.atualizar_hist()
+        digitar_busca(nome)
+    medir("telas.pedidos.atualizar_hist.refinar", tela_pedidos.atualizar_hist, preparar=busca_anterior)
+
+    codigos = itertools.cycle([a["codigo"] for a in tela_acessorios.acessorios[:200]])
+
+    def adicionar_item():
+        tela_pedidos.input_prod.setText(next(codigos))
+        tela_pedidos.input_qtd.setText("12")
+        tela_pedidos.adicionar_item()
+    medir("telas.pedidos.adicionar_item", adicionar_item, vezes=max(repeticoes, 50))
+    tela_pedidos.modelo_itens.limpar()
+
+    # --- Relatórios (a TarefaAnalise monta a tabela em segundo plano) ---
+    from analise import montar_tabela
+    abertos = [dict(p) for p in tela_pedidos.armazem.pedidos]
+    medir("analise.montar_tabela", lambda: montar_tabela(tela_pedidos.armazem, abertos), vezes=1)
+    tabela = montar_tabela(tela_pedidos.armazem, abertos)
+    ano = max(tabela.anos(), default=datetime.now().year)
+    for dimensao in ("mes", "cliente", "perfil", "cidade"):
+        medir(f"analise.comparar_anos.{dimensao}", lambda d=dimensao: tabela.comparar_anos(d, ano))
+    medir("analise.agrupar.cliente", lambda: tabela.agrupar("cliente"))
+
+    # --- PDF (o que a TarefaPDF executa em segundo plano) ---
+    from proposta_pdf import gerar_pdf_proposta
+    temporaria = tempfile.mkdtemp(prefix="perfibras_bench_")
+    try:
+        pedido = max((tela_pedidos.armazem.completo(p) for p in tela_pedidos.pedidos[:1000]),
+                     key=lambda p: len(p["itens"]))
+        medir("pdf.gerar_proposta", lambda: gerar_pdf_proposta(pedido, os.path.join(temporaria, "p.pdf")),
+              vezes=max(repeticoes, 10))
+
+        # --- Backup ---
+        quando = iter(datetime(2030, 1, 1) + timedelta(minutes=m) for m in range(10**6))
+        pasta_repos = os.path.join(temporaria, "backups")
+
+        def repo_vazio():
+            shutil.rmtree(pasta_repos, ignore_errors=True)
+        medir("backup.completo",
+              lambda: RepositorioBackup(pasta_repos).criar_geracao(arquivos_para_backup(), next(quando)),
+              preparar=repo_vazio)
+        medir("backup.incremental",
+              lambda: RepositorioBackup(pasta_repos).criar_geracao(arquivos_para_backup(), next(quando)),
+              preparar=inserir_pedido)
+    finally:
+        shutil.rmtree(temporaria, ignore_errors=True)
+    for tela in (tela_clientes, tela_acessorios, tela_pedidos):
+        tela.close()
+    return resultados
+
+
+def comparar(atual, anterior):
+    """[(nome, ms anterior, ms atual, variação)] das medições presentes nos dois resultados."""
+    linhas = []
+    for nome, medida in atual["resultados"].items():
+        antes = anterior.get("resultados", {}).get(nome)
+        if antes and antes["mediana"] > 0:
+            linhas.append((nome, antes["mediana"], medida["mediana"],
+                           medida["mediana"] / antes["mediana"] - 1))
+    return linhas
+
+
+# ==============================
+# Linha de comando
+# ==============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede os caminhos críticos com dados sintéticos.")
+    parser.add_argument("--clientes", type=int, default=10000)
+    parser.add_argument("--acessorios", type=int, default=20000)
+    parser.add_argument("--pedidos", type=int, default=200000)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--pasta", help="pasta para os dados gerados (padrão: temporária, apagada no fim)")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON com os resultados")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="perfibras_dados_")
+    if os.path.isdir(pasta) and os.listdir(pasta) and args.pasta:
+        parser.error(f"a pasta {pasta} não está vazia")
+    os.makedirs(pasta, exist_ok=True)
+    # Antes de importar config: os módulos do sistema passam a usar só a pasta sintética
+    os.environ["PERFIBRAS_DADOS"] = pasta
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+    try:
+        print(f"Gerando {args.clientes} clientes, {args.acessorios} itens e {args.pedidos} pedidos em {pasta}...")
+        inicio = time.perf_counter()
+        gerar_dados(pasta, args.clientes, args.acessorios, args.pedidos, args.semente)
+        print(f"Dados gerados em {time.perf_counter() - inicio:.1f}s.")
+
+        def mostrar(nome, medida):
+            print(f"{nome:<42} {medida['mediana']:>10.2f} ms  (mín {medida['minimo']:.2f}, máx {medida['maximo']:.2f})")
+        resultados = executar(pasta, args.repeticoes, mostrar)
+    finally:
+        if not args.pasta:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    from config import BACKEND
+    saida = {"versao": _versao(), "data": datetime.now().isoformat(timespec="seconds"),
+             "python": platform.python_version(), "plataforma": platform.platform(),
+             "backend": BACKEND,
+             "parametros": {"clientes": args.clientes, "acessorios": args.acessorios, "pedidos": args.pedidos,
+                            "repeticoes": args.repeticoes, "semente": args.semente},
+             "resultados": resultados}
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(saida, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}.")
+
+    regressoes = 0
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        if anterior.get("parametros") != saida["parametros"]:
+            print("Aviso: a execução anterior usou outros parâmetros.")
+        print(f"\nComparação com {anterior.get('versao') or args.comparar}:")
+        for nome, antes, agora, variacao in comparar(saida, anterior):
+            marca = "  <-- mais lento" if variacao > LIMITE_REGRESSAO else ""
+            regressoes += bool(marca)
+            print(f"{nome:<42} {antes:>10.2f} -> {agora:>10.2f} ms ({variacao:+.0%}){marca}")
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,428 @@
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from functools import lru_cache
+
+_SEPARADORES = re.compile(r"[^0-9a-z]+")
+_NAO_DIGITOS = re.compile(r"\D+")
+
+# Sugestões (IndiceTrigramas)
+MAX_SUGESTOES = 12
+MAX_EXPANSAO = 300        # palavras do vocabulário aceitas por termo (termos de 1-2 letras casam com muitas)
+SIMILARIDADE_MINIMA = 0.5 # fração dos trigramas do termo que a palavra precisa ter (erro de digitação)
+TRIGRAMA_COMUM = 2000     # trigramas presentes em mais palavras que isso não ajudam a separar
+MAX_CANDIDATOS = 1500     # documentos que recebem a nota completa (os demais ficam pela ordem)
+
+
+@lru_cache(maxsize=65536)
+def normalizar(texto):
+    """Minúsculas e sem acentos: 'São José' -> 'sao jose'."""
+    texto = unicodedata.normalize("NFKD", str(texto).lower())
+    return texto.encode("ascii", "ignore").decode("ascii")
+
+
+@lru_cache(maxsize=65536)
+def tokenizar(texto):
+    return tuple(t for t in _SEPARADORES.split(normalizar(texto)) if t)
+
+
+@lru_cache(maxsize=65536)
+def somente_digitos(texto):
+    return _NAO_DIGITOS.sub("", str(texto))
+
+
+def nome_cliente(pedido):
+    """Retorna o nome do cliente do pedido ('cliente' pode ser dict ou string)."""
+    cli_data = pedido.get("cliente", "")
+    if isinstance(cli_data, dict):
+        return cli_data.get("nome", "")
+    return str(cli_data)
+
+
+def campos_pedido(pedido):
+    """Campos pesquisáveis de um pedido: cliente, CPF/CNPJ, cidade, número e data."""
+    cli = pedido.get("cliente", "")
+    cli = cli if isinstance(cli, dict) else {}
+    doc = cli.get("cpf_cnpj", "")
+    data = pedido.get("data", "")
+    # CPF/CNPJ e data também entram só com dígitos ("12345678900", "01102026")
+    return [nome_cliente(pedido), doc, somente_digitos(doc), cli.get("cidade", ""),
+            str(pedido.get("numero", "")), data, somente_digitos(data)]
+
+
+def campos_cliente(cliente):
+    """Campos pesquisáveis de um cliente: nome, CPF/CNPJ (também só dígitos) e cidade."""
+    doc = cliente.get("cpf_cnpj", "")
+    return [cliente.get("nome", ""), doc, somente_digitos(doc), cliente.get("cidade", "")]
+
+
+def campos_nome_documento(cliente):
+    """Campos das sugestões de cliente no pedido: nome e CPF/CNPJ (também só dígitos)."""
+    doc = cliente.get("cpf_cnpj", "")
+    return [cliente.get("nome", ""), doc, somente_digitos(doc)]
+
+
+def campos_acessorio(item):
+    """Campos das sugestões de item no pedido: código e descrição."""
+    return [str(item.get("codigo", "")), item.get("nome", "")]
+
+
+class IndiceBusca:
+    """
+    Índice invertido por token com busca por prefixo.
+    Cada termo da consulta precisa casar com o início de algum token do documento.
+    Os documentos são os próprios objetos (dicts), identificados por id().
+    """
+
+    def __init__(self, extrair_campos):
+        self._extrair = extrair_campos
+        self._objetos = {}      # chave -> objeto
+        self._tokens_doc = {}   # chave -> tokens do objeto
+        self._ordem = {}        # chave -> sequência de inserção (ordem de exibição)
+        self._postings = {}     # token -> chaves
+        self._tokens = []       # tokens ordenados para a busca por prefixo
+        self._seq = 0
+        self._ultima = None     # (termos, resultado) da última consulta
+
+    def construir(self, objetos):
+        self._objetos.clear(); self._tokens_doc.clear(); self._ordem.clear(); self._postings.clear()
+        for obj in objetos:
+            self._indexar(obj)
+        self._tokens = sorted(self._postings)
+        self._ultima = None
+
+    def _indexar(self, obj, ordem=None):
+        chave = id(obj)
+        tokens = set()
+        for campo in self._extrair(obj):
+            tokens.update(tokenizar(campo))
+        self._objetos[chave] = obj
+        self._tokens_doc[chave] = tokens
+        if ordem is None:
+            self._seq += 1
+            ordem = self._seq
+        self._ordem[chave] = ordem
+        novos = []
+        for t in tokens:
+            docs = self._postings.get(t)
+            if docs is None:
+                docs = self._postings[t] = set()
+                novos.append(t)
+            docs.add(chave)
+        return novos
+
+    def _desindexar(self, chave):
+        for t in self._tokens_doc.pop(chave, ()):
+            docs = self._postings.get(t)
+            if docs is None:
+                continue
+            docs.discard(chave)
+            if not docs:
+                del self._postings[t]
+                i = bisect_left(self._tokens, t)
+                if i < len(self._tokens) and self._tokens[i] == t:
+                    del self._tokens[i]
+        self._objetos.pop(chave, None)
+        return self._ordem.pop(chave, None)
+
+    def adicionar(self, obj):
+        for t in self._indexar(obj):
+            insort(self._tokens, t)
+        self._ultima = None
+
+    def atualizar(self, obj):
+        ordem = self._desindexar(id(obj))
+        for t in self._indexar(obj, ordem):
+            insort(self._tokens, t)
+        self._ultima = None
+
+    def substituir(self, antigo, novo):
+        """Troca um objeto por outro mantendo a posição dele na ordem de exibição."""
+        ordem = self._desindexar(id(antigo))
+        for t in self._indexar(novo, ordem):
+            insort(self._tokens, t)
+        self._ultima = None
+
+    def remover(self, obj):
+        self._desindexar(id(obj))
+        self._ultima = None
+
+    def esquecer_ultima(self):
+        """Descarta o resultado guardado da última consulta: a próxima parte do índice inteiro."""
+        self._ultima = None
+
+    def _chaves_com_prefixo(self, prefixo):
+        resultado = set()
+        i = bisect_left(self._tokens, prefixo)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefixo):
+            resultado |= self._postings[self._tokens[i]]
+            i += 1
+        return resultado
+
+    def buscar(self, texto):
+        """Retorna os objetos que casam com todos os termos, na ordem de inserção.
+        Consulta vazia retorna None (sem filtro)."""
+        termos = tokenizar(texto)
+        if not termos:
+            self._ultima = None
+            return None
+
+        anterior = self._ultima
+        if anterior is not None and all(any(n.startswith(a) for n in termos) for a in anterior[0]):
+            # A consulta nova só restringe a anterior: parte do resultado que já temos
+            # e cruza apenas com os termos que mudaram
+            chaves = None
+            for q in termos:
+                if q in anterior[0]:
+                    continue
+                atual = self._chaves_com_prefixo(q)
+                chaves = atual if chaves is None else chaves & atual
+            if chaves is None:
+                resultado = anterior[1]
+            else:
+                resultado = [chave for chave in anterior[1] if chave in chaves]
+        else:
+            # Começa pelo termo mais longo (normalmente o mais seletivo)
+            ordenados = sorted(termos, key=len, reverse=True)
+            chaves = self._chaves_com_prefixo(ordenados[0])
+            for q in ordenados[1:]:
+                if not chaves:
+                    break
+                chaves &= self._chaves_com_prefixo(q)
+            resultado = sorted(chaves, key=self._ordem.__getitem__)
+
+        self._ultima = (termos, resultado)
+        return [self._objetos[chave] for chave in resultado]
+
+
+@lru_cache(maxsize=65536)
+def trigramas(palavra, fechada=True):
+    """Trigramas da palavra com marcação de início ("  t", " tr", "tri"...). Sem `fechada`
+    (termo ainda sendo digitado) o fim não é marcado: o termo vira prefixo das palavras."""
+    marcada = "  " + palavra + (" " if fechada else "")
+    return frozenset(marcada[i:i + 3] for i in range(len(marcada) - 2))
+
+
+class IndiceTrigramas:
+    """
+    Sugestões ranqueadas para os campos de digitação (código/descrição, cliente/documento).
+
+    As palavras distintas dos documentos formam um vocabulário indexado por prefixo
+    (lista ordenada) e por trigramas. Cada termo digitado vira as palavras que ele
+    completa (prefixo) ou, se não houver nenhuma, as parecidas (trigramas em comum,
+    para erros de digitação). Todos os termos precisam casar; a nota soma a qualidade
+    de cada casamento e favorece termos na mesma ordem e lado a lado no documento
+    ("trilho sup" -> "Trilho superior ..." antes de "Trilho inferior Suprema").
+    """
+
+    def __init__(self, extrair_campos):
+        self._extrair = extrair_campos
+        self._docs = {}         # chave -> (objeto, palavras na ordem do documento)
+        self._ordem = {}        # chave -> sequência de inserção (desempate)
+        self._postings = {}     # palavra -> chaves
+        self._vocabulario = []  # palavras ordenadas (prefixo)
+        self._trigramas = {}    # trigrama -> palavras
+        self._seq = 0
+
+    # --- Manutenção ---
+    def construir(self, objetos):
+        self._docs.clear(); self._ordem.clear(); self._postings.clear(); self._trigramas.clear()
+        for obj in objetos:
+            self._indexar(obj)
+        self._vocabulario = sorted(self._postings)
+
+    def _palavras(self, obj):
+        palavras = []
+        for campo in self._extrair(obj):
+            palavras.extend(tokenizar(campo))
+        return tuple(palavras)
+
+    def _indexar(self, obj, ordem=None):
+        chave = id(obj)
+        palavras = self._palavras(obj)
+        self._docs[chave] = (obj, palavras)
+        if ordem is None:
+            self._seq += 1
+            ordem = self._seq
+        self._ordem[chave] = ordem
+        novas = []
+        for palavra in set(palavras):
+            docs = self._postings.get(palavra)
+            if docs is None:
+                docs = self._postings[palavra] = set()
+                novas.append(palavra)
+                if palavra.isalpha():  # números e códigos só casam por prefixo
+                    for t in trigramas(palavra):
+                        self._trigramas.setdefault(t, set()).add(palavra)
+            docs.add(chave)
+        return novas
+
+    def _desindexar(self, chave):
+        _, palavras = self._docs.pop(chave, (None, ()))
+        for palavra in set(palavras):
+            docs = self._postings.get(palavra)
+            if docs is None:
+                continue
+            docs.discard(chave)
+            if not docs:
+                del self._postings[palavra]
+                for t in (trigramas(palavra) if palavra.isalpha() else ()):
+                    vizinhas = self._trigramas.get(t)
+                    if vizinhas is not None:
+                        vizinhas.discard(palavra)
+                        if not vizinhas:
+                            del self._trigramas[t]
+                i = bisect_left(self._vocabulario, palavra)
+                if i < len(self._vocabulario) and self._vocabulario[i] == palavra:
+                    del self._vocabulario[i]
+        return self._ordem.pop(chave, None)
+
+    def adicionar(self, obj):
+        for palavra in self._indexar(obj):
+            insort(self._vocabulario, palavra)
+
+    def substituir(self, antigo, novo):
+        """Troca um objeto por outro mantendo a posição dele no desempate."""
+        ordem = self._desindexar(id(antigo))
+        for palavra in self._indexar(novo, ordem):
+            insort(self._vocabulario, palavra)
+
+    def remover(self, obj):
+        self._desindexar(id(obj))
+
+    # --- Consulta ---
+    def _casamentos(self, termo):
+        """{palavra do vocabulário: nota 0..1} para um termo digitado."""
+        notas = {}
+        i = bisect_left(self._vocabulario, termo)
+        while i < len(self._vocabulario) and len(notas) < MAX_EXPANSAO:
+            palavra = self._vocabulario[i]
+            if not palavra.startswith(termo):
+                break
+            # Palavra exata vale 1; prefixo vale mais quanto mais da palavra foi digitado
+            notas[palavra] = 1.0 if palavra == termo else 0.8 + 0.15 * len(termo) / len(palavra)
+            i += 1
+        if notas or len(termo) < 3:
+            return notas
+
+        # Nenhuma palavra começa com o termo: procura as parecidas
+        procurados = trigramas(termo, fechada=False)
+        comuns = Counter()
+        for t in procurados:
+            vizinhas = self._trigramas.get(t)
+            if vizinhas and len(vizinhas) <= TRIGRAMA_COMUM:
+                comuns.update(vizinhas)
+        for palavra, n in comuns.most_common(MAX_EXPANSAO):
+            similaridade = n / len(procurados)
+            if similaridade < SIMILARIDADE_MINIMA:
+                break
+            notas[palavra] = 0.7 * similaridade
+        return notas
+
+    def buscar(self, texto, k=MAX_SUGESTOES):
+        """Os `k` objetos mais parecidos com o texto, do melhor para o pior."""
+        termos = tokenizar(texto)
+        if not termos:
+            return []
+        casamentos = [self._casamentos(termo) for termo in termos]
+        if not all(casamentos):
+            return []
+
+        # Documentos que casam com todos os termos (operações de conjunto, sem laço em Python)
+        conjuntos = sorted((set().union(*(self._postings[p] for p in notas)) for notas in casamentos), key=len)
+        candidatos = conjuntos[0].intersection(*conjuntos[1:])
+        if len(candidatos) > MAX_CANDIDATOS:
+            # Consulta muito aberta (uma ou duas letras): só os primeiros cadastrados recebem nota
+            candidatos = heapq.nsmallest(MAX_CANDIDATOS, candidatos, key=self._ordem.__getitem__)
+
+        def nota(chave):
+            palavras = self._docs[chave][1]
+            total, posicoes = 0.0, []
+            for notas in casamentos:
+                # Melhor palavra do documento para o termo e a posição da primeira que casa
+                melhor, posicao = 0.0, -1
+                for i, palavra in enumerate(palavras):
+                    n = notas.get(palavra)
+                    if n is not None:
+                        if posicao < 0:
+                            posicao = i
+                        if n > melhor:
+                            melhor = n
+                total += melhor
+                posicoes.append(posicao)
+            # Termos na ordem digitada e lado a lado, e o primeiro termo abrindo o documento
+            seguidas = sum(1 for a, b in zip(posicoes, posicoes[1:]) if b == a + 1)
+            inicio = 0.3 if posicoes[0] == 0 else 0.0
+            return (total + 0.5 * seguidas + inicio, -len(palavras), -self._ordem[chave])
+
+        melhores = heapq.nlargest(k, candidatos, key=nota)
+        return [self._docs[chave][0] for chave in melhores]
+
+
+class IndiceDaLista:
+    """
+    Índice (IndiceBusca/IndiceTrigramas) de uma lista em memória que muda, montado no
+    primeiro uso (obter) ou fora da thread da interface (preparar/usar). O dono repassa
+    as alterações da lista; elas contam versões mesmo antes do índice existir, para que
+    um índice montado sobre uma lista que já mudou seja descartado.
+    """
+
+    def __init__(self, criar):
+        self._criar = criar
+        self.indice = None
+        self.preparando = False  # montagem em segundo plano em andamento
+        self._versao = 0
+
+    def obter(self, itens):
+        if self.indice is None:
+            self.indice = self._criar()
+            self.indice.construir(itens)
+        return self.indice
+
+    def preparar(self, itens):
+        """
+        (montar, versão): `montar()` trabalha sobre uma cópia de `itens` e pode rodar em
+        outra thread; o resultado entra com usar. None se o índice já existe ou já está
+        sendo montado.
+        """
+        if self.indice is not None or self.preparando:
+            return None
+        self.preparando = True
+        copia, criar = list(itens), self._criar
+
+        def montar():
+            indice = criar()
+            indice.construir(copia)
+            return indice
+        return montar, self._versao
+
+    def usar(self, indice, versao):
+        """Passa a usar o índice montado; False (e nada muda) se a lista mudou nesse meio tempo."""
+        self.preparando = False
+        if indice is None or versao != self._versao:
+            return False
+        self.indice = indice
+        return True
+
+    # --- Alterações da lista ---
+    def construir(self, itens):
+        self._versao += 1
+        if self.indice is not None:
+            self.indice.construir(itens)
+
+    def adicionar(self, obj):
+        self._versao += 1
+        if self.indice is not None:
+            self.indice.adicionar(obj)
+
+    def substituir(self, antigo, novo):
+        self._versao += 1
+        if self.indice is not None:
+            self.indice.substituir(antigo, novo)
+
+    def remover(self, obj):
+        self._versao += 1
+        if self.indice is not None:
+            self.indice.remover(obj)
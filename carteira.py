@@ -0,0 +1,328 @@
+import uuid
+
+from config import ARQUIVO_CLIENTES, BACKEND
+from busca import (IndiceBusca, IndiceDaLista, IndiceTrigramas, campos_cliente, campos_nome_documento,
+                   normalizar, somente_digitos, MAX_SUGESTOES)
+from persistencia import ArquivoVersionado, ConflitoDeVersao
+from instrumentacao import medido
+
+# Separa nome e CPF/CNPJ no texto mostrado ao escolher o cliente: "Fulano — 123.456.789-00"
+SEPARADOR_ROTULO = " — "
+
+
+def chave_documento(cliente):
+    """CPF/CNPJ só com dígitos (ou o nome). Era o id do cliente nos pedidos gravados antes
+    do id gerado (id_cliente_migrado)."""
+    return somente_digitos(cliente.get("cpf_cnpj", "")) or cliente.get("nome", "")
+
+
+def chave_cliente(cliente):
+    """Identifica o cliente no merge entre estações: o id gerado (ou, em arquivos
+    anteriores a ele, o CPF/CNPJ/nome)."""
+    return cliente.get("id") or chave_documento(cliente)
+
+
+def novo_id_cliente():
+    return uuid.uuid4().hex
+
+
+def id_cliente_migrado(chave, ocorrencia=0):
+    """Id dado a um cliente antigo na migração. Sai da chave antiga: duas estações migrando
+    ao mesmo tempo chegam aos mesmos ids (e o merge não duplica ninguém)."""
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"perfibras:cliente:{chave}#{ocorrencia}").hex
+
+
+def rotulo_cliente(cliente):
+    """Texto que identifica o cliente no campo do pedido (nome e documento).
+    Pedidos antigos podem ter só o nome do cliente (string)."""
+    if not isinstance(cliente, dict):
+        return str(cliente)
+    documento = cliente.get("cpf_cnpj", "")
+    return f"{cliente.get('nome', '')}{SEPARADOR_ROTULO}{documento}" if documento else cliente.get("nome", "")
+
+
+# Campos do cliente impressos na proposta: é só o que o pedido guarda dele
+CAMPOS_PROPOSTA = ("nome", "cpf_cnpj", "cidade", "estado", "telefone")
+
+
+def referencia_cliente(cliente):
+    """
+    Cliente como fica gravado no pedido: "id" do cadastro mais a foto dos campos da
+    proposta, sem os vazios. Pedidos antigos têm o cadastro inteiro (ou só o nome, string)
+    sem id: ficam com o id que a migração deu ao cliente (id_cliente_migrado), e não com a
+    chave antiga, para continuarem ligados a ele depois de editado o nome ou o CPF/CNPJ.
+    """
+    if not isinstance(cliente, dict):
+        return {"id": id_cliente_migrado(str(cliente)), "nome": str(cliente)}
+    referencia = {"id": cliente.get("id") or id_cliente_migrado(chave_documento(cliente))}
+    for campo in CAMPOS_PROPOSTA:
+        if cliente.get(campo):
+            referencia[campo] = cliente[campo]
+    return referencia
+
+
+def compartilhar_clientes(pedidos, compartilhados=None):
+    """
+    Troca o cliente de cada pedido pela referência compacta e faz pedidos com a mesma
+    foto apontarem para o mesmo dict (uma cópia por cliente na memória, não uma por pedido).
+    Devolve quantos pedidos tinham o cadastro inteiro.
+    """
+    compartilhados = {} if compartilhados is None else compartilhados
+    migrados = 0
+    for pedido in pedidos:
+        cliente = pedido.get("cliente")
+        referencia = referencia_cliente(cliente) if cliente is not None else None
+        if referencia is None:
+            continue
+        if referencia != cliente:
+            migrados += 1
+        pedido["cliente"] = compartilhados.setdefault(tuple(referencia.items()), referencia)
+    return migrados
+
+
+# --- Funções de Persistência ---
+def abrir_arquivo_clientes():
+    """Fonte versionada dos clientes (carregar/salvar) do backend configurado."""
+    if BACKEND == "sqlite":
+        from banco import banco_padrao
+        return banco_padrao().lista_clientes(chave_cliente)
+    return ArquivoVersionado(ARQUIVO_CLIENTES, chave_cliente)
+
+def carregar_clientes():
+    return abrir_arquivo_clientes().carregar()
+
+@medido("salvar_clientes")
+def salvar_clientes(clientes):
+    arquivo = abrir_arquivo_clientes()
+    arquivo.carregar()
+    return arquivo.salvar(clientes)
+
+
+class ClienteDuplicadoError(ValueError):
+    """Já existe um cliente cadastrado com o mesmo CPF/CNPJ."""
+
+
+class CarteiraClientes:
+    """
+    Clientes em memória, compartilhados por clientes.py e pedidos.py.
+    - índice hash pelo CPF/CNPJ só com dígitos (busca O(1));
+    - índice pelo nome sem acento/maiúsculas;
+    - índice de busca por prefixo (nome, documento, cidade) para o filtro da tela;
+    - sugestões por nome e documento (trigramas) para o pedido;
+    - os dois índices são montados em segundo plano pela tela que precisa deles
+      (preparar_filtro/preparar_sugestoes) ou, sem isso, no primeiro uso;
+    - id gerado e permanente por cliente (o pedido guarda esse id); os cadastros
+      anteriores a ele ganham o id uma vez, ao carregar (migrar_ids);
+    - CPF/CNPJ único: adicionar/atualizar levantam ClienteDuplicadoError.
+    """
+
+    def __init__(self, itens=None, arquivo=None):
+        self.itens = []
+        self.arquivo = arquivo
+        self._filtro = IndiceDaLista(lambda: IndiceBusca(campos_cliente))
+        self._sugestoes = IndiceDaLista(lambda: IndiceTrigramas(campos_nome_documento))
+        self._reindexar(itens or [])
+
+    def _reindexar(self, itens):
+        # Mantém o mesmo objeto lista: as telas guardam referência a self.itens
+        self.itens[:] = itens
+        self._por_documento = {}
+        self._por_nome = {}
+        self._por_id = {c["id"]: c for c in self.itens if c.get("id")}
+        for cliente in self.itens:
+            # Arquivos antigos podem ter documentos repetidos: vale o primeiro cadastrado
+            documento = somente_digitos(cliente.get("cpf_cnpj", ""))
+            if documento:
+                self._por_documento.setdefault(documento, cliente)
+            self._por_nome.setdefault(normalizar(cliente.get("nome", "")).strip(), []).append(cliente)
+        for indice in (self._filtro, self._sugestoes):
+            indice.construir(self.itens)
+
+    @classmethod
+    def carregar(cls):
+        arquivo = abrir_arquivo_clientes()
+        carteira = cls(arquivo.carregar(), arquivo)
+        carteira.migrar_ids()
+        return carteira
+
+    def migrar_ids(self):
+        """Dá o id gerado aos clientes que ainda não têm e grava a lista (só na primeira
+        carga depois da atualização). Devolve quantos clientes foram migrados."""
+        while True:
+            sem_id = [c for c in self.itens if not c.get("id")]
+            if not sem_id:
+                return 0
+            ocorrencias = {}
+            for cliente in sem_id:
+                chave = chave_documento(cliente)
+                cliente["id"] = id_cliente_migrado(chave, ocorrencias.get(chave, 0))
+                ocorrencias[chave] = ocorrencias.get(chave, 0) + 1
+            self._reindexar(self.itens)
+            if self.arquivo is None:
+                return len(sem_id)
+            try:
+                self.salvar()
+                return len(sem_id)
+            except ConflitoDeVersao:
+                self.recarregar()  # outra estação gravou no meio: confere de novo
+
+    def salvar(self):
+        """Grava a lista. Alterações feitas por outras estações entram no merge
+        e os índices são refeitos. Conflito real levanta persistencia.ConflitoDeVersao."""
+        gravados = self.arquivo.salvar(self.itens)
+        if gravados is not self.itens:
+            self._reindexar(gravados)
+
+    def recarregar(self):
+        self._reindexar(self.arquivo.carregar())
+
+    def __len__(self):
+        return len(self.itens)
+
+    # --- Consultas ---
+    def obter_por_id(self, id_cliente):
+        """Cliente pelo id gerado (ou None)."""
+        return self._por_id.get(id_cliente)
+
+    def ids_por_chave_antiga(self):
+        """{chave_documento: id} de todos os clientes: traduz o id dos pedidos gravados com a
+        chave antiga (formatos 3 e 4, antes de referencia_cliente usar o id migrado)."""
+        ids = {}
+        for cliente in self.itens:
+            ids.setdefault(chave_documento(cliente), cliente.get("id"))
+        return ids
+
+    def obter(self, documento):
+        """Cliente pelo CPF/CNPJ, com ou sem pontuação (ou None)."""
+        return self._por_documento.get(somente_digitos(documento))
+
+    def por_nome(self, nome):
+        """Clientes com o nome informado (sem diferenciar acentos/maiúsculas)."""
+        return list(self._por_nome.get(normalizar(nome).strip(), ()))
+
+    def resolver(self, texto):
+        """Cliente escolhido no pedido: pelo documento do rótulo ("Nome — doc"); sem documento,
+        pelo nome exato (o primeiro cadastrado, se houver homônimos)."""
+        nome, separador, documento = texto.rpartition(SEPARADOR_ROTULO)
+        if separador and somente_digitos(documento):
+            cliente = self.obter(documento)
+            if cliente is not None:
+                return cliente
+        else:
+            nome = texto
+        encontrados = self._por_nome.get(normalizar(nome).strip())
+        return encontrados[0] if encontrados else None
+
+    @property
+    def indice(self):
+        """Índice de busca do filtro (montado no primeiro uso)."""
+        return self._filtro.obter(self.itens)
+
+    def filtrar(self, texto):
+        """Clientes que casam com todos os termos (nome, CPF/CNPJ, cidade), na ordem da lista.
+        Texto vazio devolve a lista inteira. Enquanto o índice é montado em segundo plano:
+        o documento exato e os nomes que começam com o texto."""
+        if not texto.strip():
+            return self.itens
+        if self._filtro.indice is None and self._filtro.preparando:
+            return self._buscar_sem_indice(texto)
+        encontrados = self.indice.buscar(texto)
+        return self.itens if encontrados is None else encontrados
+
+    def sugerir(self, texto, k=MAX_SUGESTOES):
+        """Até `k` clientes que combinam com o texto digitado (nome e/ou documento), do melhor ao pior.
+        Enquanto o índice é montado em segundo plano, como no filtro."""
+        if self._sugestoes.indice is None and self._sugestoes.preparando:
+            return self._buscar_sem_indice(texto, k)
+        return self._sugestoes.obter(self.itens).buscar(texto, k)
+
+    def _buscar_sem_indice(self, texto, k=None):
+        """Documento exato e nomes que começam com o texto, pelos índices hash (até `k`)."""
+        cliente = self.obter(texto) if somente_digitos(texto) else None
+        encontrados = [cliente] if cliente is not None else []
+        prefixo = normalizar(texto).strip()
+        for nome, clientes in self._por_nome.items():
+            if k is not None and len(encontrados) >= k:
+                break
+            if prefixo and nome.startswith(prefixo):
+                encontrados.extend(c for c in clientes if c is not cliente)
+        return encontrados[:k]
+
+    # --- Índices montados em segundo plano (busca.IndiceDaLista.preparar/usar) ---
+    def preparar_filtro(self):
+        return self._filtro.preparar(self.itens)
+
+    def usar_filtro(self, indice, versao):
+        return self._filtro.usar(indice, versao)
+
+    def preparar_sugestoes(self):
+        return self._sugestoes.preparar(self.itens)
+
+    def usar_sugestoes(self, indice, versao):
+        return self._sugestoes.usar(indice, versao)
+
+    def posicao(self, cliente):
+        """Posição do cliente em self.itens (por identidade, não por igualdade)."""
+        return next((i for i, c in enumerate(self.itens) if c is cliente), None)
+
+    # --- Alterações ---
+    def _conferir_documento(self, cliente, anterior=None):
+        """Levanta ClienteDuplicadoError se o documento já é de outro cliente (manter o
+        próprio documento na edição é sempre permitido)."""
+        documento = somente_digitos(cliente.get("cpf_cnpj", ""))
+        anterior_doc = somente_digitos(anterior.get("cpf_cnpj", "")) if anterior else ""
+        if documento and documento != anterior_doc and documento in self._por_documento:
+            raise ClienteDuplicadoError(f"Já existe um cliente com o CPF/CNPJ {cliente.get('cpf_cnpj', '')}.")
+
+    def _indexar(self, cliente):
+        if cliente.get("id"):
+            self._por_id[cliente["id"]] = cliente
+        documento = somente_digitos(cliente.get("cpf_cnpj", ""))
+        if documento:
+            self._por_documento.setdefault(documento, cliente)
+        self._por_nome.setdefault(normalizar(cliente.get("nome", "")).strip(), []).append(cliente)
+
+    def _desindexar(self, cliente):
+        if self._por_id.get(cliente.get("id")) is cliente:
+            del self._por_id[cliente["id"]]
+        documento = somente_digitos(cliente.get("cpf_cnpj", ""))
+        if documento and self._por_documento.get(documento) is cliente:
+            del self._por_documento[documento]
+            # Documento repetido de arquivo antigo: o próximo com o mesmo documento assume
+            outro = next((c for c in self.itens if c is not cliente
+                          and somente_digitos(c.get("cpf_cnpj", "")) == documento), None)
+            if outro is not None:
+                self._por_documento[documento] = outro
+        chave = normalizar(cliente.get("nome", "")).strip()
+        homonimos = [c for c in self._por_nome.get(chave, ()) if c is not cliente]
+        if homonimos:
+            self._por_nome[chave] = homonimos
+        else:
+            self._por_nome.pop(chave, None)
+
+    def adicionar(self, cliente):
+        self._conferir_documento(cliente)
+        if not cliente.get("id"):
+            cliente["id"] = novo_id_cliente()
+        self._indexar(cliente)
+        self.itens.append(cliente)
+        for indice in (self._filtro, self._sugestoes):
+            indice.adicionar(cliente)
+
+    def atualizar(self, posicao, cliente):
+        antigo = self.itens[posicao]
+        self._conferir_documento(cliente, antigo)
+        # A edição não muda o id: os pedidos continuam apontando para o mesmo cliente
+        cliente["id"] = antigo.get("id") or cliente.get("id") or novo_id_cliente()
+        self._desindexar(antigo)
+        self.itens[posicao] = cliente
+        self._indexar(cliente)
+        for indice in (self._filtro, self._sugestoes):
+            indice.substituir(antigo, cliente)
+
+    def remover(self, posicao):
+        cliente = self.itens.pop(posicao)
+        self._desindexar(cliente)
+        for indice in (self._filtro, self._sugestoes):
+            indice.remover(cliente)
+        return cliente
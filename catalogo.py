@@ -0,0 +1,157 @@
+from bisect import bisect_left, insort
+from itertools import islice
+
+from config import ARQUIVO_ACESSORIOS, BACKEND
+from busca import normalizar, IndiceDaLista, IndiceTrigramas, campos_acessorio, MAX_SUGESTOES
+from persistencia import ArquivoVersionado
+from instrumentacao import medido
+
+
+def normalizar_codigo(codigo):
+    """Código sem espaços nas pontas e em maiúsculas: ' tr-01 ' -> 'TR-01'."""
+    return str(codigo).strip().upper()
+
+
+# --- Funções de Persistência ---
+def abrir_arquivo_acessorios():
+    """Fonte versionada do catálogo (carregar/salvar) do backend configurado."""
+    chave = lambda item: normalizar_codigo(item.get("codigo", ""))
+    if BACKEND == "sqlite":
+        from banco import banco_padrao
+        return banco_padrao().lista_acessorios(chave)
+    return ArquivoVersionado(ARQUIVO_ACESSORIOS, chave)
+
+def carregar_acessorios():
+    return abrir_arquivo_acessorios().carregar()
+
+@medido("salvar_acessorios")
+def salvar_acessorios(acessorios):
+    arquivo = abrir_arquivo_acessorios()
+    arquivo.carregar()
+    return arquivo.salvar(acessorios)
+
+
+class CodigoDuplicadoError(ValueError):
+    """Já existe um item cadastrado com o mesmo código."""
+
+
+class CatalogoAcessorios:
+    """
+    Catálogo de perfis/itens em memória, compartilhado por acessorios.py e pedidos.py.
+    - índice hash por código normalizado (busca O(1));
+    - índice ordenado por descrição (sem acento/maiúsculas);
+    - sugestões por código e descrição (trigramas), montadas em segundo plano pela tela
+      (preparar_sugestoes/usar_sugestoes) ou no primeiro uso;
+    - código único: adicionar/atualizar levantam CodigoDuplicadoError.
+    """
+
+    def __init__(self, itens=None, arquivo=None):
+        self.itens = []
+        self.arquivo = arquivo
+        self._sugestoes = IndiceDaLista(lambda: IndiceTrigramas(campos_acessorio))
+        self._reindexar(itens or [])
+
+    def _reindexar(self, itens):
+        self.itens[:] = itens  # mesmo objeto lista: as telas guardam a referência
+        self._por_codigo = {}
+        for item in self.itens:
+            # Arquivos antigos podem ter códigos repetidos: vale o primeiro cadastrado
+            self._por_codigo.setdefault(normalizar_codigo(item.get("codigo", "")), item)
+        self._por_descricao = sorted(self._chave_descricao(i) for i in self._por_codigo.values())
+        self._sugestoes.construir(self.itens)
+
+    @classmethod
+    def carregar(cls):
+        arquivo = abrir_arquivo_acessorios()
+        return cls(arquivo.carregar(), arquivo)
+
+    def salvar(self):
+        """Grava o catálogo. Alterações feitas por outras estações entram no merge
+        e os índices são refeitos. Conflito real levanta persistencia.ConflitoDeVersao."""
+        gravados = self.arquivo.salvar(self.itens)
+        if gravados is not self.itens:
+            self._reindexar(gravados)
+
+    def recarregar(self):
+        self._reindexar(self.arquivo.carregar())
+
+    @staticmethod
+    def _chave_descricao(item):
+        return (normalizar(item.get("nome", "")), normalizar_codigo(item.get("codigo", "")))
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __contains__(self, codigo):
+        return normalizar_codigo(codigo) in self._por_codigo
+
+    def obter(self, codigo):
+        """Item pelo código (ou None)."""
+        return self._por_codigo.get(normalizar_codigo(codigo))
+
+    def por_descricao(self, prefixo=""):
+        """Itens em ordem alfabética de descrição, opcionalmente filtrados por prefixo."""
+        prefixo = normalizar(prefixo)
+        i = bisect_left(self._por_descricao, (prefixo, ""))
+        while i < len(self._por_descricao) and self._por_descricao[i][0].startswith(prefixo):
+            yield self._por_codigo[self._por_descricao[i][1]]
+            i += 1
+
+    def sugerir(self, texto, k=MAX_SUGESTOES):
+        """Até `k` itens que combinam com o texto digitado (código e/ou descrição), do melhor ao pior.
+        Enquanto o índice é montado em segundo plano: o código exato e as descrições que começam
+        com o texto."""
+        if self._sugestoes.indice is None and self._sugestoes.preparando:
+            item = self.obter(texto)
+            encontrados = [item] if item is not None else []
+            outros = (i for i in self.por_descricao(texto.strip()) if i is not item) if texto.strip() else ()
+            return encontrados + list(islice(outros, k - len(encontrados)))
+        return self._sugestoes.obter(self.itens).buscar(texto, k)
+
+    def preparar_sugestoes(self):
+        """(montar, versão) para montar as sugestões em segundo plano (busca.IndiceDaLista.preparar)."""
+        return self._sugestoes.preparar(self.itens)
+
+    def usar_sugestoes(self, indice, versao):
+        return self._sugestoes.usar(indice, versao)
+
+    def _indexar(self, item):
+        codigo = normalizar_codigo(item.get("codigo", ""))
+        if codigo in self._por_codigo:
+            raise CodigoDuplicadoError(f"Já existe um item com o código {item.get('codigo', '')}.")
+        self._por_codigo[codigo] = item
+        insort(self._por_descricao, self._chave_descricao(item))
+
+    def _desindexar(self, item):
+        codigo = normalizar_codigo(item.get("codigo", ""))
+        if self._por_codigo.get(codigo) is not item:
+            return
+        del self._por_codigo[codigo]
+        chave = self._chave_descricao(item)
+        i = bisect_left(self._por_descricao, chave)
+        if i < len(self._por_descricao) and self._por_descricao[i] == chave:
+            del self._por_descricao[i]
+
+    def adicionar(self, item):
+        self._indexar(item)
+        self.itens.append(item)
+        self._sugestoes.adicionar(item)
+
+    def atualizar(self, posicao, item):
+        antigo = self.itens[posicao]
+        indexado = self.obter(antigo.get("codigo", "")) is antigo
+        self._desindexar(antigo)
+        try:
+            self._indexar(item)
+        except CodigoDuplicadoError:
+            if indexado:
+                self._indexar(antigo)
+            raise
+        self.itens[posicao] = item
+        self._sugestoes.substituir(antigo, item)
+
+    def remover(self, posicao):
+        item = self.itens.pop(posicao)
+        self._desindexar(item)
+        self._sugestoes.remover(item)
+        return item
@@ -1,25 +1,15 @@
-import json
-import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QMessageBox, 
+    QPushButton, QTableView, QMessageBox,
     QHeaderView, QDesktopWidget, QTabWidget
 )
-from config import ARQUIVO_CLIENTES
-
-def carregar_clientes():
-    if os.path.exists(ARQUIVO_CLIENTES):
-        try:
-            with open(ARQUIVO_CLIENTES, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except:
-            return []
-    return []
-
-def salvar_clientes(clientes):
-    os.makedirs(os.path.dirname(ARQUIVO_CLIENTES), exist_ok=True)
-    with open(ARQUIVO_CLIENTES, "w", encoding="utf-8") as f:
-        json.dump(clientes, f, indent=4, ensure_ascii=False)
+from PyQt5.QtCore import QTimer, QThreadPool
+from carteira import ClienteDuplicadoError
+from persistencia import ConflitoDeVersao
+from sessao import sessao
+from modelos import ModeloClientes
+from tarefas import TarefaIndice
+from instrumentacao import medido
 
 class TelaClientes(QWidget):
     def __init__(self):
@@ -27,8 +17,12 @@ class TelaClientes(QWidget):
         self.setWindowTitle("Gestão de Clientes")
         self.ajustar_resolucao()
         
-        self.clientes = carregar_clientes()
+        # Carteira compartilhada com as outras telas (sessao.SessaoDados), já indexada
+        self.sessao = sessao()
+        self.carteira = self.sessao.carteira
+        self.clientes = self.carteira.itens
         self.cliente_em_edicao = None
+        self.tarefa_filtro = None
 
         # Layout Principal com Abas
         layout_principal = QVBoxLayout()
@@ -47,6 +41,34 @@ class TelaClientes(QWidget):
 
         layout_principal.addWidget(self.abas)
         self.setLayout(layout_principal)
+        self.sessao.clientes_alterados.connect(self.atualizar_tabela)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.preparar_filtro()
+
+    def preparar_filtro(self):
+        """Monta o índice do filtro numa thread do pool assim que a tela abre. Até ficar
+        pronto, o filtro usa os índices da carteira por CPF/CNPJ e nome."""
+        preparo = self.carteira.preparar_filtro()
+        if preparo is None:
+            return
+        montar, versao = preparo
+        tarefa = TarefaIndice(montar)
+        tarefa.setAutoDelete(False)
+        tarefa.sinais.concluido.connect(lambda _, t=tarefa, v=versao: self.filtro_pronto(t, v))
+        tarefa.sinais.falhou.connect(lambda _, t=tarefa: self.filtro_pronto(t, None))
+        self.tarefa_filtro = tarefa
+        QThreadPool.globalInstance().start(tarefa)
+
+    def filtro_pronto(self, tarefa, versao):
+        self.tarefa_filtro = None
+        if versao is None:
+            self.carteira.usar_filtro(None, None)  # falhou: o índice é montado no primeiro uso
+        elif not self.carteira.usar_filtro(tarefa.indice, versao):
+            self.preparar_filtro()  # a lista mudou durante a montagem: monta de novo
+        elif self.input_filtro.text().strip():
+            self.atualizar_tabela()  # troca o resultado provisório pelo do índice
 
     def ajustar_resolucao(self):
         tela = QDesktopWidget().screenGeometry()
@@ -56,21 +78,43 @@ class TelaClientes(QWidget):
         pos_y = int((tela.height() - altura) / 2)
         self.setGeometry(pos_x, pos_y, largura, altura)
 
+    def gravar(self):
+        """Salva a lista (com merge das alterações de outras estações). Em conflito, recarrega."""
+        try:
+            self.sessao.salvar_clientes()
+            return True
+        except ConflitoDeVersao as e:
+            QMessageBox.warning(self, "Conflito", f"{e}\nA lista foi recarregada; refaça a alteração.")
+            self.sessao.recarregar_clientes()
+            return False
+
     # --- ABA 1: LISTAGEM ---
     def inicializar_aba_listagem(self):
         layout = QVBoxLayout()
 
-        self.tabela = QTableWidget()
-        self.tabela.setColumnCount(10)
-        self.tabela.setHorizontalHeaderLabels(
-            ["Nome", "CPF/CNPJ", "Email", "Telefone", "Endereço", "Nº", "Bairro", "Cidade", "Estado", "IE"]
-        )
-        self.tabela.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela.setSelectionBehavior(QTableWidget.SelectRows)
-        self.tabela.setSelectionMode(QTableWidget.SingleSelection)
-        
+        self.input_filtro = QLineEdit()
+        self.input_filtro.setPlaceholderText("🔍 Filtrar por nome, CPF/CNPJ ou cidade...")
+        # Debounce: só filtra quando a digitação dá uma pausa
+        self.timer_filtro = QTimer(self)
+        self.timer_filtro.setSingleShot(True)
+        self.timer_filtro.setInterval(150)
+        self.timer_filtro.timeout.connect(self.atualizar_tabela)
+        self.input_filtro.textChanged.connect(self.timer_filtro.start)
+        layout.addWidget(self.input_filtro)
+
+        # Tabela virtual: o modelo entrega as linhas sob demanda (lista inteira ou filtrada)
+        self.modelo = ModeloClientes(self)
+        self.tabela = QTableView()
+        self.tabela.setModel(self.modelo)
+        self.tabela.setEditTriggers(QTableView.NoEditTriggers)
+        self.tabela.setSelectionBehavior(QTableView.SelectRows)
+        self.tabela.setSelectionMode(QTableView.SingleSelection)
+        self.tabela.verticalHeader().setVisible(False)
+
+        # Larguras medidas uma vez, no primeiro lote (ResizeToContents mediria todas as células)
         header = self.tabela.horizontalHeader()
-        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setStretchLastSection(True)
 
         layout.addWidget(self.tabela)
 
@@ -89,21 +133,18 @@ class TelaClientes(QWidget):
 
         self.aba_listagem.setLayout(layout)
         self.atualizar_tabela()
+        self.tabela.resizeColumnsToContents()
 
+    @medido("clientes.atualizar_tabela", lambda self: {"linhas": len(self.clientes)})
     def atualizar_tabela(self):
-        self.tabela.setRowCount(0)
-        for row, c in enumerate(self.clientes):
-            self.tabela.insertRow(row)
-            self.tabela.setItem(row, 0, QTableWidgetItem(c.get("nome", "")))
-            self.tabela.setItem(row, 1, QTableWidgetItem(c.get("cpf_cnpj", "")))
-            self.tabela.setItem(row, 2, QTableWidgetItem(c.get("email", "")))
-            self.tabela.setItem(row, 3, QTableWidgetItem(c.get("telefone", "")))
-            self.tabela.setItem(row, 4, QTableWidgetItem(c.get("endereco", "")))
-            self.tabela.setItem(row, 5, QTableWidgetItem(c.get("numero", "")))
-            self.tabela.setItem(row, 6, QTableWidgetItem(c.get("bairro", "")))
-            self.tabela.setItem(row, 7, QTableWidgetItem(c.get("cidade", "")))
-            self.tabela.setItem(row, 8, QTableWidgetItem(c.get("estado", "")))
-            self.tabela.setItem(row, 9, QTableWidgetItem(c.get("ie", "")))
+        self.modelo.definir_linhas(self.carteira.filtrar(self.input_filtro.text()))
+
+    def cliente_selecionado(self):
+        """Posição em self.clientes do cliente selecionado na tabela (ou None)."""
+        linha = self.tabela.currentIndex().row()
+        if linha < 0:
+            return None
+        return self.carteira.posicao(self.modelo.cliente(linha))
 
     # --- ABA 2: CADASTRO ---
     def inicializar_aba_cadastro(self):
@@ -158,17 +199,21 @@ class TelaClientes(QWidget):
             QMessageBox.warning(self, "Erro", "Nome e CPF/CNPJ são obrigatórios!")
             return
 
-        self.clientes.append(novo_c)
-        salvar_clientes(self.clientes)
+        try:
+            self.carteira.adicionar(novo_c)
+        except ClienteDuplicadoError as e:
+            QMessageBox.warning(self, "Erro", str(e))
+            return
+        if not self.gravar():
+            return
         QMessageBox.information(self, "Sucesso", "Cliente cadastrado!")
         
         for input in self.inputs_cad.values(): input.clear()
-        self.atualizar_tabela()
         self.abas.setCurrentWidget(self.aba_listagem)
 
     def preparar_edicao(self):
-        row = self.tabela.currentRow()
-        if row < 0:
+        row = self.cliente_selecionado()
+        if row is None:
             QMessageBox.warning(self, "Erro", "Selecione um cliente!")
             return
 
@@ -185,21 +230,24 @@ class TelaClientes(QWidget):
     def confirmar_edicao(self):
         dados_atualizados = {chave: input.text().strip() for chave, input in self.inputs_edit.items()}
         
-        self.clientes[self.cliente_em_edicao] = dados_atualizados
-        salvar_clientes(self.clientes)
+        try:
+            self.carteira.atualizar(self.cliente_em_edicao, dados_atualizados)
+        except ClienteDuplicadoError as e:
+            QMessageBox.warning(self, "Erro", str(e))
+            return
+        if not self.gravar():
+            return
         
-        self.atualizar_tabela()
         self.abas.removeTab(self.abas.indexOf(self.aba_edicao))
         self.abas.setCurrentWidget(self.aba_listagem)
         QMessageBox.information(self, "Sucesso", "Dados atualizados!")
 
     def excluir_cliente(self):
-        row = self.tabela.currentRow()
-        if row < 0:
+        row = self.cliente_selecionado()
+        if row is None:
             QMessageBox.warning(self, "Erro", "Selecione um cliente!")
             return
 
         if QMessageBox.question(self, "Excluir", "Deseja excluir?", QMessageBox.Yes|QMessageBox.No) == QMessageBox.Yes:
-            self.clientes.pop(row)
-            salvar_clientes(self.clientes)
-            self.atualizar_tabela()
+            self.carteira.remover(row)
+            self.gravar()
@@ -6,8 +6,12 @@ def criar_pasta_dados():
     Cria a pasta de dados dentro do diretório do usuário (AppData\\Roaming\\NelsonRosa\\dados).
     Essa abordagem é ideal para programas instalados com Inno Setup.
     """
-    pasta_base = Path(os.getenv("APPDATA"))  # Exemplo: C:\Users\Diego\AppData\Roaming
-    pasta_dados = pasta_base / "NelsonRosa" / "dados"
+    if os.getenv("PERFIBRAS_DADOS"):
+        # Pasta explícita (exportação em lote, testes, outra estação)
+        pasta_dados = Path(os.getenv("PERFIBRAS_DADOS"))
+    else:
+        pasta_base = Path(os.getenv("APPDATA"))  # Exemplo: C:\Users\Diego\AppData\Roaming
+        pasta_dados = pasta_base / "NelsonRosa" / "dados"
     pasta_dados.mkdir(parents=True, exist_ok=True)
     return pasta_dados
 
@@ -19,8 +23,28 @@ PASTA_DADOS = criar_pasta_dados()
 ARQUIVO_CLIENTES = PASTA_DADOS / "clientes.json"
 ARQUIVO_ACESSORIOS = PASTA_DADOS / "acessorios.json"
 ARQUIVO_PEDIDOS = PASTA_DADOS / "pedidos.json"
+ARQUIVO_PRECO_KG = PASTA_DADOS / "preco_aluminio.json"
+
+# Troca de arquivos de uma restauração ainda não concluída (restauracao.py), retomada na abertura
+ARQUIVO_RESTAURACAO_PENDENTE = PASTA_DADOS / "restauracao.pendente"
+
+# ✅ Backend de armazenamento: "json" (padrão) ou "sqlite" (banco único em WAL)
+BACKEND = os.getenv("PERFIBRAS_BACKEND", "json").strip().lower()
+ARQUIVO_BANCO = PASTA_DADOS / "perfibras.db"
+
+# ✅ Retenção dos backups (avô-pai-filho): gerações diárias, semanais e mensais mantidas
+RETENCAO_DIARIOS = int(os.getenv("PERFIBRAS_BACKUP_DIARIOS", "7"))
+RETENCAO_SEMANAIS = int(os.getenv("PERFIBRAS_BACKUP_SEMANAIS", "4"))
+RETENCAO_MENSAIS = int(os.getenv("PERFIBRAS_BACKUP_MENSAIS", "12"))
+
+# ✅ Períodos dos pedidos: os últimos N meses (o atual incluído) ficam abertos em pedidos.json;
+# os anteriores viram arquivos mensais compactados, só leitura (periodos.py)
+MESES_ABERTOS = max(1, int(os.getenv("PERFIBRAS_MESES_ABERTOS", "2")))
+
+# ✅ Instrumentação de desempenho: PERFIBRAS_INSTRUMENTAR=1 ou um arquivo "instrumentar" na pasta de dados
+INSTRUMENTAR = os.getenv("PERFIBRAS_INSTRUMENTAR") == "1" or (PASTA_DADOS / "instrumentar").exists()
+ARQUIVO_LOG_DESEMPENHO = PASTA_DADOS / "desempenho.log"
+ARQUIVO_RESUMO_DESEMPENHO = PASTA_DADOS / "desempenho_resumo.txt"
 
 # ✅ Lista principal usada para backup ou referência
 ARQUIVOS_SISTEMA = [ARQUIVO_CLIENTES, ARQUIVO_ACESSORIOS, ARQUIVO_PEDIDOS]
-
-print("📂 Pasta de dados:", PASTA_DADOS)
\ No newline at end of file
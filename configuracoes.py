@@ -0,0 +1,92 @@
+import json
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, pyqtSignal
+
+from config import ARQUIVO_PRECO_KG
+from persistencia import salvar_json
+
+
+# --- Funções de Persistência ---
+def carregar_preco_kg():
+    """Lê o preço do kg do alumínio direto do arquivo (0.0 se não houver ou estiver ilegível)."""
+    if os.path.exists(ARQUIVO_PRECO_KG):
+        try:
+            with open(ARQUIVO_PRECO_KG, "r", encoding="utf-8") as f:
+                return float(json.load(f).get("preco_kg", 0.0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return 0.0
+    return 0.0
+
+def salvar_preco_kg(valor):
+    salvar_json({"preco_kg": float(valor)}, ARQUIVO_PRECO_KG)
+
+
+def _assinatura(caminho):
+    """(mtime, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+# ==============================
+# Serviço compartilhado do preço do kg
+# ==============================
+class ConfiguracaoPreco(QObject):
+    """
+    Preço do kg em memória, compartilhado por todas as janelas do processo.
+    O arquivo só é relido quando o QFileSystemWatcher avisa e o mtime mudou;
+    as janelas recebem preco_alterado em vez de consultar o disco.
+    """
+
+    preco_alterado = pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._preco = carregar_preco_kg()
+        self._assinatura = _assinatura(ARQUIVO_PRECO_KG)
+        # A gravação atômica troca o arquivo (os.replace), o que derruba o watch do
+        # arquivo; a pasta também é observada para voltar a vigiá-lo.
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.addPath(str(os.path.dirname(ARQUIVO_PRECO_KG)))
+        self._vigiar_arquivo()
+        self._watcher.fileChanged.connect(self.verificar)
+        self._watcher.directoryChanged.connect(self.verificar)
+
+    def _vigiar_arquivo(self):
+        caminho = str(ARQUIVO_PRECO_KG)
+        if os.path.exists(caminho) and caminho not in self._watcher.files():
+            self._watcher.addPath(caminho)
+
+    @property
+    def preco_kg(self):
+        return self._preco
+
+    def definir(self, valor):
+        salvar_preco_kg(valor)
+        self._atualizar(float(valor), _assinatura(ARQUIVO_PRECO_KG))
+
+    def verificar(self, *_):
+        """Relê o arquivo se ele mudou desde a última leitura (outra janela ou estação)."""
+        self._vigiar_arquivo()
+        assinatura = _assinatura(ARQUIVO_PRECO_KG)
+        if assinatura != self._assinatura:
+            self._atualizar(carregar_preco_kg(), assinatura)
+
+    def _atualizar(self, preco, assinatura):
+        self._assinatura = assinatura
+        if preco != self._preco:
+            self._preco = preco
+            self.preco_alterado.emit(preco)
+
+
+_configuracao = None
+
+def configuracao_preco():
+    """Instância única do serviço (precisa de um QApplication criado)."""
+    global _configuracao
+    if _configuracao is None:
+        _configuracao = ConfiguracaoPreco()
+    return _configuracao
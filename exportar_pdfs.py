@@ -0,0 +1,171 @@
+"""
+Exportação em lote das propostas em PDF, sem abrir a interface.
+
+Uso:
+    python exportar_pdfs.py DESTINO [--de 01/10/2026] [--ate 31/10/2026]
+                            [--cliente "nome ou CPF/CNPJ"] [--numero-de 1001] [--numero-ate 1500]
+                            [--processos N] [--dados PASTA]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+
+# ==============================
+# Filtro e nomes de arquivo
+# ==============================
+def _data(texto):
+    """'05/10/2026' -> date (None se vazio ou fora do padrão)."""
+    try:
+        return datetime.strptime(str(texto).strip(), "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+def filtrar_pedidos(pedidos, de=None, ate=None, cliente=None, numero_de=None, numero_ate=None):
+    """Pedidos que atendem a todos os filtros informados (datas no formato dd/mm/aaaa)."""
+    from busca import normalizar, somente_digitos, nome_cliente
+
+    de, ate = _data(de) if de else None, _data(ate) if ate else None
+    termo = normalizar(cliente).strip() if cliente else ""
+    termo_doc = somente_digitos(cliente) if cliente else ""
+    selecionados = []
+    for p in pedidos:
+        if de or ate:
+            data = _data(p.get("data", ""))
+            if data is None or (de and data < de) or (ate and data > ate):
+                continue
+        if numero_de is not None or numero_ate is not None:
+            try:
+                numero = int(p.get("numero"))
+            except (TypeError, ValueError):
+                continue
+            if (numero_de is not None and numero < numero_de) or (numero_ate is not None and numero > numero_ate):
+                continue
+        if termo:
+            cli = p.get("cliente", "")
+            doc = somente_digitos(cli.get("cpf_cnpj", "")) if isinstance(cli, dict) else ""
+            if termo not in normalizar(nome_cliente(p)) and not (termo_doc and termo_doc == doc):
+                continue
+        selecionados.append(p)
+    return selecionados
+
+
+def nomes_arquivos(pedidos):
+    """
+    Nome determinístico por pedido: Proposta_<numero>.pdf, o mesmo sugerido na tela.
+    Números repetidos (arquivos antigos) recebem o início do id interno: Proposta_1005_3fa2c1d0.pdf.
+    """
+    contagem = {}
+    for p in pedidos:
+        contagem[str(p.get("numero", ""))] = contagem.get(str(p.get("numero", "")), 0) + 1
+    nomes = []
+    for p in pedidos:
+        numero = str(p.get("numero", ""))
+        if contagem[numero] > 1:
+            nomes.append(f"Proposta_{numero}_{str(p.get('id', ''))[:8]}.pdf")
+        else:
+            nomes.append(f"Proposta_{numero}.pdf")
+    return nomes
+
+
+# ==============================
+# Geração em paralelo
+# ==============================
+def _renderizar(pedido, caminho):
+    """Executado no processo filho: devolve (caminho, erro)."""
+    from proposta_pdf import gerar_pdf_proposta
+    try:
+        gerar_pdf_proposta(pedido, caminho)
+        return caminho, None
+    except Exception as e:
+        return caminho, f"{type(e).__name__}: {e}"
+
+
+def exportar_pdfs(pedidos, pasta_destino, processos=None, ao_progresso=None):
+    """
+    Gera os PDFs dos pedidos em pasta_destino usando um pool de processos.
+    ao_progresso(feitos, total) é chamado a cada documento concluído.
+    Retorna {"gerados": [...], "falhas": [(numero, caminho, erro)], "segundos": s, "por_segundo": n}.
+    """
+    os.makedirs(pasta_destino, exist_ok=True)
+    trabalhos = [(p, os.path.join(pasta_destino, nome)) for p, nome in zip(pedidos, nomes_arquivos(pedidos))]
+    gerados, falhas = [], []
+    inicio = time.perf_counter()
+    if trabalhos:
+        processos = processos or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(processos, len(trabalhos))) as pool:
+            futuros = {pool.submit(_renderizar, p, caminho): p for p, caminho in trabalhos}
+            for feitos, futuro in enumerate(as_completed(futuros), 1):
+                pedido = futuros[futuro]
+                try:
+                    caminho, erro = futuro.result()
+                except Exception as e:  # processo filho morreu
+                    caminho, erro = "", f"{type(e).__name__}: {e}"
+                if erro:
+                    falhas.append((pedido.get("numero"), caminho, erro))
+                else:
+                    gerados.append(caminho)
+                if ao_progresso:
+                    ao_progresso(feitos, len(trabalhos))
+    segundos = time.perf_counter() - inicio
+    return {"gerados": sorted(gerados), "falhas": falhas, "segundos": segundos,
+            "por_segundo": len(gerados) / segundos if segundos > 0 else 0.0}
+
+
+# ==============================
+# Linha de comando
+# ==============================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera em lote os PDFs das propostas.")
+    parser.add_argument("destino", help="pasta onde os PDFs serão gravados")
+    parser.add_argument("--de", help="data inicial (dd/mm/aaaa)")
+    parser.add_argument("--ate", help="data final (dd/mm/aaaa)")
+    parser.add_argument("--cliente", help="parte do nome ou CPF/CNPJ do cliente")
+    parser.add_argument("--numero-de", type=int, help="número inicial")
+    parser.add_argument("--numero-ate", type=int, help="número final")
+    parser.add_argument("--processos", type=int, help="processos em paralelo (padrão: núcleos da CPU)")
+    parser.add_argument("--dados", help="pasta de dados (padrão: a do sistema)")
+    args = parser.parse_args(argv)
+
+    if args.dados:
+        os.environ["PERFIBRAS_DADOS"] = args.dados
+    for data in (args.de, args.ate):
+        if data and _data(data) is None:
+            parser.error(f"data inválida: {data} (use dd/mm/aaaa)")
+
+    from persistencia import abrir_armazem_pedidos
+    armazem = abrir_armazem_pedidos()
+    pedidos = armazem.carregar()
+    # Meses fechados: só os que o filtro de datas alcança são lidos
+    from periodos import periodo_da_data
+    pedidos = armazem.pedidos_fechados([m for m in armazem.meses_fechados()
+                                        if not (args.de and m < periodo_da_data(args.de))
+                                        and not (args.ate and m > periodo_da_data(args.ate))]) + pedidos
+    armazem.fechar()
+
+    # Filtra pelos cabeçalhos; só os selecionados têm os itens lidos
+    selecionados = [armazem.completo(p) for p in
+                    filtrar_pedidos(pedidos, args.de, args.ate, args.cliente, args.numero_de, args.numero_ate)]
+    print(f"{len(selecionados)} de {len(pedidos)} propostas selecionadas.")
+
+    def progresso(feitos, total):
+        print(f"\r{feitos}/{total}", end="", flush=True)
+
+    resultado = exportar_pdfs(selecionados, args.destino, args.processos, progresso)
+    if selecionados:
+        print()
+    print(f"{len(resultado['gerados'])} PDFs gerados em {resultado['segundos']:.1f}s "
+          f"({resultado['por_segundo']:.1f} propostas/s).")
+    for numero, caminho, erro in resultado["falhas"]:
+        print(f"FALHA proposta {numero} ({caminho}): {erro}", file=sys.stderr)
+    return 1 if resultado["falhas"] else 0
+
+
+if __name__ == "__main__":
+    from multiprocessing import freeze_support
+    freeze_support()
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import os
+import re
+from collections import OrderedDict
+
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt
+
+# Larguras das variantes do fundo (16:9), pensadas nas resoluções comuns dos escritórios
+LARGURAS_FUNDO = (1024, 1366, 1600, 1920)
+QUALIDADE_JPEG = 90
+# Pixmaps já escalados guardados por tamanho (cada um ocupa ~8 MB em Full HD)
+MAX_ESCALADOS = 3
+
+_NOME_VARIANTE = re.compile(r"^fundo_(\d+)x(\d+)\.jpg$")
+
+
+# ==============================
+# Geração das variantes (na hora do build, com Pillow)
+# ==============================
+def gerar_variantes(origem, pasta, larguras=LARGURAS_FUNDO):
+    """Grava em `pasta` o fundo reduzido para cada largura (JPEG). Devolve os caminhos."""
+    from PIL import Image
+
+    os.makedirs(pasta, exist_ok=True)
+    gerados = []
+    with Image.open(origem) as img:
+        img = img.convert("RGB")
+        for largura in larguras:
+            altura = round(largura * img.height / img.width)
+            caminho = os.path.join(pasta, f"fundo_{largura}x{altura}.jpg")
+            img.resize((largura, altura), Image.LANCZOS).save(
+                caminho, "JPEG", quality=QUALIDADE_JPEG, optimize=True, subsampling=0)
+            gerados.append(caminho)
+    return gerados
+
+
+# ==============================
+# Cache do fundo (em execução)
+# ==============================
+class CacheFundo:
+    """
+    Fundo da tela principal. Carrega só a variante mais próxima do tamanho pedido
+    (a menor que ainda cobre a janela) e guarda os pixmaps já escalados por tamanho,
+    de modo que voltar a um tamanho já visto não escala de novo.
+    """
+
+    def __init__(self, original, pasta_variantes=None):
+        self.original = original
+        self.variantes = self._listar(pasta_variantes)  # [(largura, altura, caminho)] crescente
+        self._carregadas = {}
+        self._escalados = OrderedDict()
+
+    @staticmethod
+    def _listar(pasta):
+        if not pasta or not os.path.isdir(pasta):
+            return []
+        variantes = []
+        for nome in os.listdir(pasta):
+            m = _NOME_VARIANTE.match(nome)
+            if m:
+                variantes.append((int(m.group(1)), int(m.group(2)), os.path.join(pasta, nome)))
+        return sorted(variantes)
+
+    def _fonte(self, largura, altura):
+        """Pixmap decodificado da variante adequada (ou do original, sem variantes)."""
+        caminho = self.original
+        for v_larg, v_alt, v_caminho in self.variantes:
+            caminho = v_caminho
+            if v_larg >= largura and v_alt >= altura:
+                break
+        if caminho not in self._carregadas:
+            self._carregadas[caminho] = QPixmap(caminho)
+        return self._carregadas[caminho]
+
+    def rapido(self, tamanho):
+        """Escala sem suavização para acompanhar o redimensionamento (não vai para o cache)."""
+        fonte = self._fonte(tamanho.width(), tamanho.height())
+        if fonte.isNull():
+            return fonte
+        return fonte.scaled(tamanho, Qt.IgnoreAspectRatio, Qt.FastTransformation)
+
+    def pixmap(self, tamanho):
+        """Fundo com suavização no tamanho exato; None se a imagem não puder ser lida."""
+        chave = (tamanho.width(), tamanho.height())
+        if chave in self._escalados:
+            self._escalados.move_to_end(chave)
+            return self._escalados[chave]
+        fonte = self._fonte(*chave)
+        if fonte.isNull():
+            return None
+        if fonte.size() == tamanho:
+            escalado = fonte
+        else:
+            escalado = fonte.scaled(tamanho, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        self._escalados[chave] = escalado
+        while len(self._escalados) > MAX_ESCALADOS:
+            self._escalados.popitem(last=False)
+        return escalado
+
+
+if __name__ == "__main__":
+    # python imagens.py -> regenera fundos/ a partir de logopreta2.png
+    base = os.path.dirname(os.path.abspath(__file__))
+    for caminho in gerar_variantes(os.path.join(base, "logopreta2.png"), os.path.join(base, "fundos")):
+        print(f"{os.path.basename(caminho)}: {os.path.getsize(caminho) // 1024} KB")
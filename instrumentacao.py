@@ -0,0 +1,191 @@
+"""
+Medição de tempo das operações (trechos) e contadores, para diagnosticar lentidão
+numa estação sem console.
+
+Desligada (padrão), `medido` devolve a própria função e `trecho`/`contar` retornam
+na hora. Ligada (config.INSTRUMENTAR), cada trecho vira uma linha JSON em
+desempenho.log (com rotação) e, ao fechar o programa, o resumo da sessão com as
+operações mais lentas é gravado no log e em desempenho_resumo.txt.
+"""
+import atexit
+import functools
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from config import INSTRUMENTAR, ARQUIVO_LOG_DESEMPENHO, ARQUIVO_RESUMO_DESEMPENHO
+
+TAMANHO_LOG = 1024 * 1024   # bytes por arquivo de log antes da rotação
+ARQUIVOS_LOG = 3            # desempenho.log.1 ... .3
+MAIS_LENTAS = 15            # trechos individuais guardados para o resumo
+
+ATIVO = INSTRUMENTAR
+
+
+class _TrechoNulo:
+    """Trecho da instrumentação desligada: não mede nada."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULO = _TrechoNulo()
+
+
+class _Trecho:
+    def __init__(self, nome, campos):
+        self.nome = nome
+        self.campos = campos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        ms = (time.perf_counter() - self.inicio) * 1000
+        if tipo is not None:
+            self.campos["erro"] = tipo.__name__
+        registrar(self.nome, ms, **self.campos)
+        return False
+
+
+# ==============================
+# Estado da sessão (só usado com a instrumentação ligada)
+# ==============================
+_trava = threading.Lock()
+_inicio_sessao = time.time()
+_estatisticas = {}   # nome -> [quantidade, total_ms, maior_ms]
+_contadores = {}
+_lentas = []         # heap (ms, seq, instante, nome, campos) com as MAIS_LENTAS maiores
+_seq = itertools.count()  # desempate no heap (dicts não se comparam)
+_log = None
+
+
+def _abrir_log():
+    global _log
+    logger = logging.getLogger("perfibras.desempenho")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    try:
+        handler = RotatingFileHandler(ARQUIVO_LOG_DESEMPENHO, maxBytes=TAMANHO_LOG,
+                                      backupCount=ARQUIVOS_LOG, encoding="utf-8", delay=True)
+    except OSError:
+        return None
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    _log = logger
+    atexit.register(gravar_resumo)
+    return logger
+
+
+def _escrever(registro):
+    if _log is not None:
+        _log.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+# ==============================
+# API
+# ==============================
+def registrar(nome, ms, **campos):
+    """Registra uma duração já medida (ms)."""
+    if not ATIVO:
+        return
+    agora = time.time()
+    with _trava:
+        estat = _estatisticas.setdefault(nome, [0, 0.0, 0.0])
+        estat[0] += 1
+        estat[1] += ms
+        estat[2] = max(estat[2], ms)
+        item = (ms, next(_seq), agora, nome, campos)
+        if len(_lentas) < MAIS_LENTAS:
+            heapq.heappush(_lentas, item)
+        elif ms > _lentas[0][0]:
+            heapq.heapreplace(_lentas, item)
+    _escrever(dict({"t": datetime.fromtimestamp(agora).isoformat(timespec="milliseconds"), "op": nome,
+                    "ms": round(ms, 3), "thread": threading.current_thread().name, "pid": os.getpid()}, **campos))
+
+
+def trecho(nome, **campos):
+    """Context manager que mede o bloco: `with trecho("clientes.atualizar_tabela", linhas=n):`."""
+    if not ATIVO:
+        return _NULO
+    return _Trecho(nome, campos)
+
+
+def medido(nome, detalhe=None):
+    """
+    Decorador que mede cada chamada. `detalhe(*args, **kwargs)` devolve campos extras
+    (dict) e só é chamado com a instrumentação ligada. Desligada, a função fica intacta.
+    """
+    def decorar(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medir(*args, **kwargs):
+            campos = detalhe(*args, **kwargs) if detalhe else {}
+            with _Trecho(nome, campos):
+                return funcao(*args, **kwargs)
+        return medir
+    return decorar
+
+
+def contar(nome, quantidade=1):
+    """Soma `quantidade` ao contador `nome` (entra só no resumo da sessão)."""
+    if not ATIVO:
+        return
+    with _trava:
+        _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+
+def resumo():
+    """Resumo da sessão: totais por operação, contadores e os trechos mais lentos."""
+    with _trava:
+        operacoes = {nome: {"quantidade": q, "total_ms": round(t, 1), "media_ms": round(t / q, 3),
+                            "maior_ms": round(m, 3)}
+                     for nome, (q, t, m) in sorted(_estatisticas.items(), key=lambda e: -e[1][1])}
+        lentas = [dict({"op": nome, "ms": round(ms, 3),
+                        "t": datetime.fromtimestamp(quando).isoformat(timespec="seconds")}, **campos)
+                  for ms, _, quando, nome, campos in sorted(_lentas, reverse=True)]
+        contadores = dict(_contadores)
+    return {"inicio": datetime.fromtimestamp(_inicio_sessao).isoformat(timespec="seconds"),
+            "duracao_s": round(time.time() - _inicio_sessao, 1), "pid": os.getpid(),
+            "operacoes": operacoes, "contadores": contadores, "mais_lentas": lentas}
+
+
+def gravar_resumo():
+    """Grava o resumo no log e em desempenho_resumo.txt (chamado ao fechar o programa)."""
+    if not ATIVO or not _estatisticas:
+        return
+    dados = resumo()
+    _escrever({"t": datetime.now().isoformat(timespec="milliseconds"), "op": "resumo_sessao", "resumo": dados})
+    linhas = [f"Sessão iniciada em {dados['inicio']} ({dados['duracao_s']:.0f} s, pid {dados['pid']})", "",
+              "Operação                                   Qtd   Total (ms)   Média (ms)   Maior (ms)"]
+    for nome, op in dados["operacoes"].items():
+        linhas.append(f"{nome:<40}{op['quantidade']:>6}{op['total_ms']:>13.1f}{op['media_ms']:>13.2f}"
+                      f"{op['maior_ms']:>13.2f}")
+    if dados["contadores"]:
+        linhas += ["", "Contadores"]
+        linhas += [f"  {nome:<38}{valor:>10}" for nome, valor in sorted(dados["contadores"].items())]
+    linhas += ["", f"{MAIS_LENTAS} operações mais lentas"]
+    for item in dados["mais_lentas"]:
+        extras = ", ".join(f"{k}={v}" for k, v in item.items() if k not in ("op", "ms", "t"))
+        linhas.append(f"  {item['ms']:>10.1f} ms  {item['t']}  {item['op']}" + (f" ({extras})" if extras else ""))
+    try:
+        with open(ARQUIVO_RESUMO_DESEMPENHO, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas) + "\n")
+    except OSError:
+        pass
+
+
+if ATIVO and _abrir_log() is None:
+    ATIVO = False
@@ -1,18 +1,23 @@
+import time
+_INICIO = time.perf_counter()  # o mais cedo possível: base do rastreio de inicialização
+
 import sys
 import os
-import shutil
-import json
+import threading
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication,QGridLayout,QMainWindow, QPushButton, QVBoxLayout, QDesktopWidget, QWidget,
     QHBoxLayout, QFileDialog, QMessageBox, QLabel)
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt, QTimer
-from acessorios import TelaAcessorios
-from pedidos import TelaPedidos
+from PyQt5.QtCore import Qt, QTimer, QThreadPool
+# As telas (e o ReportLab, puxado por pedidos) só são importadas no primeiro uso
+# ou no pré-carregamento feito depois que o menu aparece.
 from config import PASTA_DADOS
-from clientes import TelaClientes
-from pathlib import Path
+from persistencia import ArquivoCorrompidoError
+from imagens import CacheFundo
+from instrumentacao import registrar
+
+# Espera depois do último resizeEvent antes de escalar o fundo com suavização
+ESPERA_REDIMENSIONAR_MS = 150
 
 # ==============================
 # 🔹 Função auxiliar para localizar imagens mesmo após empacotamento
@@ -25,28 +30,79 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# Função para criar pasta de dados
-# --------------------------
-def criar_pasta_dados():
-    """Cria a pasta 'dados' dentro do AppData/Roaming/NelsonRosa."""
-    pasta_appdata = Path(os.getenv("APPDATA")) / "NelsonRosa" / "dados"
-    pasta_appdata.mkdir(parents=True, exist_ok=True)
-    print(f"Pasta de dados: {pasta_appdata}")  # Debug opcional
-    return str(pasta_appdata)
 
-# Caminho base de dados
-PASTA_DADOS = criar_pasta_dados()
+# ==============================
+# 🔹 Rastreio do tempo de inicialização
+# ==============================
+# Orçamento: do início do processo até o menu pintado na tela
+ORCAMENTO_INICIO_MS = 1500
+_etapas_inicio = []
+
+def _inicio_processo():
+    """Segundos desde a criação do processo (inclui o bootloader do executável), se o SO informar."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            criacao, saida, kernel, usuario = (wintypes.FILETIME() for _ in range(4))
+            ctypes.windll.kernel32.GetProcessTimes(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                   ctypes.byref(criacao), ctypes.byref(saida),
+                                                   ctypes.byref(kernel), ctypes.byref(usuario))
+            # FILETIME: intervalos de 100 ns desde 01/01/1601
+            criado = ((criacao.dwHighDateTime << 32) | criacao.dwLowDateTime) / 1e7 - 11644473600
+            return time.time() - criado
+        with open("/proc/self/stat") as f:
+            inicio_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - inicio_ticks / os.sysconf("SC_CLK_TCK")
+    except Exception:
+        return None
+
+def marcar_inicio(etapa):
+    _etapas_inicio.append((etapa, time.perf_counter()))
 
-# Caminhos completos dos arquivos JSON
-ARQUIVO_CLIENTES = os.path.join(PASTA_DADOS, "clientes.json")
-ARQUIVO_ACESSORIOS = os.path.join(PASTA_DADOS, "acessorios.json")
-ARQUIVO_PEDIDOS = os.path.join(PASTA_DADOS, "pedidos.json")
+def relatar_inicio():
+    """
+    Registra as etapas da inicialização. Grava em PASTA_DADOS/inicializacao.log quando
+    PERFIBRAS_TEMPO_INICIO=1 ou quando o orçamento é estourado.
+    """
+    desde_main = time.perf_counter() - _INICIO
+    idade_processo = _inicio_processo()
+    total_ms = (idade_processo or desde_main) * 1000
+    linhas = [f"{datetime.now():%Y-%m-%d %H:%M:%S} inicialização: {total_ms:.0f} ms "
+              f"(orçamento {ORCAMENTO_INICIO_MS} ms, {'executável' if getattr(sys, 'frozen', False) else 'fonte'})"]
+    if idade_processo:
+        linhas.append(f"  {'processo até main.py':<28}{(idade_processo - desde_main) * 1000:8.0f} ms")
+    anterior = _INICIO
+    for etapa, instante in _etapas_inicio:
+        linhas.append(f"  {etapa:<28}{(instante - anterior) * 1000:8.0f} ms")
+        anterior = instante
+    if os.getenv("PERFIBRAS_TEMPO_INICIO") == "1" or total_ms > ORCAMENTO_INICIO_MS:
+        try:
+            with open(os.path.join(PASTA_DADOS, "inicializacao.log"), "a", encoding="utf-8") as f:
+                f.write("\n".join(linhas) + "\n")
+        except OSError:
+            pass
+    registrar("inicializacao", total_ms, executavel=getattr(sys, "frozen", False),
+              etapas={etapa: round((instante - _INICIO) * 1000) for etapa, instante in _etapas_inicio})
+    return total_ms
 
-# Lista principal usada para backup
-ARQUIVOS_SISTEMA = [ARQUIVO_CLIENTES, ARQUIVO_ACESSORIOS, ARQUIVO_PEDIDOS]
 
-# Número máximo de backups a manter
-MAX_BACKUPS = 1
+# ==============================
+# 🔹 Restauração interrompida
+# ==============================
+def retomar_restauracao_pendente():
+    """Conclui, antes de qualquer tela ler os dados, uma restauração que parou no meio da troca."""
+    from config import ARQUIVO_RESTAURACAO_PENDENTE
+    if not ARQUIVO_RESTAURACAO_PENDENTE.exists():
+        return
+    from restauracao import retomar_restauracao
+    try:
+        if retomar_restauracao():
+            QMessageBox.information(None, "Restauração", "A restauração interrompida foi concluída.")
+    except Exception as e:
+        QMessageBox.warning(None, "Restauração", f"Não foi possível concluir a restauração interrompida:\n{e}")
 
 
 # ==============================
@@ -93,14 +149,61 @@ class TelaPrincipal(QMainWindow):
         """)
 
         self.inicializar_ui()
-        self.inicializar_backup_automatico()
         self.ajustar_resolucao()
+        marcar_inicio("menu montado")
+        self._pintado = False
+        QApplication.instance().aboutToQuit.connect(self.encerrar)
+
+    def encerrar(self):
+        """Fecha a sessão de dados (espera a compactação do diário, se houver)."""
+        if "sessao" in sys.modules:  # só existe se alguma tela foi aberta
+            from sessao import sessao
+            sessao().fechar()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._pintado:
+            # Depois do primeiro paint: relatório de tempo, backup automático e pré-carregamento
+            self._pintado = True
+            QTimer.singleShot(0, self.apos_primeira_pintura)
+
+    def apos_primeira_pintura(self):
+        marcar_inicio("primeira pintura")
+        relatar_inicio()
+        self.atualizar_fundo()
+        self.inicializar_backup_automatico()
+        self.precarregar_modulos()
+
+    def precarregar_modulos(self):
+        """Importa em segundo plano o que é pesado (ReportLab) e, com o menu ocioso, as telas."""
+        def importar_pdf():
+            import proposta_pdf  # noqa: F401
+        threading.Thread(target=importar_pdf, daemon=True).start()
+        # Módulos de tela ficam na thread da interface, um por vez, quando não há eventos
+        for i, importar in enumerate((self._importar_pedidos, self._importar_clientes, self._importar_acessorios)):
+            QTimer.singleShot(100 * (i + 1), importar)
+
+    @staticmethod
+    def _importar_pedidos():
+        from pedidos import TelaPedidos
+        return TelaPedidos
+
+    @staticmethod
+    def _importar_clientes():
+        from clientes import TelaClientes
+        return TelaClientes
+
+    @staticmethod
+    def _importar_acessorios():
+        from acessorios import TelaAcessorios
+        return TelaAcessorios
 
     def ajustar_resolucao(self):
         tela = QDesktopWidget().screenGeometry()
         self.setGeometry(0, 0, tela.width(), tela.height())
 
     def inicializar_ui(self):
+        self.criar_fundo()
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         
@@ -156,35 +259,67 @@ class TelaPrincipal(QMainWindow):
     # ==============================
     # Fundo dinâmico
     # ==============================
+    def criar_fundo(self):
+        """Label atrás dos cards; a imagem só é carregada depois da primeira pintura."""
+        self.label_fundo = QLabel(self)
+        self.label_fundo.lower()
+        self.fundo = CacheFundo(resource_path("logopreta2.png"), resource_path("fundos"))
+        self._fundo_ativo = False
+        # Redimensionamentos seguidos viram uma única escala suave quando param
+        self.timer_fundo = QTimer(self)
+        self.timer_fundo.setSingleShot(True)
+        self.timer_fundo.setInterval(ESPERA_REDIMENSIONAR_MS)
+        self.timer_fundo.timeout.connect(self.atualizar_fundo)
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.atualizar_fundo()
+        if not self._fundo_ativo:
+            return
+        self.label_fundo.resize(self.size())
+        if self.label_fundo.pixmap() is not None and not self.label_fundo.pixmap().isNull():
+            # Enquanto arrasta: escala rápida, sem suavização
+            self.label_fundo.setPixmap(self.fundo.rapido(self.size()))
+        self.timer_fundo.start()
 
     def atualizar_fundo(self):
         """Faz o fundo preencher toda a tela (sem bordas)"""
-        if hasattr(self, "pixmap_original"):
-            scaled_pixmap = self.pixmap_original.scaled(
-                self.size(),
-                Qt.IgnoreAspectRatio,
-                Qt.SmoothTransformation
-            )
-            self.label_fundo.setPixmap(scaled_pixmap)
+        self._fundo_ativo = True
+        pixmap = self.fundo.pixmap(self.size())
+        if pixmap is not None:
+            self.label_fundo.setPixmap(pixmap)
             self.label_fundo.resize(self.size())
 
     # ==============================
     # Telas
     # ==============================
+    def criar_tela(self, classe):
+        """Abre a tela; um arquivo de dados ilegível é avisado em vez de virar lista vazia."""
+        try:
+            return classe()
+        except ArquivoCorrompidoError as e:
+            QMessageBox.critical(self, "Arquivo de dados danificado",
+                                 f"Não foi possível ler os dados:\n{e}\n\nRestaure um backup antes de continuar.")
+            return None
+
+    def abrir_tela(self, atributo, importar):
+        """Reaproveita a janela já criada (com seu estado); só cria na primeira vez."""
+        tela = getattr(self, atributo, None)
+        if tela is None:
+            tela = self.criar_tela(importar())
+            setattr(self, atributo, tela)
+        if tela:
+            tela.showNormal()
+            tela.raise_()
+            tela.activateWindow()
+
     def abrir_clientes(self):
-        self.tela_clientes = TelaClientes()
-        self.tela_clientes.show()
+        self.abrir_tela("tela_clientes", self._importar_clientes)
 
     def abrir_acessorios(self):
-        self.tela_acessorios = TelaAcessorios()
-        self.tela_acessorios.show()
+        self.abrir_tela("tela_acessorios", self._importar_acessorios)
 
     def abrir_pedidos(self):
-        self.tela_pedidos = TelaPedidos()
-        self.tela_pedidos.show()
+        self.abrir_tela("tela_pedidos", self._importar_pedidos)
 
     # ==============================
     # Backup manual
@@ -193,8 +328,7 @@ class TelaPrincipal(QMainWindow):
         pasta_backup = QFileDialog.getExistingDirectory(self, "Selecionar Pasta de Backup")
         if not pasta_backup:
             return
-        self.realizar_backup(pasta_backup)
-        QMessageBox.information(self, "Backup Concluído", f"Backup realizado com sucesso em:\n{pasta_backup}")
+        self.iniciar_backup(pasta_backup, manual=True)
 
     # ==============================
     # Restauração manual
@@ -211,12 +345,32 @@ class TelaPrincipal(QMainWindow):
         )
         if confirm != QMessageBox.Yes:
             return
-        for arquivo in ARQUIVOS_SISTEMA:
-            nome = os.path.basename(arquivo)
-            arquivo_backup = os.path.join(pasta_backup, nome)
-            if os.path.exists(arquivo_backup):
-                shutil.copy2(arquivo_backup, arquivo)
-        QMessageBox.information(self, "Restauração Concluída", "Backup restaurado com sucesso!\nReinicie o sistema para atualizar as telas.")
+        # Conferência e preparação em segundo plano; a troca é feita aqui, com as telas abertas
+        from tarefas import TarefaRestauracao
+        tarefa = TarefaRestauracao(pasta_backup)
+        tarefa.setAutoDelete(False)
+        tarefa.sinais.concluido.connect(lambda _: self.restauracao_preparada(tarefa))
+        tarefa.sinais.falhou.connect(self.restauracao_falhou)
+        self.tarefa_restauracao = tarefa
+        self.btn_restaurar.setEnabled(False)
+        QThreadPool.globalInstance().start(tarefa)
+
+    def restauracao_preparada(self, tarefa):
+        from sessao import sessao
+        self.tarefa_restauracao = None
+        self.btn_restaurar.setEnabled(True)
+        try:
+            sessao().restaurar(tarefa.preparada)
+        except Exception as e:
+            QMessageBox.critical(self, "Restauração", f"Falha ao trocar os arquivos:\n{e}\n\n"
+                                 "A troca será concluída na próxima abertura do programa.")
+            return
+        QMessageBox.information(self, "Restauração Concluída", "Backup restaurado com sucesso!\nAs telas abertas já mostram os dados restaurados.")
+
+    def restauracao_falhou(self, erro):
+        self.tarefa_restauracao = None
+        self.btn_restaurar.setEnabled(True)
+        QMessageBox.warning(self, "Restauração", f"O backup não passou na conferência; nada foi alterado.\n\n{erro}")
 
     # ==============================
     # Backup automático diário
@@ -230,40 +384,46 @@ class TelaPrincipal(QMainWindow):
         self.timer_backup.start(24 * 60 * 60 * 1000)  # 1 dia
 
     def backup_automatico(self):
-        self.realizar_backup(self.pasta_backup_automatica, mostrar_msg=False)
-        self.limpar_backups_antigos(self.pasta_backup_automatica)
-        print(f"Backup automático realizado em: {self.pasta_backup_automatica}")
+        self.iniciar_backup(self.pasta_backup_automatica)
 
     # ==============================
     # Funções de backup
     # ==============================
-    def realizar_backup(self, pasta_backup, mostrar_msg=True):
-        os.makedirs(pasta_backup, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        pasta_destino = os.path.join(pasta_backup, f"backup_{timestamp}")
-        os.makedirs(pasta_destino, exist_ok=True)
-        for arquivo in ARQUIVOS_SISTEMA:
-            if os.path.exists(arquivo):
-                shutil.copy2(arquivo, pasta_destino)
-        if mostrar_msg:
-            print(f"Backup realizado em: {pasta_destino}")
-
-    def limpar_backups_antigos(self, pasta_backup):
-        if not os.path.exists(pasta_backup):
+    def iniciar_backup(self, pasta_backup, manual=False):
+        """Cria uma geração no repositório de backup em segundo plano (um backup por vez)."""
+        from tarefas import TarefaBackup
+        if getattr(self, "tarefa_backup", None) is not None:
+            if manual:
+                QMessageBox.information(self, "Backup", "Já existe um backup em andamento. Tente de novo em instantes.")
             return
-        backups = [d for d in os.listdir(pasta_backup) if os.path.isdir(os.path.join(pasta_backup, d))]
-        backups.sort()
-        while len(backups) > MAX_BACKUPS:
-            antigo = backups.pop(0)
-            caminho_antigo = os.path.join(pasta_backup, antigo)
-            shutil.rmtree(caminho_antigo)
-            print(f"Backup antigo removido: {caminho_antigo}")
+        tarefa = TarefaBackup(pasta_backup)
+        tarefa.setAutoDelete(False)
+        tarefa.sinais.concluido.connect(lambda geracao: self.backup_finalizado(tarefa, manual))
+        tarefa.sinais.falhou.connect(self.backup_falhou)
+        self.tarefa_backup = tarefa
+        QThreadPool.globalInstance().start(tarefa)
+
+    def backup_finalizado(self, tarefa, manual):
+        self.tarefa_backup = None
+        r = tarefa.resumo
+        if manual:
+            QMessageBox.information(self, "Backup Concluído",
+                                    f"Backup realizado com sucesso em:\n{tarefa.pasta}\n\n"
+                                    f"{r['arquivos']} arquivos ({r['reaproveitados']} meses fechados sem alteração), "
+                                    f"{r['bytes_novos'] / 1024:.0f} KB novos gravados.")
+
+    def backup_falhou(self, erro):
+        self.tarefa_backup = None
+        QMessageBox.warning(self, "Backup", f"Não foi possível concluir o backup:\n{erro}")
 
 # ==============================
 # Execução
 # ==============================
 if __name__ == "__main__":
+    marcar_inicio("imports")
     app = QApplication(sys.argv)
+    marcar_inicio("QApplication")
+    retomar_restauracao_pendente()
     janela = TelaPrincipal()
     janela.show()
     sys.exit(app.exec_())
@@ -5,7 +5,8 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[('logopreta2.png', '.'), ('logoverde.png', '.')],
+    # Fundo vai só nas variantes reduzidas (python imagens.py); logopreta2.png fica fora
+    datas=[('fundos', 'fundos'), ('logoverde.png', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
@@ -16,19 +17,17 @@ a = Analysis(
 )
 pyz = PYZ(a.pure)
 
+# onedir sem UPX: o executável não precisa se descompactar a cada abertura
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -37,3 +36,12 @@ exe = EXE(
     entitlements_file=None,
     icon=['icone.ico'],
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
@@ -0,0 +1,320 @@
+import math
+
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication, QCompleter
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+
+from busca import nome_cliente
+
+# Quantidade de linhas entregues à view a cada fetchMore
+TAMANHO_LOTE = 200
+
+
+# --- Itens da Proposta em Andamento ---
+class ModeloItensPedido(QAbstractTableModel):
+    """
+    Itens da proposta sendo montada. Inclusão, remoção e edição da quantidade mexem em uma
+    linha só e os totais (valor e peso) da tela são mantidos a cada operação, sem somar a
+    lista inteira.
+    O total gravado no pedido sai de totais(), que soma a lista de novo sem resíduo.
+    """
+
+    COLUNAS = ["Código", "Item", "Peso Unit.", "Qtd", "Peso Total", "Subtotal"]
+    COL_QTD = 3
+
+    totais_alterados = pyqtSignal(float, float)  # (valor, peso)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.itens = []
+        self.total_valor = 0.0
+        self.total_peso = 0.0
+
+    def definir_itens(self, itens):
+        """Carrega os itens de um pedido (edição). Nova lista: o pedido gravado não é alterado."""
+        self.beginResetModel()
+        self.itens = list(itens)
+        self.total_valor, self.total_peso = self.totais()
+        self.endResetModel()
+        self.totais_alterados.emit(self.total_valor, self.total_peso)
+
+    def totais(self):
+        """(valor, peso) somados com math.fsum sobre a lista: não acumulam o erro de ponto
+        flutuante dos totais mantidos a cada inclusão/remoção."""
+        return (math.fsum(float(i.get("subtotal", 0)) for i in self.itens),
+                math.fsum(float(i.get("peso_total", 0)) for i in self.itens))
+
+    def limpar(self):
+        self.definir_itens([])
+
+    def adicionar(self, item):
+        linha = len(self.itens)
+        self.beginInsertRows(QModelIndex(), linha, linha)
+        self.itens.append(item)
+        self.endInsertRows()
+        self._somar(float(item.get("subtotal", 0)), float(item.get("peso_total", 0)))
+
+    def remover(self, linha):
+        self.beginRemoveRows(QModelIndex(), linha, linha)
+        item = self.itens.pop(linha)
+        self.endRemoveRows()
+        self._somar(-float(item.get("subtotal", 0)), -float(item.get("peso_total", 0)))
+        return item
+
+    def atualizar(self, linha, item):
+        """Troca o item de uma linha: os totais mudam só pela diferença."""
+        antigo = self.itens[linha]
+        self.itens[linha] = item
+        self.dataChanged.emit(self.index(linha, 0), self.index(linha, len(self.COLUNAS) - 1))
+        self._somar(float(item.get("subtotal", 0)) - float(antigo.get("subtotal", 0)),
+                    float(item.get("peso_total", 0)) - float(antigo.get("peso_total", 0)))
+
+    def _somar(self, valor, peso):
+        if self.itens:
+            self.total_valor += valor
+            self.total_peso += peso
+        else:
+            # Lista vazia: zera de vez (sem resíduo de ponto flutuante)
+            self.total_valor = self.total_peso = 0.0
+        self.totais_alterados.emit(self.total_valor, self.total_peso)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.itens)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUNAS)
+
+    def headerData(self, secao, orientacao, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientacao == Qt.Horizontal:
+            return self.COLUNAS[secao]
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == self.COL_QTD:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, valor, role=Qt.EditRole):
+        """Quantidade editada na tabela: peso e subtotal refeitos com o preço do KG do item."""
+        if role != Qt.EditRole or not index.isValid() or index.column() != self.COL_QTD:
+            return False
+        try:
+            qtd = float(str(valor).replace(",", "."))
+        except ValueError:
+            return False
+        if not math.isfinite(qtd) or qtd < 0:
+            return False
+        item = self.itens[index.row()]
+        peso_total = float(item.get("peso_unit", 0)) * qtd
+        self.atualizar(index.row(), dict(item, qtd=qtd, peso_total=peso_total,
+                                         subtotal=peso_total * float(item.get("preco_kg_na_epoca", 0))))
+        return True
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        item = self.itens[index.row()]
+        col = index.column()
+        if role == Qt.EditRole and col == self.COL_QTD:
+            return str(item["qtd"])
+        if role != Qt.DisplayRole:
+            return None
+        if col == 0:
+            return str(item.get("codigo", ""))
+        if col == 1:
+            return item.get("nome", "")
+        if col == 2:
+            return f"{item['peso_unit']:.3f} kg"
+        if col == 3:
+            return str(item["qtd"])
+        if col == 4:
+            return f"{item['peso_total']:.3f} kg"
+        return f"R$ {item['subtotal']:.2f}"
+
+
+# --- Base paginada (histórico, clientes) ---
+class ModeloPaginado(QAbstractTableModel):
+    """Modelo sobre uma lista: só entrega à view as linhas já paginadas (fetchMore)."""
+
+    COLUNAS = []
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._linhas = []
+        self._carregadas = 0
+
+    def definir_linhas(self, linhas):
+        """Troca a lista exibida sem copiar: a view pede as linhas aos poucos."""
+        self.beginResetModel()
+        self._linhas = linhas
+        self._carregadas = min(TAMANHO_LOTE, len(linhas))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._carregadas
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUNAS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._carregadas < len(self._linhas)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        restantes = len(self._linhas) - self._carregadas
+        qtd = min(TAMANHO_LOTE, restantes)
+        if qtd <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._carregadas, self._carregadas + qtd - 1)
+        self._carregadas += qtd
+        self.endInsertRows()
+
+    def headerData(self, secao, orientacao, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientacao == Qt.Horizontal:
+            return self.COLUNAS[secao]
+        return None
+
+
+# --- Clientes ---
+class ModeloClientes(ModeloPaginado):
+    """Clientes (lista inteira ou filtrada) com as colunas do cadastro."""
+
+    CAMPOS = ["nome", "cpf_cnpj", "email", "telefone", "endereco", "numero", "bairro", "cidade", "estado", "ie"]
+    COLUNAS = ["Nome", "CPF/CNPJ", "Email", "Telefone", "Endereço", "Nº", "Bairro", "Cidade", "Estado", "IE"]
+
+    def cliente(self, linha):
+        return self._linhas[linha]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return self._linhas[index.row()].get(self.CAMPOS[index.column()], "")
+
+
+# --- Histórico de Pedidos ---
+class ModeloHistorico(ModeloPaginado):
+    """Histórico de pedidos; as colunas de ação são desenhadas pelo DelegateAcoes."""
+
+    COLUNAS = ["Nº", "Data", "Cliente", "Total", "PDF", "Editar", "Excluir"]
+    COL_PDF, COL_EDITAR, COL_EXCLUIR = 4, 5, 6
+    ROTULOS_ACOES = {COL_PDF: "Gerar PDF", COL_EDITAR: "Editar", COL_EXCLUIR: "Excluir"}
+
+    def definir_pedidos(self, pedidos):
+        self.definir_linhas(pedidos)
+
+    def pedido(self, linha):
+        return self._linhas[linha]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        p = self._linhas[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return str(p.get("numero", ""))
+            if col == 1:
+                return p.get("data", "")
+            if col == 2:
+                return nome_cliente(p)
+            if col == 3:
+                return f"R$ {p.get('total', 0):.2f}"
+            return self.ROTULOS_ACOES.get(col)
+        if role == Qt.TextAlignmentRole and col != 2:
+            return Qt.AlignCenter
+        return None
+
+
+# --- Relatórios (ano contra ano) ---
+class ModeloRelatorio(ModeloPaginado):
+    """Linhas de analise.TabelaVendas.comparar_anos: rótulo, ano anterior, ano e variação."""
+
+    def definir_relatorio(self, linhas, rotulo, ano, formato):
+        self.COLUNAS = [rotulo, str(ano - 1), str(ano), "Variação"]
+        self.formato = formato
+        self.definir_linhas(linhas)
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(self.COLUNAS) - 1)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        linha = self._linhas[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return linha["rotulo"]
+            if col == 1:
+                return self.formato(linha["anterior"])
+            if col == 2:
+                return self.formato(linha["atual"])
+            return "—" if linha["variacao"] is None else f"{linha['variacao']:+.1f}%"
+        if role == Qt.TextAlignmentRole and col != 0:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+
+class DelegateAcoes(QStyledItemDelegate):
+    """Desenha um botão na célula sem criar um QPushButton por linha."""
+
+    acao_acionada = pyqtSignal(int, int)  # (linha, coluna)
+
+    def paint(self, painter, option, index):
+        botao = QStyleOptionButton()
+        botao.rect = option.rect.adjusted(4, 3, -4, -3)
+        botao.text = index.data(Qt.DisplayRole) or ""
+        botao.state = QStyle.State_Enabled | QStyle.State_Raised
+        if option.state & QStyle.State_MouseOver:
+            botao.state |= QStyle.State_MouseOver
+        estilo = option.widget.style() if option.widget else QApplication.style()
+        estilo.drawControl(QStyle.CE_PushButton, botao, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if option.rect.contains(event.pos()):
+                self.acao_acionada.emit(index.row(), index.column())
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+# --- Sugestões ranqueadas nos campos de digitação ---
+class CompletadorRanqueado(QCompleter):
+    """
+    Completer cujas sugestões vêm já ranqueadas de uma função `sugerir(texto)` (índice
+    de trigramas do catálogo/carteira). O Qt não filtra nada: a cada tecla o modelo
+    recebe só os melhores resultados. A lista mostra `rotulo(obj)` e o campo recebe
+    `valor(obj)` ao escolher.
+    """
+
+    def __init__(self, campo, sugerir, rotulo, valor, parent=None):
+        super().__init__(parent)
+        self._sugerir, self._rotulo, self._valor = sugerir, rotulo, valor
+        self._modelo = QStandardItemModel(self)
+        self.setModel(self._modelo)
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setCompletionRole(Qt.UserRole)
+        self.setCaseSensitivity(Qt.CaseInsensitive)
+        campo.setCompleter(self)
+        campo.textEdited.connect(self.atualizar)
+
+    def atualizar(self, texto):
+        self._modelo.clear()
+        for obj in self._sugerir(texto):
+            item = QStandardItem(self._rotulo(obj))
+            item.setData(self._valor(obj), Qt.UserRole)
+            self._modelo.appendRow(item)
+        if self._modelo.rowCount():
+            self.complete()
+        else:
+            self.popup().hide()
@@ -4,41 +4,21 @@ import sys
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QMessageBox,
-    QTabWidget, QCompleter, QHeaderView, QDesktopWidget, QFileDialog, QFrame
+    QPushButton, QMessageBox, QTableView,
+    QTabWidget, QHeaderView, QDesktopWidget, QFileDialog, QFrame, QCheckBox
 )
-from PyQt5.QtCore import Qt
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-
-from config import ARQUIVO_CLIENTES, ARQUIVO_ACESSORIOS, ARQUIVO_PEDIDOS
-
-# Caminho para o preço do KG
-ARQUIVO_PRECO_KG = os.path.join(os.path.dirname(ARQUIVO_ACESSORIOS), "preco_aluminio.json")
-
-# --- Funções de Persistência ---
-def carregar_json(arquivo):
-    if os.path.exists(arquivo):
-        try:
-            with open(arquivo, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except: return []
-    return []
-
-def salvar_json(dados, arquivo):
-    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
-    with open(arquivo, "w", encoding="utf-8") as f:
-        json.dump(dados, f, indent=4, ensure_ascii=False)
-
-def carregar_valor_kg_atual():
-    if os.path.exists(ARQUIVO_PRECO_KG):
-        try:
-            with open(ARQUIVO_PRECO_KG, "r", encoding="utf-8") as f:
-                return float(json.load(f).get("preco_kg", 0.0))
-        except: return 0.0
-    return 0.0
+from PyQt5.QtCore import Qt, QTimer, QThreadPool
+
+from persistencia import ConflitoDeVersao, ArquivoCorrompidoError
+from sessao import sessao
+from modelos import ModeloHistorico, ModeloItensPedido, DelegateAcoes, CompletadorRanqueado
+from busca import IndiceBusca, campos_pedido
+from tarefas import TarefaPDF, TarefaArquivamento, TarefaIndice
+from configuracoes import configuracao_preco
+from carteira import rotulo_cliente, referencia_cliente, SEPARADOR_ROTULO
+from periodos import periodos_no_texto
+from relatorios import AbaRelatorios
+from instrumentacao import medido
 
 class TelaPedidos(QWidget):
     def __init__(self):
@@ -46,13 +26,119 @@ class TelaPedidos(QWidget):
         self.setWindowTitle("Sistema de Gestão Comercial - Iorli Representações (2026)")
         self.ajustar_resolucao()
 
-        self.pedidos = carregar_json(ARQUIVO_PEDIDOS)
-        self.clientes = carregar_json(ARQUIVO_CLIENTES)
-        self.acessorios = carregar_json(ARQUIVO_ACESSORIOS)
-        self.itens_pedido_atual = []
-        self.pedido_em_edicao_index = None 
+        # Dados compartilhados com as outras telas (lidos do disco uma única vez)
+        self.sessao = sessao()
+        self.armazem = self.sessao.armazem
+        self.pedidos = self.armazem.pedidos
+        self.carteira = self.sessao.carteira
+        self.clientes = self.carteira.itens
+        self.catalogo = self.sessao.catalogo
+        self.pedido_em_edicao = None  # (id, rev) do pedido aberto para edição
+        self.tarefas_pdf = []         # PDFs sendo gerados em segundo plano
+        self.preco = configuracao_preco()
+
+        # Índice de busca do histórico (montado uma vez, atualizado a cada alteração)
+        self.indice_busca = IndiceBusca(campos_pedido)
+        self.indice_busca.construir(self.pedidos)
+        # Meses fechados mostrados no histórico (lidos só quando a busca ou a caixa pedem)
+        self.indice_fechados = IndiceBusca(campos_pedido)
+        self.fechados = []
+        self.meses_indexados = None   # meses que estão em self.fechados (None: nenhum)
+        self.tarefa_periodos = None
+        self.tarefas_sugestoes = []
 
         self.inicializar_ui()
+        self.preco.preco_alterado.connect(self.preco_kg_alterado)
+        self.sessao.pedido_alterado.connect(self.pedido_alterado)
+
+        # Traz o que outras janelas/estações gravaram no mesmo arquivo
+        self.timer_sincronizar = QTimer(self)
+        self.timer_sincronizar.timeout.connect(self.sincronizar_pedidos)
+
+    def pedido_alterado(self, op, pedido):
+        """Mantém o índice de busca igual ao armazém (inclusive alterações de outras estações)."""
+        if op == "inserir":
+            self.indice_busca.adicionar(pedido)
+        elif op == "atualizar":
+            self.indice_busca.atualizar(pedido)
+        elif op == "remover":
+            self.indice_busca.remover(pedido)
+        elif op in ("recarregar", "arquivar"):
+            self.pedidos = self.armazem.pedidos
+            self.indice_busca.construir(self.pedidos)
+            self.meses_indexados = None
+            self.atualizar_rotulo_fechados()
+            self.atualizar_hist()
+
+    def preco_kg_alterado(self, preco):
+        self.lbl_preco_kg.setText(f"Preço do kg: R$ {preco:.2f}")
+
+    def sincronizar_pedidos(self):
+        # Pastas de rede nem sempre avisam o watcher: um stat a cada ciclo cobre esse caso
+        self.preco.verificar()
+        if self.armazem.sincronizar():
+            self.atualizar_hist()
+
+    def showEvent(self, event):
+        # A janela é reaproveitada: ao reaparecer, traz o que mudou enquanto esteve fechada
+        super().showEvent(event)
+        self.sincronizar_pedidos()
+        self.timer_sincronizar.start(5000)
+        # Monta os índices das sugestões em segundo plano, não na primeira tecla
+        self.preparar_sugestoes()
+        QTimer.singleShot(0, self.fechar_periodos)
+
+    def preparar_sugestoes(self):
+        """Índices de trigramas do catálogo e dos clientes montados numa thread do pool.
+        Até ficarem prontos, as sugestões saem dos índices por código e nome."""
+        for colecao in (self.catalogo, self.carteira):
+            preparo = colecao.preparar_sugestoes()
+            if preparo is None:
+                continue
+            montar, versao = preparo
+            tarefa = TarefaIndice(montar)
+            tarefa.setAutoDelete(False)
+            tarefa.sinais.concluido.connect(
+                lambda _, c=colecao, t=tarefa, v=versao: self.sugestoes_prontas(c, t, v))
+            tarefa.sinais.falhou.connect(lambda _, c=colecao, t=tarefa: self.sugestoes_prontas(c, t, None))
+            self.tarefas_sugestoes.append(tarefa)
+            QThreadPool.globalInstance().start(tarefa)
+
+    def sugestoes_prontas(self, colecao, tarefa, versao):
+        self.tarefas_sugestoes.remove(tarefa)
+        if versao is None:
+            colecao.usar_sugestoes(None, None)  # falhou: o índice é montado no primeiro uso
+        elif not colecao.usar_sugestoes(tarefa.indice, versao):
+            self.preparar_sugestoes()  # a lista mudou durante a montagem: monta de novo
+
+    def fechar_periodos(self):
+        """Passa os pedidos dos meses vencidos para os arquivos de período, em segundo plano."""
+        if self.tarefa_periodos is not None:
+            return
+        selecao = self.armazem.selecionar_para_arquivar()
+        if not selecao:
+            return
+        tarefa = TarefaArquivamento(self.armazem, selecao)
+        tarefa.setAutoDelete(False)
+        tarefa.sinais.concluido.connect(lambda _, t=tarefa: self.periodos_gravados(t))
+        tarefa.sinais.falhou.connect(lambda erro: self.periodos_gravados(None, erro))
+        self.tarefa_periodos = tarefa
+        QThreadPool.globalInstance().start(tarefa)
+
+    def periodos_gravados(self, tarefa, erro=None):
+        self.tarefa_periodos = None
+        if erro is not None:
+            QMessageBox.warning(self, "Aviso", f"Não foi possível fechar os meses anteriores:\n{erro}")
+            return
+        try:
+            self.armazem.concluir_arquivamento(tarefa.gravados)
+        except OSError as e:
+            QMessageBox.warning(self, "Aviso", f"Não foi possível fechar os meses anteriores:\n{e}")
+
+    def closeEvent(self, event):
+        self.timer_sincronizar.stop()
+        self.cancelar_pdfs()
+        super().closeEvent(event)
 
     def ajustar_resolucao(self):
         tela = QDesktopWidget().screenGeometry()
@@ -66,9 +152,12 @@ class TelaPedidos(QWidget):
         
         self.aba_novo = self.criar_aba_novo_pedido()
         self.aba_lista = self.criar_aba_pesquisar()
+        # A tabela de vendas só é montada quando a aba aparece pela primeira vez
+        self.aba_relatorios = AbaRelatorios(self)
 
         self.abas.addTab(self.aba_novo, "📝 Gerar Nova Proposta")
         self.abas.addTab(self.aba_lista, "🔍 Histórico / Pesquisa")
+        self.abas.addTab(self.aba_relatorios, "📊 Relatórios")
         
         layout_principal.addWidget(self.abas)
 
@@ -83,8 +172,11 @@ class TelaPedidos(QWidget):
         layout_cli.addWidget(QLabel("<b>SELECIONE O CLIENTE:</b>"))
         
         self.input_cliente = QLineEdit()
-        nomes_cli = [c.get("nome", "") for c in self.clientes]
-        self.input_cliente.setCompleter(QCompleter(nomes_cli))
+        self.input_cliente.setPlaceholderText("Nome ou CPF/CNPJ do cliente...")
+        # Sugestões ranqueadas por nome e documento; a carteira mantém o índice atualizado.
+        # O campo recebe "Nome — CPF/CNPJ": o pedido acha o cliente pelo documento.
+        self.completer_clientes = CompletadorRanqueado(
+            self.input_cliente, self.carteira.sugerir, rotulo_cliente, rotulo_cliente, self)
         self.input_cliente.setStyleSheet("padding: 8px; background-color: white; border: 1px solid #ccc;")
         layout_cli.addWidget(self.input_cliente)
         layout.addWidget(frame_cli)
@@ -92,15 +184,22 @@ class TelaPedidos(QWidget):
         frame_itens = QFrame()
         frame_itens.setFrameShape(QFrame.StyledPanel)
         layout_item = QVBoxLayout(frame_itens)
-        layout_item.addWidget(QLabel("<b>ADICIONAR PERFIL PELO CÓDIGO:</b>"))
+        cab_item = QHBoxLayout()
+        cab_item.addWidget(QLabel("<b>ADICIONAR PERFIL PELO CÓDIGO:</b>"))
+        cab_item.addStretch()
+        self.lbl_preco_kg = QLabel(f"Preço do kg: R$ {self.preco.preco_kg:.2f}")
+        cab_item.addWidget(self.lbl_preco_kg)
+        layout_item.addLayout(cab_item)
         
         h_box = QHBoxLayout()
         self.input_prod = QLineEdit()
-        self.input_prod.setPlaceholderText("Digite o CÓDIGO do item...")
+        self.input_prod.setPlaceholderText("Digite o CÓDIGO ou a descrição do item...")
         
-        # Completer agora usa o CÓDIGO
-        codigos_acc = [str(a.get("codigo", "")) for a in self.acessorios]
-        self.input_prod.setCompleter(QCompleter(codigos_acc))
+        # Sugestões por código e descrição ("trilho sup"); ao escolher, o campo recebe o código
+        self.completer_codigos = CompletadorRanqueado(
+            self.input_prod, self.catalogo.sugerir,
+            lambda item: f"{item.get('codigo', '')}{SEPARADOR_ROTULO}{item.get('nome', '')}",
+            lambda item: str(item.get("codigo", "")), self)
         
         self.input_qtd = QLineEdit()
         self.input_qtd.setPlaceholderText("Qtd Peças")
@@ -116,10 +215,13 @@ class TelaPedidos(QWidget):
         layout_item.addLayout(h_box)
         layout.addWidget(frame_itens)
 
-        self.tabela_novo = QTableWidget(0, 6) # 6 colunas para incluir Código
-        self.tabela_novo.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela_novo.setSelectionBehavior(QTableWidget.SelectRows)
-        self.tabela_novo.setHorizontalHeaderLabels(["Código", "Item", "Peso Unit.", "Qtd", "Peso Total", "Subtotal"])
+        # Itens da proposta num modelo: cada inclusão/remoção mexe em uma linha só
+        self.modelo_itens = ModeloItensPedido(self)
+        self.tabela_novo = QTableView()
+        self.tabela_novo.setModel(self.modelo_itens)
+        # Só a quantidade é editável (duplo clique ou F2)
+        self.tabela_novo.setEditTriggers(QTableView.DoubleClicked | QTableView.EditKeyPressed)
+        self.tabela_novo.setSelectionBehavior(QTableView.SelectRows)
         self.tabela_novo.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.tabela_novo)
 
@@ -130,6 +232,7 @@ class TelaPedidos(QWidget):
         rodape = QHBoxLayout()
         self.lbl_total = QLabel("TOTAL: R$ 0,00")
         self.lbl_total.setStyleSheet("font-size: 20px; font-weight: bold; color: #1e7e34;")
+        self.modelo_itens.totais_alterados.connect(self.atualizar_total)
         
         self.btn_salvar = QPushButton("💾 SALVAR E GERAR PROPOSTA")
         self.btn_salvar.setFixedHeight(45)
@@ -141,16 +244,26 @@ class TelaPedidos(QWidget):
         rodape.addWidget(self.btn_salvar)
         layout.addLayout(rodape)
 
+        # Andamento dos PDFs gerados em segundo plano
+        barra_pdf = QHBoxLayout()
+        self.lbl_pdf = QLabel("")
+        self.btn_cancelar_pdf = QPushButton("⏹ Cancelar PDFs")
+        self.btn_cancelar_pdf.setEnabled(False)
+        self.btn_cancelar_pdf.clicked.connect(self.cancelar_pdfs)
+        barra_pdf.addWidget(self.lbl_pdf, 1)
+        barra_pdf.addWidget(self.btn_cancelar_pdf)
+        layout.addLayout(barra_pdf)
+
         return widget
 
     def adicionar_item(self):
         codigo_buscado = self.input_prod.text().strip()
         qtd_s = self.input_qtd.text().replace(",", ".")
         
-        # Busca o item pelo CÓDIGO
-        item_obj = next((a for a in self.acessorios if str(a.get("codigo", "")) == codigo_buscado), None)
+        # Busca o item pelo CÓDIGO (índice do catálogo, O(1)); aceita também o rótulo "código — descrição"
+        item_obj = self.catalogo.obter(codigo_buscado.split(SEPARADOR_ROTULO)[0])
         
-        preco_kg = carregar_valor_kg_atual()
+        preco_kg = self.preco.preco_kg  # em memória; o serviço avisa quando muda
         if preco_kg <= 0:
             QMessageBox.warning(self, "Aviso", "O preço do KG não foi definido em Acessórios!")
             return
@@ -161,7 +274,7 @@ class TelaPedidos(QWidget):
             peso_total = peso_unit * qtd
             subtotal = peso_total * preco_kg
 
-            self.itens_pedido_atual.append({
+            self.modelo_itens.adicionar({
                 "codigo": item_obj.get("codigo", ""),
                 "nome": item_obj.get("nome", ""),
                 "peso_unit": peso_unit,
@@ -170,173 +283,204 @@ class TelaPedidos(QWidget):
                 "subtotal": subtotal,
                 "preco_kg_na_epoca": preco_kg
             })
-            self.atualizar_tabela_novo()
             self.input_prod.clear(); self.input_qtd.clear(); self.input_prod.setFocus()
         else:
             QMessageBox.warning(self, "Aviso", "Código do item não encontrado ou quantidade inválida.")
 
     def remover_item_lista(self):
-        linha = self.tabela_novo.currentRow()
+        linha = self.tabela_novo.currentIndex().row()
         if linha >= 0:
-            self.itens_pedido_atual.pop(linha)
-            self.atualizar_tabela_novo()
-
-    def atualizar_tabela_novo(self):
-        self.tabela_novo.setRowCount(0)
-        total = sum(i["subtotal"] for i in self.itens_pedido_atual)
-        for i, item in enumerate(self.itens_pedido_atual):
-            self.tabela_novo.insertRow(i)
-            self.tabela_novo.setItem(i, 0, QTableWidgetItem(str(item["codigo"])))
-            self.tabela_novo.setItem(i, 1, QTableWidgetItem(item["nome"]))
-            self.tabela_novo.setItem(i, 2, QTableWidgetItem(f"{item['peso_unit']:.3f} kg"))
-            self.tabela_novo.setItem(i, 3, QTableWidgetItem(str(item["qtd"])))
-            self.tabela_novo.setItem(i, 4, QTableWidgetItem(f"{item['peso_total']:.3f} kg"))
-            self.tabela_novo.setItem(i, 5, QTableWidgetItem(f"R$ {item['subtotal']:.2f}"))
-        self.lbl_total.setText(f"TOTAL: R$ {total:.2f}")
+            self.modelo_itens.remover(linha)
+
+    def atualizar_total(self, valor, peso):
+        self.lbl_total.setText(f"TOTAL: R$ {valor:.2f}  ({peso:.3f} kg)")
 
     def finalizar_pedido(self):
-        nome_cli = self.input_cliente.text()
-        cliente = next((c for c in self.clientes if c["nome"] == nome_cli), None)
+        cliente = self.carteira.resolver(self.input_cliente.text())
 
-        if not cliente or not self.itens_pedido_atual:
+        if not cliente or not self.modelo_itens.itens:
             QMessageBox.warning(self, "Erro", "Selecione um cliente e itens.")
             return
 
-        total_pedido = sum(i["subtotal"] for i in self.itens_pedido_atual)
-
-        if self.pedido_em_edicao_index is not None:
-            idx = self.pedido_em_edicao_index
-            self.pedidos[idx].update({"cliente": cliente, "itens": self.itens_pedido_atual, "total": total_pedido})
-            pedido_final = self.pedidos[idx]
-            self.pedido_em_edicao_index = None
+        itens = self.modelo_itens.itens
+        total_pedido = self.modelo_itens.totais()[0]
+        # O pedido guarda a referência do cliente com os dados da proposta, não o cadastro inteiro
+        cliente = referencia_cliente(cliente)
+
+        if self.pedido_em_edicao is not None:
+            id_pedido, rev = self.pedido_em_edicao
+            try:
+                pedido_final = self.armazem.atualizar(
+                    id_pedido, {"cliente": cliente, "itens": itens, "total": total_pedido}, rev)
+            except ConflitoDeVersao as e:
+                QMessageBox.warning(self, "Conflito", f"{e}\nAbra o pedido de novo para editar a versão atual.")
+                self.atualizar_hist()
+                return
+            self.pedido_em_edicao = None
             self.btn_salvar.setText("💾 SALVAR E GERAR PROPOSTA")
         else:
-            pedido_final = {
-                "numero": len(self.pedidos) + 1001,
+            # O número vem da sequência do armazém (único entre as estações)
+            pedido_final = self.armazem.inserir({
                 "data": datetime.now().strftime("%d/%m/%Y"),
-                "cliente": cliente, "itens": self.itens_pedido_atual, "total": total_pedido
-            }
-            self.pedidos.append(pedido_final)
+                "cliente": cliente, "itens": itens, "total": total_pedido
+            })
 
-        salvar_json(self.pedidos, ARQUIVO_PEDIDOS)
         self.gerar_pdf_pedido(pedido_final)
-        self.itens_pedido_atual = []; self.input_cliente.clear(); self.atualizar_tabela_novo(); self.atualizar_hist()
+        self.modelo_itens.limpar(); self.input_cliente.clear(); self.atualizar_hist()
 
     def criar_aba_pesquisar(self):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         self.input_busca = QLineEdit()
-        self.input_busca.setPlaceholderText("🔍 Filtrar histórico por cliente...")
-        self.input_busca.textChanged.connect(self.atualizar_hist)
+        self.input_busca.setPlaceholderText("🔍 Filtrar por cliente, CPF/CNPJ, cidade, nº ou data... (#1234: só o pedido 1234; 03/2024: inclui o mês fechado)")
+
+        # Debounce: só filtra quando a digitação dá uma pausa
+        self.timer_busca = QTimer(self)
+        self.timer_busca.setSingleShot(True)
+        self.timer_busca.setInterval(150)
+        self.timer_busca.timeout.connect(self.atualizar_hist)
+        self.input_busca.textChanged.connect(self.timer_busca.start)
         layout.addWidget(self.input_busca)
 
-        self.tabela_hist = QTableWidget(0, 7)
-        self.tabela_hist.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.tabela_hist.setHorizontalHeaderLabels(["Nº", "Data", "Cliente", "Total", "PDF", "Editar", "Excluir"])
+        # Meses fechados só entram com a caixa marcada ou quando a busca cita o mês ("03/2024")
+        self.chk_fechados = QCheckBox()
+        self.chk_fechados.toggled.connect(self.atualizar_hist)
+        self.atualizar_rotulo_fechados()
+        layout.addWidget(self.chk_fechados)
+
+        # Tabela virtual: o modelo entrega as linhas sob demanda e os botões são desenhados pelo delegate
+        self.modelo_hist = ModeloHistorico(self)
+        self.tabela_hist = QTableView()
+        self.tabela_hist.setModel(self.modelo_hist)
+        self.tabela_hist.setEditTriggers(QTableView.NoEditTriggers)
+        self.tabela_hist.setSelectionBehavior(QTableView.SelectRows)
+        self.tabela_hist.setMouseTracking(True)
+        self.tabela_hist.verticalHeader().setVisible(False)
         self.tabela_hist.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        self.delegate_acoes = DelegateAcoes(self.tabela_hist)
+        self.delegate_acoes.acao_acionada.connect(self.acao_historico)
+        for col in ModeloHistorico.ROTULOS_ACOES:
+            self.tabela_hist.setItemDelegateForColumn(col, self.delegate_acoes)
+
         layout.addWidget(self.tabela_hist)
         self.atualizar_hist()
         return widget
 
+    @medido("pedidos.atualizar_hist", lambda self: {"pedidos": len(self.pedidos)})
     def atualizar_hist(self):
-        busca = self.input_busca.text().lower()
-        self.tabela_hist.setRowCount(0)
-        
-        for i, p in enumerate(self.pedidos):
-            # --- CORREÇÃO AQUI ---
-            # Verifica se 'cliente' é um dicionário ou apenas uma string
-            cli_data = p.get("cliente", "")
-            if isinstance(cli_data, dict):
-                nome_cliente = cli_data.get("nome", "")
-            else:
-                nome_cliente = str(cli_data)
-            # ---------------------
-
-            if busca in nome_cliente.lower():
-                row = self.tabela_hist.rowCount()
-                self.tabela_hist.insertRow(row)
-                self.tabela_hist.setItem(row, 0, QTableWidgetItem(p.get("data", "")))
-                self.tabela_hist.setItem(row, 1, QTableWidgetItem(nome_cliente))
-                self.tabela_hist.setItem(row, 2, QTableWidgetItem(f"R$ {p.get('total', 0):.2f}"))
-                
-                # Adiciona o botão de PDF que faltava na lógica da tabela
-                btn_pdf = QPushButton("Gerar PDF")
-                btn_pdf.clicked.connect(lambda checked, arg=i: self.gerar_pdf_pedido(arg))
-                self.tabela_hist.setCellWidget(row, 3, btn_pdf)
-
-    def preparar_edicao(self, index):
-        p = self.pedidos[index]
-        self.pedido_em_edicao_index = index
-        self.input_cliente.setText(p["cliente"]["nome"])
-        self.itens_pedido_atual = list(p["itens"])
-        self.atualizar_tabela_novo()
+        texto = self.input_busca.text().strip()
+        if texto.startswith("#") and texto[1:].strip().isdigit():
+            # Número exato: consulta direta no índice do armazém
+            try:
+                pedido = self.armazem.localizar_numero(texto[1:])
+            except (OSError, ArquivoCorrompidoError) as e:
+                QMessageBox.warning(self, "Aviso", f"Não foi possível ler os meses fechados:\n{e}")
+                pedido = None
+            self.modelo_hist.definir_pedidos([pedido] if pedido is not None else [])
+            return
+        filtrados = self.armazem.filtrar(texto)
+        if filtrados is None:
+            filtrados = self.indice_busca.buscar(texto)
+        pedidos = self.pedidos if filtrados is None else filtrados
+        if self.indexar_fechados(texto):
+            achados = self.indice_fechados.buscar(texto)
+            pedidos = (self.fechados if achados is None else achados) + pedidos
+        self.modelo_hist.definir_pedidos(pedidos)
+
+    def atualizar_rotulo_fechados(self):
+        quantidade = self.armazem.quantidade_fechados()
+        self.chk_fechados.setText(f"Incluir meses fechados ({quantidade} pedidos)")
+        self.chk_fechados.setVisible(quantidade > 0)
+
+    def indexar_fechados(self, texto):
+        """Lê os meses fechados que a busca alcança e monta o índice deles (só quando mudam).
+        Devolve False se nenhum mês fechado entra no histórico."""
+        fechados = self.armazem.meses_fechados()
+        meses = fechados if self.chk_fechados.isChecked() else [m for m in periodos_no_texto(texto) if m in fechados]
+        if not meses:
+            return False
+        if meses != self.meses_indexados:
+            try:
+                self.fechados = self.armazem.pedidos_fechados(meses)
+            except (OSError, ArquivoCorrompidoError) as e:
+                QMessageBox.warning(self, "Aviso", f"Não foi possível ler os meses fechados:\n{e}")
+                return False
+            self.indice_fechados.construir(self.fechados)
+            self.meses_indexados = meses
+        return True
+
+    def acao_historico(self, linha, coluna):
+        # A linha só serve para achar o pedido: as ações seguem pelo id, que não muda
+        # se outra estação incluir ou excluir pedidos enquanto a tabela está aberta
+        id_pedido = self.modelo_hist.pedido(linha)["id"]
+        pedido = self.armazem.obter(id_pedido)
+        if pedido is None:
+            # Mês fechado: só leitura (o PDF pode ser gerado de novo)
+            pedido = self.armazem.obter_fechado(id_pedido)
+            if pedido is not None and coluna != ModeloHistorico.COL_PDF:
+                QMessageBox.warning(self, "Aviso", f"O pedido {pedido['numero']} é de um mês fechado e não pode ser alterado.")
+                return
+        if pedido is None:
+            QMessageBox.warning(self, "Aviso", "O pedido foi excluído em outra janela/estação.")
+            self.atualizar_hist()
+            return
+        if coluna == ModeloHistorico.COL_PDF:
+            self.gerar_pdf_pedido(pedido)
+        elif coluna == ModeloHistorico.COL_EDITAR:
+            self.preparar_edicao(pedido)
+        elif coluna == ModeloHistorico.COL_EXCLUIR:
+            self.excluir_pedido(pedido)
+
+    def preparar_edicao(self, p):
+        self.pedido_em_edicao = (p["id"], p.get("rev", 0))
+        # Pelo id gerado o cliente é achado mesmo se o CPF/CNPJ ou o nome mudaram depois
+        referencia = p["cliente"]
+        cliente = self.carteira.obter_por_id(referencia.get("id")) if isinstance(referencia, dict) else None
+        self.input_cliente.setText(rotulo_cliente(cliente or referencia))
+        self.modelo_itens.definir_itens(self.armazem.itens(p))
         self.btn_salvar.setText("✅ ATUALIZAR PEDIDO")
         self.abas.setCurrentWidget(self.aba_novo)
 
-    def excluir_pedido(self, index):
-        if QMessageBox.question(self, "Confirmar", "Excluir permanentemente?") == QMessageBox.Yes:
-            self.pedidos.pop(index)
-            salvar_json(self.pedidos, ARQUIVO_PEDIDOS)
+    def excluir_pedido(self, pedido):
+        if QMessageBox.question(self, "Confirmar", f"Excluir permanentemente o pedido {pedido['numero']}?") == QMessageBox.Yes:
+            try:
+                self.armazem.remover(pedido["id"], pedido.get("rev", 0))
+            except ConflitoDeVersao as e:
+                QMessageBox.warning(self, "Conflito", str(e))
             self.atualizar_hist()
 
+    # ==============================
+    # PDF em segundo plano
+    # ==============================
     def gerar_pdf_pedido(self, pedido):
+        """Pergunta onde salvar e gera o PDF no QThreadPool; a tela fica livre na hora."""
         caminho, _ = QFileDialog.getSaveFileName(self, "Salvar Proposta", f"Proposta_{pedido['numero']}.pdf", "PDF Files (*.pdf)")
         if not caminho: return
 
-        doc = SimpleDocTemplate(caminho, pagesize=A4, rightMargin=45, leftMargin=45, topMargin=45, bottomMargin=45)
-        styles = getSampleStyleSheet()
-        elementos = []
-        largura_a4, altura_a4 = A4 
-
-        def desenhar_moldura(canvas, doc):
-            canvas.saveState()
-            canvas.setStrokeColor(colors.darkgreen); canvas.setLineWidth(1.5)
-            canvas.rect(25, 25, largura_a4 - 50, altura_a4 - 50)
-            canvas.setFont('Helvetica-Oblique', 8)
-            canvas.drawString(40, 35, f"Iorli Representações - Proposta #{pedido['numero']}")
-            canvas.drawRightString(largura_a4 - 40, 35, f"Página {doc.page}")
-            canvas.restoreState()
-
-        logo_path = os.path.join(os.path.abspath("."), "logoverde.png")
-        img = Image(logo_path, width=80, height=80) if os.path.exists(logo_path) else Spacer(1, 80)
-        
-        dados_emp = [
-            ["Iorli de Fatima Marcondes Rosa Representações"],
-            ["CNPJ: 34.308.499/0001-10 | IE: 1706084.2144-6"],
-            ["R. Arcendino Rosa Neves 278 - Xaxim, Curitiba - PR"],
-            ["Telefone: (41) 99914-7644 | Email: nelsonrosaperfis@yahoo.com.br"]
-        ]
-        t_emp = Table(dados_emp, colWidths=[400]); t_emp.setStyle(TableStyle([('ALIGN', (0,0), (-1,-1), 'RIGHT'), ('FONTSIZE', (0,0), (-1,-1), 9)]))
-        elementos.append(Table([[img, t_emp]], colWidths=[100, 400]))
-        elementos.append(Spacer(1, 10))
-        elementos.append(Table([[""]], colWidths=[500], rowHeights=[2], style=[('BACKGROUND', (0,0), (-1,-1), colors.darkgreen)]))
-        elementos.append(Spacer(1, 15))
-
-        elementos.append(Paragraph(f"<b>PROPOSTA COMERCIAL Nº {pedido['numero']}</b>", styles['Title']))
-        elementos.append(Paragraph(f"Data: {pedido['data']}", styles['Normal']))
-        elementos.append(Spacer(1, 15))
-
-        cli = pedido["cliente"]
-        d_cli = [
-            [Paragraph("<b>DADOS DO CLIENTE</b>", styles['Normal']), ""],
-            [f"Nome: {cli.get('nome','')}", f"CPF/CNPJ: {cli.get('cpf_cnpj','')}"],
-            [f"Cidade: {cli.get('cidade','')} - {cli.get('estado','')}", f"Telefone: {cli.get('telefone','')}"]
-        ]
-        t_c = Table(d_cli, colWidths=[250, 250]); t_c.setStyle(TableStyle([('SPAN', (0,0), (1,0)), ('BACKGROUND', (0,0), (1,0), colors.whitesmoke), ('GRID', (0,0), (-1,-1), 0.5, colors.grey)]))
-        elementos.append(t_c); elementos.append(Spacer(1, 20))
-
-        # Itens com CÓDIGO no PDF
-        itens_pdf = [["Cód", "Descrição do Perfil", "Qtd", "Peso Tot.", "Subtotal"]]
-        for i in pedido["itens"]:
-            itens_pdf.append([str(i.get("codigo", "")), i["nome"], str(i["qtd"]), f"{i['peso_total']:.2f}kg", f"R$ {i['subtotal']:.2f}"])
-        itens_pdf.append(["", "", "", "TOTAL:", f"R$ {pedido['total']:.2f}"])
-        
-        t_i = Table(itens_pdf, colWidths=[50, 210, 60, 90, 90])
-        estilo = [('BACKGROUND', (0,0), (-1,0), colors.darkgreen), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke), ('GRID', (0,0), (-1,-2), 0.5, colors.grey), ('FONTSIZE', (0,-1), (-1,-1), 12)]
-        for r in range(1, len(itens_pdf)-1):
-            if r % 2 == 0: estilo.append(('BACKGROUND', (0,r), (-1,r), colors.whitesmoke))
-        t_i.setStyle(TableStyle(estilo))
-        elementos.append(t_i)
-
-        doc.build(elementos, onFirstPage=desenhar_moldura, onLaterPages=desenhar_moldura)
-        QMessageBox.information(self, "Sucesso", "PDF Gerado!")
+        # O histórico só tem o cabeçalho: os itens são lidos agora (cache LRU do armazém)
+        tarefa = TarefaPDF(self.armazem.completo(pedido), caminho)
+        tarefa.setAutoDelete(False)  # a referência fica em self.tarefas_pdf até terminar
+        numero = pedido["numero"]
+        tarefa.sinais.progresso.connect(lambda pct, n=numero: self.lbl_pdf.setText(f"Gerando PDF da proposta {n}... {pct}%"))
+        tarefa.sinais.concluido.connect(lambda c, t=tarefa, n=numero: self.pdf_finalizado(t, f"PDF da proposta {n} gerado: {c}"))
+        tarefa.sinais.cancelado.connect(lambda t=tarefa, n=numero: self.pdf_finalizado(t, f"PDF da proposta {n} cancelado."))
+        tarefa.sinais.falhou.connect(lambda erro, t=tarefa, n=numero: self.pdf_falhou(t, n, erro))
+        self.tarefas_pdf.append(tarefa)
+        self.btn_cancelar_pdf.setEnabled(True)
+        self.lbl_pdf.setText(f"Gerando PDF da proposta {numero}...")
+        QThreadPool.globalInstance().start(tarefa)
+
+    def pdf_finalizado(self, tarefa, mensagem):
+        if tarefa in self.tarefas_pdf:
+            self.tarefas_pdf.remove(tarefa)
+        self.btn_cancelar_pdf.setEnabled(bool(self.tarefas_pdf))
+        self.lbl_pdf.setText(mensagem)
+
+    def pdf_falhou(self, tarefa, numero, erro):
+        self.pdf_finalizado(tarefa, f"Falha no PDF da proposta {numero}.")
+        QMessageBox.warning(self, "Erro", f"Não foi possível gerar o PDF da proposta {numero}:\n{erro}")
+
+    def cancelar_pdfs(self):
+        for tarefa in self.tarefas_pdf:
+            tarefa.cancelar()
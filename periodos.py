@@ -0,0 +1,210 @@
+"""
+Pedidos de meses fechados, guardados fora de pedidos.json.
+
+Cada mês fechado vira um arquivo só leitura e compactado (gzip), com os pedidos
+completos (cabeçalho e itens): pedidos.json.periodo.<aaaa-mm>.<id>.gz. O manifesto
+(pedidos.json.periodos) lista os meses com quantidade, total, faixa de números e o
+sha256 do arquivo: dá para achar um pedido sem abrir nada, e o backup pula os meses
+que não mudaram. Um mês só é lido quando uma busca por data ou número chega nele
+(ou quando o histórico completo é pedido).
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import date
+
+from config import MESES_ABERTOS
+from persistencia import ArquivoVersionado, ArquivoCorrompidoError, ConflitoDeVersao, chave_numero
+from instrumentacao import medido
+
+NIVEL_COMPRESSAO = 6
+
+_MES_ANO = re.compile(r"\b(\d{1,2})/(\d{4})\b")
+
+
+def periodo_da_data(data):
+    """"aaaa-mm" de uma data dd/mm/aaaa; None se a data não for válida."""
+    try:
+        dia, mes, ano = (int(x) for x in str(data).split("/"))
+        date(ano, mes, dia)
+    except ValueError:
+        return None
+    return f"{ano:04d}-{mes:02d}"
+
+
+def periodo_do_pedido(pedido):
+    return periodo_da_data(pedido.get("data", ""))
+
+
+def primeiro_periodo_aberto(hoje=None, meses_abertos=MESES_ABERTOS):
+    """Mês mais antigo que ainda fica em pedidos.json ("aaaa-mm")."""
+    hoje = hoje or date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - (meses_abertos - 1)
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+
+def periodos_no_texto(texto):
+    """Meses citados numa busca ("03/2024", "15/03/2024") como "aaaa-mm"."""
+    return sorted({f"{int(ano):04d}-{int(mes):02d}" for mes, ano in _MES_ANO.findall(texto) if 1 <= int(mes) <= 12})
+
+
+def _versao_do_arquivo(entrada):
+    """O que identifica o conteúdo de um mês: o arquivo e os pedidos escondidos dele."""
+    return entrada["arquivo"], tuple(sorted(entrada.get("excluidos", ())))
+
+
+def _gravar_atomico(caminho, dados):
+    temporario = f"{caminho}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(temporario, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+class ArquivoPeriodos:
+    """
+    Manifesto e arquivos dos meses fechados de um pedidos.json.
+    Os meses lidos ficam em memória até o manifesto apontar outro arquivo para eles.
+    """
+
+    def __init__(self, arquivo_pedidos):
+        self.arquivo = str(arquivo_pedidos)
+        self.pasta = os.path.dirname(self.arquivo)
+        self.manifesto = ArquivoVersionado(f"{self.arquivo}.periodos", lambda e: e["periodo"])
+        self.entradas = {}   # periodo -> entrada do manifesto
+        self._lidos = {}     # periodo -> (_versao_do_arquivo, pedidos)
+        self._por_id = {}    # id -> pedido, dos meses já lidos
+        self._trava = threading.RLock()
+
+    def recarregar(self):
+        """Relê o manifesto; meses lidos cujo arquivo (ou lista de excluídos) mudou são descartados."""
+        with self._trava:
+            self.entradas = {e["periodo"]: e for e in self.manifesto.carregar()}
+            mudaram = [p for p, (versao, _) in self._lidos.items()
+                       if p not in self.entradas or _versao_do_arquivo(self.entradas[p]) != versao]
+            for periodo in mudaram:
+                for pedido in self._lidos.pop(periodo)[1]:
+                    self._por_id.pop(pedido.get("id"), None)
+        return self.entradas
+
+    # --- Consultas (sem abrir os arquivos) ---
+    def periodos(self, de=None, ate=None):
+        """Meses fechados ("aaaa-mm") entre `de` e `ate` (também "aaaa-mm"), em ordem."""
+        return sorted(p for p in self.entradas if (de is None or p >= de) and (ate is None or p <= ate))
+
+    def quantidade(self):
+        return sum(e.get("pedidos", 0) - len(e.get("excluidos", ())) for e in self.entradas.values())
+
+    def periodos_do_numero(self, numero):
+        """Meses cuja faixa de números inclui `numero`."""
+        numero = chave_numero(numero)
+        if numero is None:
+            return []
+        return sorted(p for p, e in self.entradas.items()
+                      if e.get("numero_min") is not None and e["numero_min"] <= numero <= e["numero_max"])
+
+    def lido(self, periodo):
+        return periodo in self._lidos
+
+    def obter(self, id_pedido):
+        """Pedido fechado pelo id, entre os meses já lidos (ou None)."""
+        return self._por_id.get(id_pedido)
+
+    # --- Leitura ---
+    @medido("periodos.ler", lambda self, periodo: {"periodo": periodo})
+    def ler(self, periodo):
+        """Pedidos completos do mês (lidos uma vez), sem os "excluidos" da entrada.
+        O sha256 do manifesto é conferido."""
+        with self._trava:
+            entrada = self.entradas.get(periodo)
+            if entrada is None:
+                return []
+            lido = self._lidos.get(periodo)
+            if lido is not None and lido[0] == _versao_do_arquivo(entrada):
+                return lido[1]
+            caminho = os.path.join(self.pasta, entrada["arquivo"])
+            with open(caminho, "rb") as f:
+                bruto = f.read()
+            if hashlib.sha256(bruto).hexdigest() != entrada["sha256"]:
+                raise ArquivoCorrompidoError(f"{caminho}: conteúdo não confere com o manifesto.")
+            try:
+                pedidos = json.loads(gzip.decompress(bruto).decode("utf-8"))["pedidos"]
+            except (OSError, ValueError, KeyError) as e:
+                raise ArquivoCorrompidoError(f"{caminho}: {e}") from e
+            excluidos = set(entrada.get("excluidos", ()))
+            if excluidos:
+                pedidos = [p for p in pedidos if p.get("id") not in excluidos]
+            self._lidos[periodo] = (_versao_do_arquivo(entrada), pedidos)
+            for pedido in pedidos:
+                self._por_id[pedido.get("id")] = pedido
+            return pedidos
+
+    # --- Fechamento ---
+    def gravar(self, periodo, pedidos):
+        """
+        Grava o arquivo do mês com `pedidos` (completos) somados aos que ele já tinha e
+        troca a entrada no manifesto. Se outra estação fechou o mesmo mês ao mesmo tempo,
+        levanta ConflitoDeVersao e o arquivo novo é apagado.
+        """
+        with self._trava:
+            novos = {p["id"] for p in pedidos}
+            todos = [p for p in self.ler(periodo) if p.get("id") not in novos] + list(pedidos)
+            bruto = gzip.compress(json.dumps({"periodo": periodo, "pedidos": todos}, ensure_ascii=False,
+                                             separators=(",", ":")).encode("utf-8"), NIVEL_COMPRESSAO, mtime=0)
+            nome = f"{os.path.basename(self.arquivo)}.periodo.{periodo}.{uuid.uuid4().hex[:8]}.gz"
+            caminho = os.path.join(self.pasta, nome)
+            _gravar_atomico(caminho, bruto)
+
+            numeros = [n for n in (chave_numero(p.get("numero")) for p in todos) if n is not None]
+            entrada = {"periodo": periodo, "arquivo": nome, "pedidos": len(todos),
+                       "total": round(sum(float(p.get("total", 0) or 0) for p in todos), 2),
+                       "numero_min": min(numeros, default=None), "numero_max": max(numeros, default=None),
+                       "tamanho": len(bruto), "sha256": hashlib.sha256(bruto).hexdigest()}
+            anterior = self.entradas.get(periodo)
+            lista = sorted([e for p, e in self.entradas.items() if p != periodo] + [entrada],
+                           key=lambda e: e["periodo"])
+            try:
+                gravadas = self.manifesto.salvar(lista)
+            except ConflitoDeVersao:
+                os.remove(caminho)
+                raise
+            self.entradas = {e["periodo"]: e for e in gravadas}
+            self._lidos[periodo] = (_versao_do_arquivo(entrada), todos)
+            for pedido in todos:
+                self._por_id[pedido.get("id")] = pedido
+            if anterior is not None:
+                try:
+                    os.remove(os.path.join(self.pasta, anterior["arquivo"]))
+                except OSError:
+                    pass  # aberto em outra estação; fica sem uso
+            return entrada
+
+    def excluir(self, ids_por_periodo):
+        """
+        Esconde pedidos que ficaram no arquivo do mês mas não valem mais (excluídos ou alterados
+        enquanto o mês era gravado): lista "excluidos" da entrada, até o mês ser regravado.
+        """
+        with self._trava:
+            while True:
+                self.recarregar()
+                lista = []
+                for periodo, entrada in sorted(self.entradas.items()):
+                    ids = ids_por_periodo.get(periodo)
+                    if ids:
+                        entrada = dict(entrada, excluidos=sorted(set(entrada.get("excluidos", ())) | set(ids)))
+                    lista.append(entrada)
+                try:
+                    self.manifesto.salvar(lista)
+                    break
+                except ConflitoDeVersao:
+                    continue  # outra estação mexeu no mesmo mês: relê e tenta de novo
+            self.recarregar()
@@ -0,0 +1,955 @@
+import glob
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from config import BACKEND, ARQUIVO_PEDIDOS
+from instrumentacao import medido, contar
+
+# Tamanho do diário (bytes) a partir do qual ele é consolidado no arquivo principal
+LIMITE_DIARIO = 2 * 1024 * 1024
+
+# Versão do formato do arquivo principal de pedidos ({"formato": 5, "geracao": g, "pedidos": [...]})
+# 3: o pedido guarda só a referência do cliente (carteira.referencia_cliente), não o cadastro inteiro
+# 4: a foto guarda só o cabeçalho; os itens ficam em pedidos.json.itens ("itens_pos": [início, bytes])
+# 5: o arquivo de itens é o que a foto indica em "arquivo_itens" (a compactação pode reescrevê-lo)
+FORMATO_PEDIDOS = 5
+
+# Listas de itens lidas de pedidos.json.itens mantidas em memória (as mais recentes)
+MAX_ITENS_EM_CACHE = 256
+
+# Primeiro número de pedido (pedidos antigos começavam em 1001)
+PRIMEIRO_NUMERO = 1001
+
+# Reserva de versão abandonada (programa fechado no meio de um salvamento) expira após este tempo (s)
+VALIDADE_RESERVA = 10
+
+
+class ArquivoCorrompidoError(Exception):
+    """O arquivo existe mas não é um JSON válido: não pode ser tratado como lista vazia."""
+
+
+class ConflitoDeVersao(Exception):
+    """Outra janela/estação gravou o mesmo registro antes: os dados locais estavam desatualizados."""
+
+
+def chave_numero(numero):
+    """Número do pedido como int (pedidos antigos podem tê-lo como texto); None se não for número."""
+    try:
+        return int(numero)
+    except (TypeError, ValueError):
+        return None
+
+
+def _arquivo(caminho):
+    """Campo "arquivo" dos trechos medidos (instrumentacao)."""
+    return {"arquivo": os.path.basename(str(caminho))}
+
+
+# --- Funções de Persistência ---
+@medido("carregar_json", _arquivo)
+def carregar_json(arquivo):
+    """Lê um JSON. Arquivo inexistente vira []; arquivo ilegível levanta ArquivoCorrompidoError
+    (devolver [] faria o próximo salvamento apagar os dados)."""
+    if os.path.exists(arquivo):
+        try:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError as e:
+            raise ArquivoCorrompidoError(f"{arquivo}: {e}") from e
+    return []
+
+@medido("salvar_json", lambda dados, arquivo, *a, **k: _arquivo(arquivo))
+def salvar_json(dados, arquivo, indent=4):
+    """Grava num temporário, faz fsync e troca pelo definitivo: uma queda no meio
+    da gravação nunca deixa o arquivo pela metade."""
+    arquivo = str(arquivo)
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    # Nome único: duas janelas/estações salvando juntas não dividem o mesmo temporário
+    temporario = f"{arquivo}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(temporario, "w", encoding="utf-8") as f:
+            if indent is None:
+                json.dump(dados, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(dados, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, arquivo)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def arquivos_com_diario(arquivo):
+    """O arquivo principal mais os diários (.diario.<g>), os itens (.itens e .itens.<id>) e os meses
+    fechados (.periodos e os arquivos que ele lista, periodos.py) que existirem ao lado dele."""
+    arquivo = str(arquivo)
+    try:
+        fechados = [os.path.join(os.path.dirname(arquivo), e["arquivo"]) for e in carregar_json(arquivo + ".periodos")]
+    except ArquivoCorrompidoError:
+        fechados = sorted(glob.glob(glob.escape(arquivo) + ".periodo.*.gz"))
+    return ([arquivo] + sorted(glob.glob(glob.escape(arquivo) + ".diario.*"))
+            + arquivos_de_itens(arquivo) + glob.glob(glob.escape(arquivo) + ".periodos") + fechados)
+
+
+def arquivos_de_itens(arquivo):
+    """Arquivos de itens ao lado do arquivo de pedidos: o original (.itens) e os reescritos (.itens.<id>)."""
+    arquivo = str(arquivo)
+    return sorted(glob.glob(glob.escape(arquivo) + ".itens") + glob.glob(glob.escape(arquivo) + ".itens.*"))
+
+
+def anexar_itens(arquivo, listas):
+    """
+    Acrescenta as listas de itens ao arquivo de itens, uma linha JSON por pedido, numa única
+    escrita com O_APPEND (várias estações podem anexar juntas). Devolve [início, bytes] de cada uma.
+    O arquivo só cresce: uma posição gravada vale enquanto ele existir (ArmazemPedidos.compactar
+    passa os itens em uso para um arquivo novo quando o desperdício fica grande).
+    """
+    linhas = [json.dumps(itens, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+              for itens in listas]
+    if not linhas:
+        return []
+    with open(arquivo, "ab", buffering=0) as f:
+        f.write(b"".join(linhas))
+        os.fsync(f.fileno())
+        inicio = f.tell() - sum(len(l) for l in linhas)
+    posicoes = []
+    for linha in linhas:
+        posicoes.append([inicio, len(linha)])
+        inicio += len(linha)
+    return posicoes
+
+
+def ler_itens(arquivo, posicao):
+    """Itens gravados por anexar_itens em `posicao` ([início, bytes])."""
+    inicio, tamanho = posicao
+    with open(arquivo, "rb") as f:
+        f.seek(inicio)
+        return json.loads(f.read(tamanho).decode("utf-8"))
+
+
+class CacheItens:
+    """Itens de pedido lidos sob demanda, com os MAX_ITENS_EM_CACHE mais recentes em memória (LRU)."""
+
+    def __init__(self, maximo=MAX_ITENS_EM_CACHE):
+        self.maximo = maximo
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave, carregar):
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        itens = carregar()
+        with self._trava:
+            self._itens[chave] = itens
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+        return itens
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+
+def abrir_armazem_pedidos():
+    """Armazém de pedidos do backend configurado (config.BACKEND)."""
+    if BACKEND == "sqlite":
+        from banco import ArmazemPedidosSQLite
+        return ArmazemPedidosSQLite()
+    return ArmazemPedidos(ARQUIVO_PEDIDOS)
+
+
+def ler_versao(arquivo):
+    """Carimbo de versão (arquivo.versao) de uma lista versionada; 0 se ainda não existe."""
+    try:
+        with open(f"{arquivo}.versao", "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def incrementar_versao(arquivo):
+    """Avança o carimbo de versão de um arquivo trocado por fora (ex.: restauração de backup),
+    para que as janelas abertas façam merge em vez de sobrescrevê-lo."""
+    salvar_json(ler_versao(arquivo) + 1, f"{arquivo}.versao")
+
+
+# ==============================
+# Listas versionadas (clientes, acessórios)
+# ==============================
+class ArquivoVersionado:
+    """
+    Lista JSON com carimbo de versão (arquivo.versao) e concorrência otimista.
+
+    Cada salvamento reserva o número da versão seguinte criando "arquivo.v<n>"
+    de forma exclusiva (O_EXCL): só um gravador consegue cada número, sem trava
+    global. Quem chega com uma versão velha relê o arquivo e faz um merge de três
+    vias por chave: as alterações locais (em relação ao que foi carregado) são
+    aplicadas sobre a versão mais nova. Se o mesmo registro mudou dos dois lados
+    de forma diferente, levanta ConflitoDeVersao.
+    """
+
+    def __init__(self, arquivo, chave):
+        self.arquivo = str(arquivo)
+        self.chave = chave
+        self.versao = 0
+        self._base = {}  # chave -> registro serializado, como estava ao carregar
+
+    @staticmethod
+    def _serializar(registro):
+        return json.dumps(registro, sort_keys=True, ensure_ascii=False)
+
+    def _chaves(self, dados):
+        """Chave de cada registro; repetições (arquivos antigos) ganham sufixo #n."""
+        vistos, chaves = {}, []
+        for r in dados:
+            c = str(self.chave(r))
+            n = vistos.get(c, 0)
+            vistos[c] = n + 1
+            chaves.append(f"{c}#{n}" if n else c)
+        return chaves
+
+    def _mapa(self, dados):
+        return {c: self._serializar(r) for c, r in zip(self._chaves(dados), dados)}
+
+    def _ler_versao(self):
+        return ler_versao(self.arquivo)
+
+    def _ler(self):
+        # Versão lida antes dos dados: se mudar no meio, o merge do próximo salvamento resolve
+        versao = self._ler_versao()
+        return versao, carregar_json(self.arquivo)
+
+    def carregar(self):
+        versao, dados = self._ler()
+        self._definir_base(dados, versao)
+        return dados
+
+    def _definir_base(self, dados, versao):
+        self.versao = versao
+        self._base = self._mapa(dados)
+
+    def _reservar(self, versao):
+        reserva = f"{self.arquivo}.v{versao}"
+        try:
+            os.close(os.open(reserva, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            # Reserva de um gravador que caiu antes de terminar
+            try:
+                if self._ler_versao() < versao and time.time() - os.path.getmtime(reserva) > VALIDADE_RESERVA:
+                    os.remove(reserva)
+            except OSError:
+                pass
+            return False
+
+    def _mesclar(self, meus, deles):
+        atual = self._mapa(meus)
+        chaves_deles = self._chaves(deles)
+        resultado = dict(zip(chaves_deles, deles))
+        ordem = list(chaves_deles)
+        for chave, serializado in atual.items():
+            base = self._base.get(chave)
+            if serializado == base:
+                continue  # não mudou aqui
+            deles_ser = self._serializar(resultado[chave]) if chave in resultado else None
+            if deles_ser not in (base, serializado):
+                raise ConflitoDeVersao(f"O registro {chave} foi alterado em outra janela/estação.")
+            if chave not in resultado:
+                if base is not None:
+                    raise ConflitoDeVersao(f"O registro {chave} foi excluído em outra janela/estação.")
+                ordem.append(chave)
+            resultado[chave] = json.loads(serializado)
+        for chave, base in self._base.items():
+            if chave not in atual and chave in resultado:
+                # Excluído aqui: só vale se lá ninguém alterou
+                if self._serializar(resultado[chave]) != base:
+                    raise ConflitoDeVersao(f"O registro {chave} foi alterado em outra janela/estação.")
+                del resultado[chave]
+        return [resultado[c] for c in ordem if c in resultado]
+
+    def salvar(self, dados):
+        """Grava a lista e devolve a lista efetivamente gravada (com as alterações de outros, se houver)."""
+        while True:
+            versao_atual, deles = self._ler()
+            if versao_atual != self.versao:
+                dados = self._mesclar(dados, deles)
+                self._definir_base(deles, versao_atual)
+            if not self._reservar(versao_atual + 1):
+                time.sleep(0.05)
+                continue
+            salvar_json(dados, self.arquivo)
+            salvar_json(versao_atual + 1, f"{self.arquivo}.versao")
+            # As reservas ficam como marca das versões já usadas; as antigas podem sair
+            try:
+                os.remove(f"{self.arquivo}.v{versao_atual - 1}")
+            except OSError:
+                pass
+            self._definir_base(dados, versao_atual + 1)
+            return dados
+
+
+# ==============================
+# Armazenamento de pedidos com diário (journal)
+# ==============================
+class ArmazemPedidos:
+    """
+    Pedidos guardados como "foto" (pedidos.json) + diário de alterações.
+    Cada inserção/alteração/exclusão acrescenta UMA linha JSON ao diário, então
+    o custo de salvar não depende do tamanho do histórico. Ao carregar, a foto é
+    lida e o diário reaplicado. Quando o diário passa de LIMITE_DIARIO, ele é
+    consolidado numa nova foto em segundo plano.
+
+    Os diários são numerados por geração (pedidos.json.diario.<g>). A foto informa
+    a geração a partir da qual o diário vale e até onde o diário anterior já está
+    incluído nela.
+
+    Várias janelas/estações podem gravar no mesmo diário: antes e depois de cada
+    gravação o diário é relido, e cada pedido tem uma revisão ("rev"). Uma
+    alteração feita sobre uma revisão antiga é rejeitada (ConflitoDeVersao).
+
+    Números de pedido: o armazém é a sequência. O maior número já usado ("ultimo_numero")
+    fica na foto e avança com o diário, e nunca volta (excluir não libera o número).
+    Uma inserção leva o número no próprio registro. Se outra estação gravou o mesmo
+    número antes, o registro é ignorado por todos ao reaplicar o diário e a inserção
+    tenta o próximo. Assim o número é único sem trava, e uma queda no meio não consome nada.
+
+    Itens: a foto só tem o cabeçalho de cada pedido (número, data, cliente, total) e a
+    posição dos itens no arquivo de itens, lidos sob demanda por itens()/completo()
+    (com cache LRU). Pedidos que vieram do diário têm os itens na memória até a
+    próxima compactação, que os passa para o arquivo de itens. O arquivo de itens só
+    cresce; quando mais da metade dele já não é usada, a compactação copia as linhas
+    em uso para um arquivo novo (pedidos.json.itens.<id>), indicado na foto.
+
+    Meses fechados: só os últimos MESES_ABERTOS meses ficam aqui. Os anteriores são
+    gravados em arquivos por mês (periodos.ArquivoPeriodos) e saem da lista com um
+    registro "arquivar" no diário; pedidos_fechados() os lê sob demanda, só leitura.
+    """
+
+    def __init__(self, arquivo, limite_diario=LIMITE_DIARIO):
+        self.arquivo = str(arquivo)
+        self.arquivo_itens = f"{self.arquivo}.itens"
+        self.limite_diario = limite_diario
+        self.cache_itens = CacheItens()
+        self.pedidos = []
+        self._por_id = {}
+        self._por_numero = {}  # número -> [pedidos] (mais de um só em arquivos antigos)
+        self._ultimo_numero = PRIMEIRO_NUMERO - 1
+        self._ultima_op = {}   # id do pedido -> op_id do último registro aplicado
+        self._clientes = {}    # foto do cliente -> dict compartilhado pelos pedidos (carteira.compartilhar_clientes)
+        self._migrados = 0     # pedidos lidos com o cadastro inteiro do cliente (formato antigo)
+        self._removidos = set()  # ids excluídos pelo diário nesta sessão (concluir_arquivamento)
+        self._posicoes = {}    # geração -> bytes do diário já aplicados
+        self._base = 0         # gerações a partir desta são sempre lidas
+        self._compactacao = None
+        self._itens_novos = None  # (arquivo de itens, [(pedido, cópia gravada na foto)]) da última compactação
+        self.ao_aplicar = None  # função(op, pedido) chamada a cada registro aplicado
+        from periodos import ArquivoPeriodos
+        self.periodos = ArquivoPeriodos(self.arquivo)
+
+    # --- Diário ---
+    def _caminho_diario(self, geracao):
+        return f"{self.arquivo}.diario.{geracao}"
+
+    def _geracoes_existentes(self):
+        padrao = re.compile(re.escape(os.path.basename(self.arquivo)) + r"\.diario\.(\d+)$")
+        geracoes = []
+        for caminho in glob.glob(glob.escape(self.arquivo) + ".diario.*"):
+            m = padrao.search(os.path.basename(caminho))
+            if m:
+                geracoes.append(int(m.group(1)))
+        return sorted(geracoes)
+
+    def _ler_diario(self, geracao, posicao=0):
+        """Lê os registros completos a partir de `posicao`. Devolve (registros, nova posição).
+        Uma linha que não é JSON válido (gravação interrompida) é ignorada."""
+        with open(self._caminho_diario(geracao), "rb") as f:
+            if posicao > os.fstat(f.fileno()).st_size:
+                # Diário apagado e recriado (gravação atrasada numa geração já compactada):
+                # relê do início; o que já foi aplicado é descartado por id/rev
+                posicao = 0
+            f.seek(posicao)
+            conteudo = f.read()
+        fim = conteudo.rfind(b"\n") + 1
+        registros = []
+        for linha in conteudo[:fim].split(b"\n"):
+            if not linha.strip():
+                continue
+            try:
+                registros.append(json.loads(linha.decode("utf-8")))
+            except ValueError:
+                continue
+        return registros, posicao + fim
+
+    # --- Índice por número ---
+    def _indexar_numero(self, pedido):
+        numero = chave_numero(pedido.get("numero"))
+        if numero is not None:
+            self._por_numero.setdefault(numero, []).append(pedido)
+            self._ultimo_numero = max(self._ultimo_numero, numero)
+
+    def _desindexar_numero(self, pedido):
+        numero = chave_numero(pedido.get("numero"))
+        mesmos = self._por_numero.get(numero)
+        if mesmos:
+            mesmos[:] = [p for p in mesmos if p is not pedido]
+            if not mesmos:
+                del self._por_numero[numero]
+
+    def _reindexar_numeros(self, ultimo=None):
+        self._por_numero = {}
+        self._ultimo_numero = max(PRIMEIRO_NUMERO - 1, chave_numero(ultimo) or 0)
+        for p in self.pedidos:
+            self._indexar_numero(p)
+
+    def _aplicar(self, registro):
+        from carteira import compartilhar_clientes
+
+        op, id_pedido, rev = registro.get("op"), registro.get("id"), registro.get("rev")
+        pedido = self._por_id.get(id_pedido)
+        if op in ("inserir", "atualizar") and "pedido" in registro:
+            self._migrados += compartilhar_clientes([registro["pedido"]], self._clientes)
+        if op == "inserir":
+            if pedido is not None:
+                return
+            # "numero" no registro: número tirado da sequência, que só vale se ainda estiver
+            # à frente dela (registros antigos não têm o campo e entram como estão)
+            if "numero" in registro and (chave_numero(registro["numero"]) or 0) <= self._ultimo_numero:
+                return
+            pedido = registro["pedido"]
+            self.pedidos.append(pedido)
+            self._por_id[id_pedido] = pedido
+            self._indexar_numero(pedido)
+        elif op == "atualizar":
+            # rev ausente: registro gravado antes do controle de revisão
+            if pedido is None or (rev is not None and rev != pedido.get("rev", 0) + 1):
+                return
+            self._desindexar_numero(pedido)
+            pedido.clear()
+            pedido.update(registro["pedido"])
+            self._indexar_numero(pedido)
+        elif op == "remover":
+            if pedido is None or (rev is not None and rev != pedido.get("rev", 0)):
+                return
+            del self._por_id[id_pedido]
+            self._desindexar_numero(pedido)
+            self.pedidos.remove(pedido)
+            self._removidos.add(id_pedido)
+        elif op == "arquivar":
+            # Pedidos gravados nos arquivos dos meses; quem foi alterado depois continua aberto
+            fechados = {i for i, r in registro.get("pedidos", {}).items()
+                        if i in self._por_id and self._por_id[i].get("rev", 0) == r}
+            for i in fechados:
+                self._desindexar_numero(self._por_id.pop(i))
+            if fechados:
+                self.pedidos[:] = [p for p in self.pedidos if p["id"] not in fechados]
+            self.periodos.recarregar()
+        else:
+            return
+        contar("diario.registros_aplicados")
+        self._ultima_op[id_pedido] = registro.get("op_id")
+        if self.ao_aplicar:
+            self.ao_aplicar(op, pedido)
+
+    def sincronizar(self):
+        """Aplica o que outras janelas/estações gravaram desde a última leitura.
+        Devolve quantos registros foram lidos."""
+        if self._itens_novos is not None:
+            self._trocar_arquivo_itens()
+        existentes = self._geracoes_existentes()
+        if any(g not in existentes for g in self._posicoes if g >= self._base):
+            return self._recarregar_compactado()
+        lidos = 0
+        for g in existentes:
+            if g < self._base and g not in self._posicoes:
+                continue
+            try:
+                registros, self._posicoes[g] = self._ler_diario(g, self._posicoes.get(g, 0))
+            except FileNotFoundError:
+                # Apagada por uma compactação depois da listagem
+                if g >= self._base:
+                    return self._recarregar_compactado()
+                existentes = [e for e in existentes if e != g]
+                continue
+            for registro in registros:
+                self._aplicar(registro)
+            lidos += len(registros)
+        for g in list(self._posicoes):
+            if g not in existentes:
+                del self._posicoes[g]
+        return lidos
+
+    def _recarregar_compactado(self):
+        # Uma geração que acompanhávamos sumiu (compactada por outra estação): recarrega tudo
+        self.carregar()
+        if self.ao_aplicar:
+            self.ao_aplicar("recarregar", None)
+        return len(self.pedidos)
+
+    def _anexar(self, registro):
+        """Grava o registro na geração mais nova e relê o diário (inclusive o próprio registro).
+        Devolve True se foi este o registro aplicado ao pedido."""
+        registro["op_id"] = uuid.uuid4().hex
+        self.sincronizar()
+        geracao = max(self._posicoes)
+        # Uma única escrita com O_APPEND; a quebra de linha inicial isola um registro interrompido
+        linha = b"\n" + json.dumps(registro, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with open(self._caminho_diario(geracao), "ab", buffering=0) as f:
+            f.write(linha)
+            os.fsync(f.fileno())
+            tamanho = f.tell()
+        self.sincronizar()
+        if tamanho >= self.limite_diario:
+            self.compactar()
+        return self._ultima_op.get(registro["id"]) == registro["op_id"]
+
+    # --- Carga ---
+    @medido("pedidos.carregar")
+    def carregar(self):
+        """Lê a foto, reaplica o diário e devolve a lista de pedidos.
+        Uma foto ilegível levanta ArquivoCorrompidoError em vez de virar lista vazia.
+        Pedidos com o cadastro inteiro do cliente (formato 2 ou diário antigo) ficam só com a
+        referência, e uma compactação grava a foto já enxuta."""
+        from carteira import compartilhar_clientes
+
+        self.pedidos, self._por_id, self._ultima_op, self._posicoes = [], {}, {}, {}
+        self._clientes, self._migrados = {}, 0
+        self.cache_itens.limpar()
+        self.periodos.recarregar()
+        dados = carregar_json(self.arquivo)
+        geracoes = self._geracoes_existentes()
+
+        if isinstance(dados, dict):
+            self.pedidos = dados.get("pedidos", [])
+            self.arquivo_itens = os.path.join(os.path.dirname(self.arquivo), dados.get("arquivo_itens") or
+                                              f"{os.path.basename(self.arquivo)}.itens")
+            self._por_id = {p["id"]: p for p in self.pedidos}
+            self._base = dados.get("geracao", 0)
+            self._posicoes = {int(g): pos for g, pos in dados.get("posicoes", {}).items() if int(g) in geracoes}
+            self._migrados = compartilhar_clientes(self.pedidos, self._clientes)
+            self._reindexar_numeros(dados.get("ultimo_numero"))
+            formato_antigo = dados.get("formato", 0) < FORMATO_PEDIDOS
+        else:
+            # Arquivo antigo (lista simples) ou restaurado de backup: ganha ids e vira a nova foto
+            self.pedidos = dados if isinstance(dados, list) else []
+            for p in self.pedidos:
+                p.setdefault("id", uuid.uuid4().hex)
+            compartilhar_clientes(self.pedidos, self._clientes)
+            self._por_id = {p["id"]: p for p in self.pedidos}
+            self._reindexar_numeros()
+            formato_antigo = False
+            self._separar_itens(self.pedidos)
+            self._base = (geracoes[-1] + 1) if geracoes else 1
+            salvar_json({"formato": FORMATO_PEDIDOS, "geracao": self._base, "posicoes": {},
+                         "ultimo_numero": self._ultimo_numero, "arquivo_itens": os.path.basename(self.arquivo_itens),
+                         "pedidos": self.pedidos},
+                        self.arquivo, indent=None)
+            for g in geracoes:
+                os.remove(self._caminho_diario(g))
+
+        if not os.path.exists(self._caminho_diario(self._base)):
+            open(self._caminho_diario(self._base), "ab").close()
+        self._posicoes.setdefault(self._base, 0)
+        ouvinte, self.ao_aplicar = self.ao_aplicar, None
+        self.sincronizar()
+        self.ao_aplicar = ouvinte
+        if self._migrados or formato_antigo:
+            # Migração: a nova foto sai sem os cadastros repetidos e com os itens no arquivo
+            # de itens (em segundo plano, como sempre)
+            contar("pedidos.clientes_migrados", self._migrados)
+            self._migrados = 0
+            self.compactar()
+        return self.pedidos
+
+    # --- Alterações ---
+    def obter(self, id_pedido):
+        return self._por_id.get(id_pedido)
+
+    # --- Itens (sob demanda) ---
+    def _separar_itens(self, pedidos, arquivo=None):
+        """Passa os itens que estão na memória para o arquivo de itens (ou `arquivo`), deixando só a posição."""
+        com_itens = [p for p in pedidos if "itens" in p]
+        for p, posicao in zip(com_itens, anexar_itens(arquivo or self.arquivo_itens, [p["itens"] for p in com_itens])):
+            del p["itens"]
+            p["itens_pos"] = posicao
+
+    def _vale_reescrever_itens(self, pedidos):
+        """Mais da metade do arquivo de itens já não é usada por `pedidos` (alterados, excluídos e
+        arquivados deixam a linha para trás), e a sobra passa do limite do diário."""
+        try:
+            tamanho = os.path.getsize(self.arquivo_itens)
+        except FileNotFoundError:
+            return False
+        usados = sum(p["itens_pos"][1] for p in pedidos if "itens" not in p and "itens_pos" in p)
+        return tamanho - usados > max(usados, self.limite_diario)
+
+    def _reescrever_itens(self, pedidos):
+        """
+        Copia para um arquivo de itens novo só as linhas que `pedidos` (cópias da foto) usam,
+        na ordem do arquivo, e troca a posição nessas cópias. Devolve o arquivo novo.
+        """
+        novo = f"{self.arquivo}.itens.{uuid.uuid4().hex[:8]}"
+        no_arquivo = sorted((p for p in pedidos if "itens" not in p and "itens_pos" in p),
+                            key=lambda p: p["itens_pos"][0])
+        inicio = 0
+        with open(self.arquivo_itens, "rb") as origem, open(novo, "wb") as destino:
+            for p in no_arquivo:
+                antiga = p["itens_pos"]
+                origem.seek(antiga[0])
+                destino.write(origem.read(antiga[1]))
+                p["itens_pos"] = [inicio, antiga[1]]
+                inicio += antiga[1]
+            destino.flush()
+            os.fsync(destino.fileno())
+        return novo
+
+    def _trocar_arquivo_itens(self):
+        """
+        Depois de uma compactação (thread da interface, em sincronizar): os pedidos da memória
+        que não mudaram desde a foto passam a usar as posições gravadas nela. Os itens que
+        vieram do diário saem da memória (senão seriam anexados de novo na próxima
+        compactação) e, se o arquivo de itens foi reescrito, as posições apontam para o novo.
+        """
+        arquivo, pares = self._itens_novos
+        self._itens_novos = None
+        for pedido, copia in pares:
+            if ("itens_pos" in copia and self._por_id.get(pedido["id"]) is pedido
+                    and pedido.get("rev") == copia.get("rev")):
+                pedido.pop("itens", None)
+                pedido["itens_pos"] = copia["itens_pos"]
+        if arquivo != self.arquivo_itens:
+            self.arquivo_itens = arquivo
+            self.cache_itens.limpar()
+
+    def _apagar_itens_antigos(self, manter):
+        for caminho in arquivos_de_itens(self.arquivo):
+            if caminho not in manter:
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass  # aberto em outra estação; sai na próxima troca
+
+    def itens(self, pedido):
+        """Itens do pedido: da memória (pedidos do diário) ou do arquivo de itens, via cache."""
+        if "itens" in pedido:
+            return pedido["itens"]
+        if "itens_pos" not in pedido:
+            return []
+        posicao = tuple(pedido["itens_pos"])
+        try:
+            return self.cache_itens.obter(posicao, lambda: ler_itens(self.arquivo_itens, posicao))
+        except FileNotFoundError:
+            # Arquivo de itens trocado por outra estação (compactação ou restauração): relê e tenta de novo
+            self._recarregar_compactado()
+            atual = self._por_id.get(pedido.get("id"))
+            if atual is None or atual is pedido:
+                raise
+            return self.itens(atual)
+
+    def itens_em_lote(self, pedidos, arquivo=None):
+        """(pedido, itens) de cada pedido, lendo o arquivo de itens (ou `arquivo`, anotado junto
+        com as cópias dos pedidos) uma vez e em ordem, sem passar pelo cache (relatórios).
+        Pode rodar fora da thread da interface: nunca recarrega o armazém, e um arquivo de
+        itens que sumiu levanta FileNotFoundError."""
+        # Arquivo e posições anotados antes: a interface pode trocar o arquivo de itens no meio
+        arquivo = arquivo or self.arquivo_itens
+        no_arquivo = []
+        for p in pedidos:
+            posicao = p.get("itens_pos")
+            if "itens" in p or posicao is None:
+                yield p, p.get("itens", [])
+            else:
+                no_arquivo.append((posicao, p))
+        if not no_arquivo:
+            return
+        no_arquivo.sort(key=lambda x: x[0][0])
+        with open(arquivo, "rb") as f:
+            for (inicio, tamanho), p in no_arquivo:
+                f.seek(inicio)
+                yield p, json.loads(f.read(tamanho).decode("utf-8"))
+
+    def completo(self, pedido):
+        """Cópia do pedido com os itens (para editar, gerar o PDF ou exportar)."""
+        completo = {k: v for k, v in pedido.items() if k != "itens_pos"}
+        completo["itens"] = self.itens(pedido)
+        return completo
+
+    def por_numero(self, numero):
+        """Pedido pelo número (ou None). Em arquivos antigos com números repetidos, o primeiro."""
+        mesmos = self._por_numero.get(chave_numero(numero))
+        return mesmos[0] if mesmos else None
+
+    def localizar_numero(self, numero):
+        """Pedido pelo número, aberto ou de um mês fechado (só o mês cuja faixa inclui o
+        número é lido). None se não existir."""
+        pedido = self.por_numero(numero)
+        if pedido is not None:
+            return pedido
+        numero = chave_numero(numero)
+        for periodo in self.periodos.periodos_do_numero(numero):
+            pedido = next((p for p in self.pedidos_fechados([periodo])
+                           if chave_numero(p.get("numero")) == numero), None)
+            if pedido is not None:
+                return pedido
+        return None
+
+    def filtrar(self, texto):
+        """Busca respondida pelo armazém (banco.ArmazemPedidosSQLite). Aqui sempre None:
+        o histórico usa o índice em memória (busca.py)."""
+        return None
+
+    def proximo_numero(self):
+        """Número que a próxima inserção tentará usar (só informativo: quem garante é inserir)."""
+        self.sincronizar()
+        return self._ultimo_numero + 1
+
+    def inserir(self, pedido):
+        """Grava um pedido novo com o próximo número da sequência e devolve o objeto que
+        passa a representá-lo na lista."""
+        pedido.setdefault("id", uuid.uuid4().hex)
+        pedido["rev"] = 1
+        while True:
+            # _anexar sincroniza antes de gravar: o número só se perde para uma gravação simultânea
+            self.sincronizar()
+            pedido["numero"] = self._ultimo_numero + 1
+            if self._anexar({"op": "inserir", "id": pedido["id"], "rev": 1,
+                             "numero": pedido["numero"], "pedido": pedido}):
+                return self._por_id[pedido["id"]]
+
+    def atualizar(self, id_pedido, dados, rev_base):
+        """Aplica `dados` ao pedido se ele ainda estiver na revisão `rev_base`."""
+        self.sincronizar()
+        atual = self._por_id.get(id_pedido)
+        if atual is None:
+            raise ConflitoDeVersao("O pedido foi excluído em outra janela/estação.")
+        if atual.get("rev", 0) != rev_base:
+            raise ConflitoDeVersao("O pedido foi alterado em outra janela/estação.")
+        novo = dict(atual, **dados)
+        if "itens" in dados:
+            novo.pop("itens_pos", None)
+        novo["rev"] = rev_base + 1
+        if not self._anexar({"op": "atualizar", "id": id_pedido, "rev": rev_base + 1, "pedido": novo}):
+            raise ConflitoDeVersao("O pedido foi alterado em outra janela/estação.")
+        return atual
+
+    def remover(self, id_pedido, rev_base):
+        self.sincronizar()
+        atual = self._por_id.get(id_pedido)
+        if atual is None:
+            return
+        if atual.get("rev", 0) != rev_base:
+            raise ConflitoDeVersao("O pedido foi alterado em outra janela/estação.")
+        if not self._anexar({"op": "remover", "id": id_pedido, "rev": rev_base}):
+            raise ConflitoDeVersao("O pedido foi alterado em outra janela/estação.")
+
+    # --- Meses fechados ---
+    def pedidos_fechados(self, periodos=None):
+        """Pedidos completos dos meses fechados informados ("aaaa-mm"; todos, se None), lidos
+        sob demanda. Um pedido que ainda está aberto (alterado durante o fechamento) vale o aberto."""
+        if periodos is None:
+            periodos = self.periodos.periodos()
+        return [p for periodo in periodos for p in self.periodos.ler(periodo) if p["id"] not in self._por_id]
+
+    def meses_fechados(self):
+        return self.periodos.periodos()
+
+    def quantidade_fechados(self):
+        return self.periodos.quantidade()
+
+    def obter_fechado(self, id_pedido):
+        """Pedido de um mês fechado já lido por pedidos_fechados (ou None)."""
+        return None if id_pedido in self._por_id else self.periodos.obter(id_pedido)
+
+    def selecionar_para_arquivar(self, hoje=None):
+        """{mês: [pedidos]} abertos cujo mês já deveria estar fechado (cópias rasas, para
+        gravar_periodos rodar em outra thread)."""
+        from periodos import periodo_do_pedido, primeiro_periodo_aberto
+
+        self.sincronizar()
+        limite = primeiro_periodo_aberto(hoje)
+        selecao = {}
+        for p in self.pedidos:
+            periodo = periodo_do_pedido(p)
+            if periodo is not None and periodo < limite:
+                selecao.setdefault(periodo, []).append(dict(p))
+        return selecao
+
+    @medido("pedidos.gravar_periodos", lambda self, selecao, *a, **k: {"meses": len(selecao)})
+    def gravar_periodos(self, selecao, ao_progresso=None, arquivo_itens=None):
+        """
+        Grava os meses selecionados nos arquivos de período (pode rodar fora da thread da
+        interface: usa um manifesto próprio e só lê os itens, por itens_em_lote, do
+        `arquivo_itens` anotado com a seleção). Devolve {mês: {id: rev}} dos meses gravados;
+        um mês que outra estação fechou ao mesmo tempo fica para a próxima vez.
+        """
+        from periodos import ArquivoPeriodos
+
+        periodos = ArquivoPeriodos(self.arquivo)
+        periodos.recarregar()
+        gravados = {}
+        for n, (periodo, pedidos) in enumerate(sorted(selecao.items()), 1):
+            try:
+                # Não passa por completo()/itens(): fora da thread da interface o armazém não é recarregado
+                itens = {p["id"]: i for p, i in self.itens_em_lote(pedidos, arquivo_itens)}
+                completos = [{**{k: v for k, v in p.items() if k != "itens_pos"}, "itens": itens[p["id"]]}
+                             for p in pedidos]
+                periodos.gravar(periodo, completos)
+            except ConflitoDeVersao:
+                continue
+            gravados[periodo] = {p["id"]: p.get("rev", 0) for p in pedidos}
+            if ao_progresso:
+                ao_progresso(int(n * 100 / len(selecao)))
+        return gravados
+
+    def concluir_arquivamento(self, gravados):
+        """
+        Tira da lista aberta (registro "arquivar" no diário) os pedidos que gravar_periodos gravou.
+        Os excluídos ou alterados enquanto o mês era gravado ficaram no arquivo do mês com a
+        cópia antiga: entram na lista "excluidos" do manifesto e deixam de aparecer como fechados.
+        """
+        if not gravados:
+            return
+        self._anexar({"op": "arquivar", "id": "periodos",
+                      "pedidos": {i: rev for mes in gravados.values() for i, rev in mes.items()}})
+        descartados = {}
+        for periodo, pedidos in gravados.items():
+            ids = [i for i, rev in pedidos.items()
+                   if i in self._removidos or (i in self._por_id and self._por_id[i].get("rev", 0) != rev)]
+            if ids:
+                descartados[periodo] = ids
+        if descartados:
+            self.periodos.excluir(descartados)
+
+    def arquivar_periodos(self, hoje=None):
+        """Fecha de uma vez os meses vencidos (benchmark e linha de comando)."""
+        gravados = self.gravar_periodos(self.selecionar_para_arquivar(hoje))
+        self.concluir_arquivamento(gravados)
+        return gravados
+
+    # --- Compactação ---
+    def compactar(self, aguardar=False):
+        """Começa uma geração nova do diário e grava a foto consolidada numa thread separada.
+        Só uma estação consegue criar cada geração (O_EXCL); as outras apenas passam a usá-la."""
+        if self._compactacao is not None and self._compactacao.is_alive():
+            return
+        self.sincronizar()
+        anterior = max(self._posicoes)
+        nova = anterior + 1
+        try:
+            os.close(os.open(self._caminho_diario(nova), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return
+        self._posicoes[nova] = 0
+        self._base = nova
+        # A foto inclui o diário anterior até onde foi lido; o que alguém ainda
+        # gravar nele depois disso é reaplicado a partir de "posicoes"
+        foto = {"formato": FORMATO_PEDIDOS, "geracao": nova, "posicoes": {str(anterior): self._posicoes[anterior]},
+                "ultimo_numero": self._ultimo_numero, "arquivo_itens": None, "pedidos": [dict(p) for p in self.pedidos]}
+        originais = list(self.pedidos)
+        em_uso = self.arquivo_itens
+
+        def gravar():
+            # Itens primeiro: se cair no meio, sobra só texto (ou um arquivo) sem uso
+            arquivo_itens = em_uso
+            if self._vale_reescrever_itens(foto["pedidos"]):
+                arquivo_itens = self._reescrever_itens(foto["pedidos"])
+            self._separar_itens(foto["pedidos"], arquivo_itens)
+            foto["arquivo_itens"] = os.path.basename(arquivo_itens)
+            salvar_json(foto, self.arquivo, indent=None)
+            self._itens_novos = (arquivo_itens, list(zip(originais, foto["pedidos"])))
+            if arquivo_itens != em_uso:
+                # O arquivo anterior fica até a próxima troca, como o diário anterior
+                self._apagar_itens_antigos({arquivo_itens, em_uso})
+            for g in self._geracoes_existentes():
+                if g < anterior:
+                    try:
+                        os.remove(self._caminho_diario(g))
+                    except OSError:
+                        pass  # ainda aberto por outra estação; sai na próxima compactação
+
+        self._compactacao = threading.Thread(target=gravar, name="compactar-pedidos", daemon=True)
+        self._compactacao.start()
+        if aguardar:
+            self._compactacao.join()
+
+    # --- Restauração ---
+    def recarregar(self):
+        """Relê tudo do disco e avisa o ouvinte ("recarregar")."""
+        self.carregar()
+        if self.ao_aplicar:
+            self.ao_aplicar("recarregar", None)
+        return self.pedidos
+
+    def reservar_geracao(self):
+        """Cria (O_EXCL) uma geração do diário acima de todas as existentes e devolve o número."""
+        while True:
+            nova = max(self._geracoes_existentes() + [self._base]) + 1
+            try:
+                os.close(os.open(self._caminho_diario(nova), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return nova
+            except FileExistsError:
+                continue
+
+    def preparar_restauracao(self, pedidos, destino):
+        """
+        Parte demorada de trocar todos os pedidos (restauração de backup), para rodar fora da
+        thread da interface: os pedidos ganham id e referência do cliente, os itens vão para um
+        arquivo de itens novo, ao lado de `destino`, e os cabeçalhos ficam em `destino` (lista
+        JSON) para instalar_restauracao. Nada do que está em uso muda.
+        Devolve (maior número de pedido da lista ou None, nome do arquivo de itens).
+        """
+        from carteira import compartilhar_clientes
+
+        for p in pedidos:
+            p.setdefault("id", uuid.uuid4().hex)
+        compartilhar_clientes(pedidos)
+        nome_itens = f"{os.path.basename(self.arquivo)}.itens.{uuid.uuid4().hex[:8]}"
+        self._separar_itens(pedidos, os.path.join(os.path.dirname(str(destino)), nome_itens))
+        salvar_json(pedidos, destino, indent=None)
+        numeros = [n for n in (chave_numero(p.get("numero")) for p in pedidos) if n is not None]
+        return max(numeros, default=None), nome_itens
+
+    def instalar_restauracao(self, lista, geracao, ultimo_numero, arquivo_itens):
+        """
+        Troca todos os pedidos pelos de `lista` (preparar_restauracao), com os itens em
+        `arquivo_itens` (o nome, já na pasta dos pedidos): viram a foto da geração `geracao`
+        (reservar_geracao), sem diário, e os diários e arquivos de itens antigos são apagados.
+        A lista é só copiada para dentro da foto; o arquivo atual, que pode estar danificado, não é lido.
+        Repetir com os mesmos argumentos dá o mesmo resultado. Outras estações percebem a troca
+        e recarregam; este armazém também precisa de recarregar().
+        """
+        self.fechar()
+        cabecalho = json.dumps({"formato": FORMATO_PEDIDOS, "geracao": geracao, "posicoes": {},
+                                "ultimo_numero": ultimo_numero, "arquivo_itens": arquivo_itens},
+                               ensure_ascii=False, separators=(",", ":"))
+        temporario = f"{self.arquivo}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temporario, "wb") as f, open(lista, "rb") as origem:
+                f.write(cabecalho[:-1].encode("utf-8") + b',"pedidos":')
+                shutil.copyfileobj(origem, f, 1024 * 1024)
+                f.write(b"}")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.arquivo)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        for g in self._geracoes_existentes():
+            if g < geracao:
+                try:
+                    os.remove(self._caminho_diario(g))
+                except OSError:
+                    pass
+        self._apagar_itens_antigos({os.path.join(os.path.dirname(self.arquivo), arquivo_itens)})
+
+    def fechar(self):
+        if self._compactacao is not None:
+            self._compactacao.join()
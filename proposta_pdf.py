@@ -0,0 +1,296 @@
+import io
+import os
+import threading
+import time
+
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+
+from instrumentacao import medido
+
+# O logo é desenhado com 80x80 pt; 3 px por ponto já basta para impressão
+TAMANHO_LOGO = 80
+PIXELS_LOGO = TAMANHO_LOGO * 3
+# Itens em tabelas de até N linhas: o progresso e o cancelamento andam entre uma e outra
+LINHAS_POR_TABELA = 50
+
+
+class GeracaoCancelada(Exception):
+    """A geração do PDF foi cancelada pelo usuário."""
+
+
+# ==============================
+# Modelo da proposta (montado uma vez por processo)
+# ==============================
+class ModeloProposta:
+    """
+    Partes fixas da proposta: estilos, logo já decodificado e reduzido, estilos das
+    tabelas e o cabeçalho da empresa. Cada documento só monta o cliente e os itens.
+    """
+
+    DADOS_EMPRESA = [
+        ["Iorli de Fatima Marcondes Rosa Representações"],
+        ["CNPJ: 34.308.499/0001-10 | IE: 1706084.2144-6"],
+        ["R. Arcendino Rosa Neves 278 - Xaxim, Curitiba - PR"],
+        ["Telefone: (41) 99914-7644 | Email: nelsonrosaperfis@yahoo.com.br"]
+    ]
+
+    def __init__(self, logo_path=None):
+        self.styles = getSampleStyleSheet()
+        self.logo_png = self._carregar_logo(logo_path or self._localizar_logo())
+        self.estilo_empresa = TableStyle([('ALIGN', (0,0), (-1,-1), 'RIGHT'), ('FONTSIZE', (0,0), (-1,-1), 9)])
+        self.estilo_linha = TableStyle([('BACKGROUND', (0,0), (-1,-1), colors.darkgreen)])
+        self.estilo_cliente = TableStyle([('SPAN', (0,0), (1,0)), ('BACKGROUND', (0,0), (1,0), colors.whitesmoke), ('GRID', (0,0), (-1,-1), 0.5, colors.grey)])
+        # Linhas alternadas num único comando (antes: um BACKGROUND por linha par)
+        self.estilo_itens = TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.darkgreen), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('GRID', (0,0), (-1,-2), 0.5, colors.grey), ('FONTSIZE', (0,-1), (-1,-1), 12),
+            ('ROWBACKGROUNDS', (0,1), (-1,-2), [None, colors.whitesmoke])])
+        # Tabelas de itens antes da última (sem a linha do TOTAL)
+        self.estilo_itens_parcial = TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.darkgreen), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0,1), (-1,-1), [None, colors.whitesmoke])])
+        self._local = threading.local()  # flowables do cabeçalho, um jogo por thread
+
+    @staticmethod
+    def _localizar_logo():
+        for pasta in (os.path.abspath("."), os.path.dirname(os.path.abspath(__file__))):
+            caminho = os.path.join(pasta, "logoverde.png")
+            if os.path.exists(caminho):
+                return caminho
+        return None
+
+    @staticmethod
+    def _carregar_logo(caminho):
+        """PNG do logo já reduzido ao tamanho de impressão (None se não houver logo)."""
+        if not caminho or not os.path.exists(caminho):
+            return None
+        try:
+            from PIL import Image as ImagemPIL
+        except ImportError:
+            with open(caminho, "rb") as f:
+                return f.read()
+        with ImagemPIL.open(caminho) as img:
+            img = img.convert("RGB")
+            img.thumbnail((PIXELS_LOGO, PIXELS_LOGO), ImagemPIL.LANCZOS)
+            saida = io.BytesIO()
+            img.save(saida, format="PNG")
+            return saida.getvalue()
+
+    def cabecalho(self):
+        """Flowables do cabeçalho da empresa. Reaproveitados entre documentos da mesma
+        thread (o Image guarda o logo decodificado)."""
+        elementos = getattr(self._local, "cabecalho", None)
+        if elementos is None:
+            if self.logo_png:
+                img = Image(io.BytesIO(self.logo_png), width=TAMANHO_LOGO, height=TAMANHO_LOGO)
+            else:
+                img = Spacer(1, TAMANHO_LOGO)
+            t_emp = Table(self.DADOS_EMPRESA, colWidths=[400]); t_emp.setStyle(self.estilo_empresa)
+            elementos = [
+                Table([[img, t_emp]], colWidths=[100, 400]),
+                Spacer(1, 10),
+                Table([[""]], colWidths=[500], rowHeights=[2], style=self.estilo_linha),
+                Spacer(1, 15),
+            ]
+            self._local.cabecalho = elementos
+        return list(elementos)
+
+
+_modelo = None
+_trava_modelo = threading.Lock()
+
+def modelo_padrao():
+    """ModeloProposta compartilhado pelo processo (criado na primeira proposta)."""
+    global _modelo
+    if _modelo is None:
+        with _trava_modelo:
+            if _modelo is None:
+                _modelo = ModeloProposta()
+    return _modelo
+
+
+# ==============================
+# Geração
+# ==============================
+class _TabelaItens(Table):
+    """Tabela de itens da proposta. Os pedaços de uma que quebra de página são da mesma
+    classe (Table._splitRows usa self.__class__), então cada um conta no progresso."""
+
+
+class _DocProposta(SimpleDocTemplate):
+    """
+    SimpleDocTemplate que informa o progresso e permite cancelar entre um elemento e outro.
+    Os itens vão em várias tabelas curtas (e cada página de uma tabela também passa por
+    afterFlowable), então o cancelamento vale no meio da lista e o progresso conta linhas.
+    """
+
+    def __init__(self, *args, ao_progresso=None, cancelado=None, total_elementos=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._ao_progresso = ao_progresso
+        self._cancelado = cancelado
+        self._total = max(total_elementos, 1)
+        self._feitos = 0
+
+    def afterFlowable(self, flowable):
+        if isinstance(flowable, _TabelaItens):
+            self._feitos += len(flowable._cellvalues) - 1  # cada pedaço começa pelo cabeçalho
+        else:
+            self._feitos += 1
+        if self._cancelado and self._cancelado():
+            raise GeracaoCancelada()
+        if self._ao_progresso:
+            self._ao_progresso(min(99, int(self._feitos * 100 / self._total)))
+
+
+@medido("pdf.gerar_proposta", lambda pedido, *a, **k: {"numero": pedido.get("numero"), "itens": len(pedido.get("itens", []))})
+def gerar_pdf_proposta(pedido, caminho, ao_progresso=None, cancelado=None, modelo=None):
+    """
+    Gera o PDF da proposta em `caminho`. Não depende de Qt: pode rodar em thread ou processo.
+    ao_progresso(pct) é chamado ao longo da montagem; se cancelado() devolver True, a geração
+    para, o arquivo parcial é apagado e GeracaoCancelada é levantada.
+    """
+    modelo = modelo or modelo_padrao()
+    styles = modelo.styles
+    largura_a4, altura_a4 = A4
+
+    def desenhar_moldura(canvas, doc):
+        canvas.saveState()
+        canvas.setStrokeColor(colors.darkgreen); canvas.setLineWidth(1.5)
+        canvas.rect(25, 25, largura_a4 - 50, altura_a4 - 50)
+        canvas.setFont('Helvetica-Oblique', 8)
+        canvas.drawString(40, 35, f"Iorli Representações - Proposta #{pedido['numero']}")
+        canvas.drawRightString(largura_a4 - 40, 35, f"Página {doc.page}")
+        canvas.restoreState()
+
+    elementos = modelo.cabecalho()
+    elementos.append(Paragraph(f"<b>PROPOSTA COMERCIAL Nº {pedido['numero']}</b>", styles['Title']))
+    elementos.append(Paragraph(f"Data: {pedido['data']}", styles['Normal']))
+    elementos.append(Spacer(1, 15))
+
+    cli = pedido["cliente"] if isinstance(pedido["cliente"], dict) else {"nome": str(pedido["cliente"])}
+    d_cli = [
+        [Paragraph("<b>DADOS DO CLIENTE</b>", styles['Normal']), ""],
+        [f"Nome: {cli.get('nome','')}", f"CPF/CNPJ: {cli.get('cpf_cnpj','')}"],
+        [f"Cidade: {cli.get('cidade','')} - {cli.get('estado','')}", f"Telefone: {cli.get('telefone','')}"]
+    ]
+    t_c = Table(d_cli, colWidths=[250, 250]); t_c.setStyle(modelo.estilo_cliente)
+    elementos.append(t_c); elementos.append(Spacer(1, 20))
+
+    # Itens com CÓDIGO no PDF, em tabelas de LINHAS_POR_TABELA linhas (cabeçalho repetido
+    # também quando uma delas quebra de página); a última traz o TOTAL
+    cabecalho_itens = ["Cód", "Descrição do Perfil", "Qtd", "Peso Tot.", "Subtotal"]
+    linhas = [[str(i.get("codigo", "")), i["nome"], str(i["qtd"]), f"{i['peso_total']:.2f}kg", f"R$ {i['subtotal']:.2f}"]
+              for i in pedido["itens"]]
+    inicios = range(0, len(linhas), LINHAS_POR_TABELA) if linhas else [0]
+    for inicio in inicios:
+        itens_pdf = [cabecalho_itens] + linhas[inicio:inicio + LINHAS_POR_TABELA]
+        ultima = inicio + LINHAS_POR_TABELA >= len(linhas)
+        if ultima:
+            itens_pdf.append(["", "", "", "TOTAL:", f"R$ {pedido['total']:.2f}"])
+        t_i = _TabelaItens(itens_pdf, colWidths=[50, 210, 60, 90, 90], repeatRows=1)
+        t_i.setStyle(modelo.estilo_itens if ultima else modelo.estilo_itens_parcial)
+        elementos.append(t_i)
+
+    doc = _DocProposta(caminho, pagesize=A4, rightMargin=45, leftMargin=45, topMargin=45, bottomMargin=45,
+                       ao_progresso=ao_progresso, cancelado=cancelado,
+                       total_elementos=len(elementos) - len(inicios) + len(linhas) + 1)
+    try:
+        doc.build(elementos, onFirstPage=desenhar_moldura, onLaterPages=desenhar_moldura)
+    except GeracaoCancelada:
+        if os.path.exists(caminho):
+            os.remove(caminho)
+        raise
+    if ao_progresso:
+        ao_progresso(100)
+    return caminho
+
+
+# ==============================
+# Medição: python proposta_pdf.py [repeticoes]
+# ==============================
+def _gerar_original(pedido, caminho):
+    """A geração de antes do modelo em cache, só para comparação: estilos montados a cada
+    documento, logo PNG original num Image simples e um BACKGROUND por linha par."""
+    styles = getSampleStyleSheet()
+    elementos = []
+    logo_path = ModeloProposta._localizar_logo()
+    img = Image(logo_path, width=TAMANHO_LOGO, height=TAMANHO_LOGO) if logo_path else Spacer(1, TAMANHO_LOGO)
+    t_emp = Table(ModeloProposta.DADOS_EMPRESA, colWidths=[400])
+    t_emp.setStyle(TableStyle([('ALIGN', (0,0), (-1,-1), 'RIGHT'), ('FONTSIZE', (0,0), (-1,-1), 9)]))
+    elementos.append(Table([[img, t_emp]], colWidths=[100, 400]))
+    elementos.append(Spacer(1, 10))
+    elementos.append(Table([[""]], colWidths=[500], rowHeights=[2], style=[('BACKGROUND', (0,0), (-1,-1), colors.darkgreen)]))
+    elementos.append(Spacer(1, 15))
+    elementos.append(Paragraph(f"<b>PROPOSTA COMERCIAL Nº {pedido['numero']}</b>", styles['Title']))
+    elementos.append(Paragraph(f"Data: {pedido['data']}", styles['Normal']))
+    elementos.append(Spacer(1, 15))
+
+    cli = pedido["cliente"]
+    d_cli = [
+        [Paragraph("<b>DADOS DO CLIENTE</b>", styles['Normal']), ""],
+        [f"Nome: {cli.get('nome','')}", f"CPF/CNPJ: {cli.get('cpf_cnpj','')}"],
+        [f"Cidade: {cli.get('cidade','')} - {cli.get('estado','')}", f"Telefone: {cli.get('telefone','')}"]
+    ]
+    t_c = Table(d_cli, colWidths=[250, 250])
+    t_c.setStyle(TableStyle([('SPAN', (0,0), (1,0)), ('BACKGROUND', (0,0), (1,0), colors.whitesmoke), ('GRID', (0,0), (-1,-1), 0.5, colors.grey)]))
+    elementos.append(t_c); elementos.append(Spacer(1, 20))
+
+    itens_pdf = [["Cód", "Descrição do Perfil", "Qtd", "Peso Tot.", "Subtotal"]]
+    for i in pedido["itens"]:
+        itens_pdf.append([str(i.get("codigo", "")), i["nome"], str(i["qtd"]), f"{i['peso_total']:.2f}kg", f"R$ {i['subtotal']:.2f}"])
+    itens_pdf.append(["", "", "", "TOTAL:", f"R$ {pedido['total']:.2f}"])
+    t_i = Table(itens_pdf, colWidths=[50, 210, 60, 90, 90])
+    estilo = [('BACKGROUND', (0,0), (-1,0), colors.darkgreen), ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke), ('GRID', (0,0), (-1,-2), 0.5, colors.grey), ('FONTSIZE', (0,-1), (-1,-1), 12)]
+    for r in range(1, len(itens_pdf)-1):
+        if r % 2 == 0: estilo.append(('BACKGROUND', (0,r), (-1,r), colors.whitesmoke))
+    t_i.setStyle(TableStyle(estilo))
+    elementos.append(t_i)
+
+    largura_a4, altura_a4 = A4
+
+    def desenhar_moldura(canvas, doc):
+        canvas.saveState()
+        canvas.setStrokeColor(colors.darkgreen); canvas.setLineWidth(1.5)
+        canvas.rect(25, 25, largura_a4 - 50, altura_a4 - 50)
+        canvas.setFont('Helvetica-Oblique', 8)
+        canvas.drawString(40, 35, f"Iorli Representações - Proposta #{pedido['numero']}")
+        canvas.drawRightString(largura_a4 - 40, 35, f"Página {doc.page}")
+        canvas.restoreState()
+
+    doc = SimpleDocTemplate(caminho, pagesize=A4, rightMargin=45, leftMargin=45, topMargin=45, bottomMargin=45)
+    doc.build(elementos, onFirstPage=desenhar_moldura, onLaterPages=desenhar_moldura)
+
+
+def medir(repeticoes=50, linhas=20):
+    """Tempo médio (s) de uma proposta com `linhas` itens: geração original x modelo em cache."""
+    import tempfile
+    pedido = {"numero": 1001, "data": "01/10/2026",
+              "cliente": {"nome": "Cliente Teste", "cpf_cnpj": "123.456.789-00", "cidade": "Curitiba", "estado": "PR"},
+              "itens": [{"codigo": f"P{n:03}", "nome": f"Perfil {n}", "qtd": 6, "peso_total": 7.5, "subtotal": 180.0}
+                        for n in range(linhas)],
+              "total": 180.0 * linhas}
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "proposta.pdf")
+        # Aquece imports e fontes dos dois caminhos
+        _gerar_original(pedido, caminho)
+        gerar_pdf_proposta(pedido, caminho)
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            _gerar_original(pedido, caminho)
+        original = (time.perf_counter() - inicio) / repeticoes
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            gerar_pdf_proposta(pedido, caminho)
+        com_cache = (time.perf_counter() - inicio) / repeticoes
+    return {"original": original, "com_cache": com_cache}
+
+
+if __name__ == "__main__":
+    import sys
+    r = medir(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
+    print(f"geração original: {r['original'] * 1000:.1f} ms")
+    print(f"modelo em cache:  {r['com_cache'] * 1000:.1f} ms  ({r['original'] / r['com_cache']:.1f}x)")
@@ -0,0 +1,149 @@
+import time
+from datetime import date
+
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QSpinBox,
+    QTableView, QHeaderView, QMessageBox
+)
+from PyQt5.QtCore import QThreadPool
+
+from sessao import sessao
+from modelos import ModeloRelatorio
+from tarefas import TarefaAnalise
+
+MESES = ["jan", "fev", "mar", "abr", "mai", "jun", "jul", "ago", "set", "out", "nov", "dez"]
+DIMENSOES = [("mes", "Mês"), ("cliente", "Cliente"), ("perfil", "Perfil"), ("cidade", "Cidade")]
+METRICAS = [("peso_total", "Peso (kg)", lambda v: f"{v:.3f} kg"),
+            ("subtotal", "Valor (R$)", lambda v: f"R$ {v:.2f}"),
+            ("qtd", "Quantidade", lambda v: f"{v:.0f}")]
+
+
+class AbaRelatorios(QWidget):
+    """
+    Aba de relatórios da tela de pedidos: um ano contra o anterior por mês, cliente, perfil
+    ou cidade. A tabela de vendas (analise.TabelaVendas) é montada em segundo plano na
+    primeira vez que a aba aparece e depois acompanha cada pedido salvo ou excluído.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sessao = sessao()
+        self.armazem = self.sessao.armazem
+        self.tabela = None
+        self.tarefa = None
+        self.pendentes = {}  # id -> pedido (None: excluído) alterados enquanto a tabela é montada
+
+        layout = QVBoxLayout(self)
+        filtros = QHBoxLayout()
+        self.combo_dimensao = QComboBox()
+        for chave, rotulo in DIMENSOES:
+            self.combo_dimensao.addItem(rotulo, chave)
+        self.combo_metrica = QComboBox()
+        for chave, rotulo, _ in METRICAS:
+            self.combo_metrica.addItem(rotulo, chave)
+        hoje = date.today()
+        self.spin_ano = QSpinBox()
+        self.spin_ano.setRange(2000, 2100)
+        self.spin_ano.setValue(hoje.year)
+        self.combo_ate = QComboBox()
+        self.combo_ate.addItems(MESES)
+        self.combo_ate.setCurrentIndex(hoje.month - 1)
+        for rotulo, campo in (("Agrupar por:", self.combo_dimensao), ("Medida:", self.combo_metrica),
+                              ("Ano:", self.spin_ano), ("Até o mês:", self.combo_ate)):
+            filtros.addWidget(QLabel(rotulo))
+            filtros.addWidget(campo)
+        filtros.addStretch()
+        layout.addLayout(filtros)
+
+        self.modelo = ModeloRelatorio(self)
+        self.tabela_relatorio = QTableView()
+        self.tabela_relatorio.setModel(self.modelo)
+        self.tabela_relatorio.setEditTriggers(QTableView.NoEditTriggers)
+        self.tabela_relatorio.verticalHeader().setVisible(False)
+        self.tabela_relatorio.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.tabela_relatorio)
+
+        self.lbl_resumo = QLabel("")
+        self.lbl_resumo.setStyleSheet("font-weight: bold;")
+        layout.addWidget(self.lbl_resumo)
+
+        for combo in (self.combo_dimensao, self.combo_metrica, self.combo_ate):
+            combo.currentIndexChanged.connect(self.atualizar)
+        self.spin_ano.valueChanged.connect(self.atualizar)
+        self.sessao.pedido_alterado.connect(self.pedido_alterado)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.tabela is None:
+            self.montar()
+
+    # --- Tabela de vendas ---
+    def montar(self):
+        if self.tarefa is not None:
+            return
+        self.pendentes = {}
+        tarefa = TarefaAnalise(self.armazem, self.sessao.carteira.ids_por_chave_antiga())
+        tarefa.setAutoDelete(False)
+        tarefa.sinais.progresso.connect(lambda pct: self.lbl_resumo.setText(f"Montando a tabela de vendas... {pct}%"))
+        tarefa.sinais.concluido.connect(lambda _, t=tarefa: self.montada(t))
+        tarefa.sinais.falhou.connect(self.falhou)
+        self.tarefa = tarefa
+        self.lbl_resumo.setText("Montando a tabela de vendas...")
+        QThreadPool.globalInstance().start(tarefa)
+
+    def montada(self, tarefa):
+        self.tarefa = None
+        self.tabela = tarefa.tabela
+        # O que foi salvo durante a montagem entra agora (a mesma revisão não é refeita)
+        for id_pedido, pedido in self.pendentes.items():
+            if pedido is None:
+                self.tabela.remover(id_pedido)
+            else:
+                self.tabela.substituir(pedido, self.armazem.itens(pedido))
+        self.pendentes = {}
+        self.atualizar()
+
+    def falhou(self, erro):
+        self.tarefa = None
+        self.lbl_resumo.setText("")
+        QMessageBox.warning(self, "Aviso", f"Não foi possível montar os relatórios:\n{erro}")
+
+    def pedido_alterado(self, op, pedido):
+        """Corrige só as linhas do pedido; uma recarga completa (restauração) remonta tudo.
+        "arquivar" não muda nada: os pedidos só passam para os meses fechados."""
+        if op == "recarregar":
+            self.tabela = None
+            if self.isVisible():
+                self.montar()
+            return
+        if op not in ("inserir", "atualizar", "remover"):
+            return
+        if self.tarefa is not None:
+            self.pendentes[pedido["id"]] = None if op == "remover" else pedido
+        elif self.tabela is not None:
+            if op == "remover":
+                self.tabela.remover(pedido["id"])
+            else:
+                self.tabela.substituir(pedido, self.armazem.itens(pedido))
+            if self.isVisible():
+                self.atualizar()
+
+    # --- Consulta ---
+    def atualizar(self):
+        if self.tabela is None:
+            return
+        dimensao = self.combo_dimensao.currentData()
+        metrica, _, formato = METRICAS[self.combo_metrica.currentIndex()]
+        ano, ate_mes = self.spin_ano.value(), self.combo_ate.currentIndex() + 1
+        inicio = time.perf_counter()
+        linhas = self.tabela.comparar_anos(dimensao, ano, metrica, ate_mes)
+        total = self.tabela.total_ano(ano, ate_mes)[0]
+        anterior = self.tabela.total_ano(ano - 1, ate_mes)[0]
+        ms = (time.perf_counter() - inicio) * 1000
+        self.modelo.definir_relatorio(linhas, self.combo_dimensao.currentText(), ano, formato)
+
+        m = [c for c, _, _ in METRICAS].index(metrica)
+        variacao = f" ({(total[m] - anterior[m]) * 100 / anterior[m]:+.1f}%)" if anterior[m] else ""
+        self.lbl_resumo.setText(
+            f"{ano} (jan–{MESES[ate_mes - 1]}): {formato(total[m])} contra {formato(anterior[m])} em {ano - 1}"
+            f"{variacao} — {len(self.tabela)} linhas, consulta em {ms:.0f} ms")
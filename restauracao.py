@@ -0,0 +1,288 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (PASTA_DADOS, ARQUIVO_CLIENTES, ARQUIVO_ACESSORIOS, ARQUIVO_PEDIDOS, ARQUIVO_PRECO_KG, BACKEND,
+                    ARQUIVO_RESTAURACAO_PENDENTE)
+from backup import RepositorioBackup, BackupError
+from persistencia import ArmazemPedidos, ArquivoCorrompidoError, carregar_json, salvar_json, incrementar_versao
+from instrumentacao import medido
+
+_DIARIO = re.compile(r"^pedidos\.json\.diario\.\d+$")
+_ITENS = re.compile(r"^pedidos\.json\.itens(\.[0-9a-f]+)?$")
+_PERIODOS = "pedidos.json.periodos"
+_PERIODO = re.compile(r"^pedidos\.json\.periodo\.\d{4}-\d{2}\.[0-9a-f]+\.gz$")
+# Cabeçalhos dos pedidos restaurados, prontos para virar a foto (ArmazemPedidos.preparar_restauracao)
+_LISTA = "pedidos.restaurados.json"
+
+# Um aviso de troca mais novo que isto (s) pode ser de outra estação ainda trocando os arquivos
+ESPERA_RETOMADA = 60
+
+
+# ==============================
+# Validação do conteúdo
+# ==============================
+def _lista_de_dicts(dados, obrigatorios, nome):
+    if not isinstance(dados, list):
+        raise BackupError(f"{nome}: esperada uma lista.")
+    for n, item in enumerate(dados):
+        if not isinstance(item, dict) or any(campo not in item for campo in obrigatorios):
+            raise BackupError(f"{nome}: registro {n + 1} sem {', '.join(obrigatorios)}.")
+
+
+def _validar_pedidos(dados, nome):
+    lista = dados.get("pedidos") if isinstance(dados, dict) else dados
+    _lista_de_dicts(lista, ("numero",), nome)
+    # Itens na própria foto (formato antigo) ou a posição deles no arquivo de itens
+    if any("itens" not in p and "itens_pos" not in p for p in lista):
+        raise BackupError(f"{nome}: pedido sem itens.")
+
+
+def _validar_diario(conteudo, nome):
+    # Linhas interrompidas são toleradas (o leitor do diário também as ignora)
+    for linha in conteudo.decode("utf-8").split("\n"):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            continue
+        if not isinstance(registro, dict) or "op" not in registro or "id" not in registro:
+            raise BackupError(f"{nome}: registro do diário fora do formato.")
+
+
+def _validar_banco(caminho, nome):
+    try:
+        con = sqlite3.connect(caminho)
+        try:
+            resultado = con.execute("PRAGMA integrity_check").fetchone()[0]
+            tabelas = {r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        finally:
+            con.close()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{nome}: {e}") from e
+    if resultado != "ok":
+        raise BackupError(f"{nome}: {resultado}")
+    if not {"clientes", "acessorios", "pedidos"} <= tabelas:
+        raise BackupError(f"{nome}: tabelas ausentes.")
+
+
+def validar_conteudo(nome, conteudo, caminho=None):
+    """Confere se o arquivo tem o formato esperado para o nome. Levanta BackupError."""
+    try:
+        if nome == "perfibras.db":
+            _validar_banco(caminho, nome)
+        elif _DIARIO.match(nome):
+            _validar_diario(conteudo, nome)
+        elif _ITENS.match(nome):
+            # Cada linha é conferida ao montar os pedidos completos (preparar_restauracao)
+            conteudo.decode("utf-8")
+        elif _PERIODO.match(nome):
+            # Mês fechado: os pedidos completos, com os itens
+            _validar_pedidos(json.loads(gzip.decompress(conteudo).decode("utf-8")), nome)
+        else:
+            dados = json.loads(conteudo.decode("utf-8"))
+            if nome == "clientes.json":
+                _lista_de_dicts(dados, ("nome",), nome)
+            elif nome == "acessorios.json":
+                _lista_de_dicts(dados, ("codigo", "nome"), nome)
+            elif nome == "pedidos.json":
+                _validar_pedidos(dados, nome)
+            elif nome == _PERIODOS:
+                _lista_de_dicts(dados, ("periodo", "arquivo", "sha256"), nome)
+            elif nome == "preco_aluminio.json":
+                if not isinstance(dados, dict) or not isinstance(dados.get("preco_kg", 0), (int, float)):
+                    raise BackupError(f"{nome}: preço inválido.")
+    except (UnicodeDecodeError, ValueError, OSError, EOFError) as e:
+        raise BackupError(f"{nome}: {e}") from e
+
+
+# ==============================
+# Preparação (fora da thread da interface)
+# ==============================
+class RestauracaoPreparada:
+    """Arquivos do backup já conferidos e copiados para uma pasta de preparação."""
+
+    def __init__(self, pasta, arquivos, maior_numero=None, arquivo_itens=None):
+        self.pasta = pasta                  # pasta de preparação (dentro de PASTA_DADOS)
+        self.arquivos = arquivos            # nomes presentes na pasta
+        self.maior_numero = maior_numero    # maior número entre os pedidos restaurados (backend JSON)
+        self.arquivo_itens = arquivo_itens  # arquivo de itens novo, só com os itens restaurados
+
+    def descartar(self):
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+
+def _nomes_restauraveis(nomes):
+    conhecidos = {"clientes.json", "acessorios.json", "pedidos.json", "preco_aluminio.json", "perfibras.db"}
+    return [n for n in nomes
+            if n in conhecidos or n == _PERIODOS or _ITENS.match(n) or _DIARIO.match(n) or _PERIODO.match(n)]
+
+
+@medido("restauracao.preparar")
+def preparar_restauracao(pasta_backup, ao_progresso=None):
+    """
+    Confere em paralelo cada arquivo do backup (hash dos blocos e do arquivo no repositório,
+    formato JSON/esquema ou integridade do SQLite) e copia o resultado para uma pasta de
+    preparação ao lado dos dados. Nada dos dados atuais é tocado; qualquer problema levanta
+    BackupError e a preparação é descartada.
+    """
+    preparacao = os.path.join(str(PASTA_DADOS), f"restauracao_{uuid.uuid4().hex[:8]}")
+    os.makedirs(preparacao)
+    try:
+        if RepositorioBackup.eh_repositorio(pasta_backup):
+            repo = RepositorioBackup(pasta_backup)
+            geracoes = repo.geracoes()
+            if not geracoes:
+                raise BackupError("Nenhuma geração de backup encontrada nesta pasta.")
+            entradas = repo.ler_manifesto(geracoes[-1])["arquivos"]
+            nomes = _nomes_restauraveis(entradas)
+            ler = lambda nome: repo.ler_arquivo(entradas[nome])
+        else:
+            nomes = _nomes_restauraveis(os.listdir(pasta_backup))
+            def ler(nome):
+                with open(os.path.join(pasta_backup, nome), "rb") as f:
+                    return f.read()
+        if BACKEND == "sqlite" and "perfibras.db" not in nomes:
+            raise BackupError("O backup não tem o banco perfibras.db.")
+        if not nomes:
+            raise BackupError("Nenhum arquivo de dados encontrado no backup.")
+
+        feitos = []
+        def conferir(nome):
+            conteudo = ler(nome)
+            caminho = os.path.join(preparacao, nome)
+            with open(caminho, "wb") as f:
+                f.write(conteudo)
+            validar_conteudo(nome, conteudo, caminho)
+            feitos.append(nome)
+            if ao_progresso:
+                ao_progresso(int(len(feitos) * 90 / len(nomes)))
+
+        with ThreadPoolExecutor(max_workers=min(len(nomes), os.cpu_count() or 1)) as pool:
+            for futuro in [pool.submit(conferir, nome) for nome in nomes]:
+                futuro.result()  # o primeiro erro interrompe a restauração
+        if _PERIODOS in nomes:
+            with open(os.path.join(preparacao, _PERIODOS), "r", encoding="utf-8") as f:
+                faltando = [e["arquivo"] for e in json.load(f) if e["arquivo"] not in nomes]
+            if faltando:
+                raise BackupError(f"{_PERIODOS}: meses fechados ausentes no backup ({', '.join(faltando)}).")
+
+        maior_numero = arquivo_itens = None
+        if BACKEND != "sqlite" and "pedidos.json" in nomes:
+            # Foto + diário do backup consolidados numa lista, como o programa os leria
+            armazem = ArmazemPedidos(os.path.join(preparacao, "pedidos.json"))
+            try:
+                # Completos: os itens saem do arquivo de itens da preparação, que será apagada
+                pedidos = [armazem.completo(p) for p in armazem.carregar()]
+            except ArquivoCorrompidoError as e:
+                raise BackupError(str(e)) from e
+            except (OSError, ValueError) as e:
+                raise BackupError(f"{os.path.basename(armazem.arquivo_itens)}: {e}") from e
+            finally:
+                armazem.fechar()
+            # O trabalho pesado da troca também fica aqui: na thread da interface a foto só é copiada
+            # (os itens vão para um arquivo novo, só com as linhas em uso)
+            maior_numero, arquivo_itens = ArmazemPedidos(ARQUIVO_PEDIDOS).preparar_restauracao(
+                pedidos, os.path.join(preparacao, _LISTA))
+            nomes += [_LISTA, arquivo_itens]
+        if ao_progresso:
+            ao_progresso(100)
+        return RestauracaoPreparada(preparacao, nomes, maior_numero, arquivo_itens)
+    except BaseException:
+        shutil.rmtree(preparacao, ignore_errors=True)
+        raise
+
+
+# ==============================
+# Troca (thread da interface)
+# ==============================
+@medido("restauracao.aplicar")
+def aplicar_restauracao(preparada, armazem):
+    """
+    Troca os dados atuais pelos preparados. Antes de mexer em qualquer arquivo, o aviso
+    ARQUIVO_RESTAURACAO_PENDENTE anota a pasta de preparação e o que ela tem; a troca
+    (concluir_restauracao) só renomeia e copia. Se ela parar no meio, o aviso fica e a troca
+    é retomada na próxima abertura do programa (retomar_restauracao).
+    Recarregar as telas fica a cargo de quem chama (sessao.SessaoDados).
+    """
+    pendente = {"pasta": preparada.pasta, "arquivos": preparada.arquivos}
+    try:
+        if _LISTA in preparada.arquivos:
+            # A sequência não volta com o backup: números dados depois dele continuam usados
+            pendente["ultimo_numero"] = max(armazem.proximo_numero() - 1, preparada.maior_numero or 0)
+            pendente["arquivo_itens"] = preparada.arquivo_itens
+        salvar_json(pendente, ARQUIVO_RESTAURACAO_PENDENTE)
+    except BaseException:
+        preparada.descartar()
+        raise
+    armazem.fechar()
+    concluir_restauracao()
+    armazem.recarregar()
+
+
+def concluir_restauracao():
+    """
+    Faz (ou refaz) a troca anotada em ARQUIVO_RESTAURACAO_PENDENTE e apaga o aviso e a pasta
+    de preparação. Cada passo pula o que já foi feito: o que já saiu da pasta de preparação
+    já está no lugar. Devolve False se não havia troca pendente.
+    """
+    pendente = carregar_json(ARQUIVO_RESTAURACAO_PENDENTE)
+    if not pendente:
+        return False
+    pasta, arquivos = pendente["pasta"], pendente["arquivos"]
+
+    def trocar(nome, destino):
+        origem = os.path.join(pasta, nome)
+        if nome in arquivos and os.path.exists(origem):
+            os.replace(origem, destino)
+
+    if "perfibras.db" in arquivos:
+        banco = os.path.join(pasta, "perfibras.db")
+        if os.path.exists(banco):
+            from banco import banco_padrao
+            banco_padrao().restaurar_de(banco)
+            os.remove(banco)
+    else:
+        # Meses fechados antes do manifesto que aponta para eles
+        for nome in arquivos:
+            if _PERIODO.match(nome):
+                trocar(nome, os.path.join(str(PASTA_DADOS), nome))
+        # A versão avança mesmo se a troca já tinha sido feita: as janelas abertas fazem merge
+        for nome, destino in ((_PERIODOS, f"{ARQUIVO_PEDIDOS}.periodos"), ("clientes.json", ARQUIVO_CLIENTES),
+                              ("acessorios.json", ARQUIVO_ACESSORIOS)):
+            if nome in arquivos:
+                trocar(nome, destino)
+                incrementar_versao(destino)
+        lista = os.path.join(pasta, _LISTA)
+        if _LISTA in arquivos and os.path.exists(lista):
+            trocar(pendente["arquivo_itens"], os.path.join(str(PASTA_DADOS), pendente["arquivo_itens"]))
+            armazem = ArmazemPedidos(ARQUIVO_PEDIDOS)
+            if pendente.get("geracao") is None:
+                # Anotada antes de usar: uma retomada grava a mesma foto, sem criar outra geração
+                pendente["geracao"] = armazem.reservar_geracao()
+                salvar_json(pendente, ARQUIVO_RESTAURACAO_PENDENTE)
+            armazem.instalar_restauracao(lista, pendente["geracao"], pendente["ultimo_numero"], pendente["arquivo_itens"])
+            os.remove(lista)
+    trocar("preco_aluminio.json", ARQUIVO_PRECO_KG)
+    os.remove(ARQUIVO_RESTAURACAO_PENDENTE)
+    shutil.rmtree(pasta, ignore_errors=True)
+    return True
+
+
+def retomar_restauracao():
+    """Na abertura do programa: conclui uma troca que ficou pela metade (queda ou erro no meio).
+    Um aviso recente é deixado em paz: pode ser de outra estação trocando os arquivos agora."""
+    try:
+        idade = time.time() - os.path.getmtime(ARQUIVO_RESTAURACAO_PENDENTE)
+    except FileNotFoundError:
+        return False
+    if idade < ESPERA_RETOMADA:
+        return False
+    return concluir_restauracao()
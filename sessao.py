@@ -0,0 +1,102 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from catalogo import CatalogoAcessorios
+from carteira import CarteiraClientes
+from persistencia import abrir_armazem_pedidos
+from instrumentacao import medido
+
+
+class SessaoDados(QObject):
+    """
+    Dados da aplicação carregados uma única vez e compartilhados pelas telas.
+    Cada conjunto é lido do disco no primeiro acesso; as listas mantêm o mesmo objeto
+    depois de salvar/recarregar, e as telas são avisadas pelos sinais.
+    """
+
+    clientes_alterados = pyqtSignal()
+    catalogo_alterado = pyqtSignal()
+    pedido_alterado = pyqtSignal(str, object)  # (op do armazém, pedido)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._carteira = None
+        self._catalogo = None
+        self._armazem = None
+
+    # --- Clientes ---
+    @property
+    def carteira(self):
+        if self._carteira is None:
+            self._carteira = CarteiraClientes.carregar()
+        return self._carteira
+
+    @property
+    def clientes(self):
+        return self.carteira.itens
+
+    @medido("sessao.salvar_clientes")
+    def salvar_clientes(self):
+        """Grava a carteira (com merge). Conflito levanta persistencia.ConflitoDeVersao."""
+        self.carteira.salvar()
+        self.clientes_alterados.emit()
+
+    def recarregar_clientes(self):
+        self.carteira.recarregar()
+        self.clientes_alterados.emit()
+
+    # --- Catálogo ---
+    @property
+    def catalogo(self):
+        if self._catalogo is None:
+            self._catalogo = CatalogoAcessorios.carregar()
+        return self._catalogo
+
+    @medido("sessao.salvar_catalogo")
+    def salvar_catalogo(self):
+        """Grava o catálogo (com merge). Conflito levanta persistencia.ConflitoDeVersao."""
+        self.catalogo.salvar()
+        self.catalogo_alterado.emit()
+
+    def recarregar_catalogo(self):
+        self.catalogo.recarregar()
+        self.catalogo_alterado.emit()
+
+    # --- Pedidos ---
+    @property
+    def armazem(self):
+        if self._armazem is None:
+            armazem = abrir_armazem_pedidos()
+            armazem.carregar()
+            armazem.ao_aplicar = self.pedido_alterado.emit
+            self._armazem = armazem
+        return self._armazem
+
+    # --- Restauração ---
+    def restaurar(self, preparada):
+        """Aplica uma restauração já conferida (restauracao.preparar_restauracao) e recarrega,
+        no lugar, tudo o que as telas já carregaram. Nenhuma janela precisa ser reaberta."""
+        from restauracao import aplicar_restauracao
+        from configuracoes import configuracao_preco
+        armazem = self._armazem or abrir_armazem_pedidos()
+        aplicar_restauracao(preparada, armazem)
+        if self._armazem is None:
+            armazem.fechar()
+        if self._carteira is not None:
+            self.recarregar_clientes()
+        if self._catalogo is not None:
+            self.recarregar_catalogo()
+        configuracao_preco().verificar()
+
+    def fechar(self):
+        if self._armazem is not None:
+            self._armazem.fechar()
+
+
+_sessao = None
+
+def sessao():
+    """Sessão única do processo (precisa de um QApplication criado)."""
+    global _sessao
+    if _sessao is None:
+        _sessao = SessaoDados()
+    return _sessao
@@ -0,0 +1,150 @@
+import copy
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class SinaisTarefa(QObject):
+    """Sinais de uma tarefa em segundo plano (QRunnable não é QObject)."""
+    progresso = pyqtSignal(int)      # 0-100
+    concluido = pyqtSignal(str)      # caminho do arquivo gerado
+    falhou = pyqtSignal(str)         # mensagem de erro
+    cancelado = pyqtSignal()
+
+
+class TarefaPDF(QRunnable):
+    """
+    Gera o PDF de uma proposta em uma thread do QThreadPool.
+    Trabalha sobre uma cópia do pedido: a tela pode seguir editando a próxima proposta.
+    """
+
+    def __init__(self, pedido, caminho):
+        super().__init__()
+        self.pedido = copy.deepcopy(pedido)
+        self.caminho = caminho
+        self.sinais = SinaisTarefa()
+        self._cancelar = threading.Event()
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    def run(self):
+        # ReportLab só é importado quando o primeiro PDF é gerado
+        from proposta_pdf import gerar_pdf_proposta, GeracaoCancelada
+        if self._cancelar.is_set():
+            self.sinais.cancelado.emit()
+            return
+        try:
+            gerar_pdf_proposta(self.pedido, self.caminho,
+                               ao_progresso=self.sinais.progresso.emit,
+                               cancelado=self._cancelar.is_set)
+        except GeracaoCancelada:
+            self.sinais.cancelado.emit()
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit(self.caminho)
+
+
+class TarefaBackup(QRunnable):
+    """Cria uma geração de backup (backup.fazer_backup) numa thread do QThreadPool."""
+
+    def __init__(self, pasta):
+        super().__init__()
+        self.pasta = pasta
+        self.resumo = None
+        self.sinais = SinaisTarefa()
+
+    def run(self):
+        from backup import fazer_backup
+        try:
+            self.resumo = fazer_backup(self.pasta, ao_progresso=self.sinais.progresso.emit)
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit(self.resumo["geracao"])
+
+
+class TarefaRestauracao(QRunnable):
+    """Confere e prepara um backup (restauracao.preparar_restauracao) numa thread do QThreadPool.
+    A troca dos arquivos fica para a thread da interface, que recarrega as telas."""
+
+    def __init__(self, pasta):
+        super().__init__()
+        self.pasta = pasta
+        self.preparada = None
+        self.sinais = SinaisTarefa()
+
+    def run(self):
+        from restauracao import preparar_restauracao
+        try:
+            self.preparada = preparar_restauracao(self.pasta, ao_progresso=self.sinais.progresso.emit)
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit(self.pasta)
+
+
+class TarefaArquivamento(QRunnable):
+    """Grava os arquivos dos meses fechados (ArmazemPedidos.gravar_periodos) numa thread do
+    QThreadPool. Tirar os pedidos da lista aberta fica para a thread da interface, que também
+    se ressincroniza (timer) se o arquivo de itens tiver sido trocado no meio."""
+
+    def __init__(self, armazem, selecao):
+        super().__init__()
+        self.armazem = armazem
+        self.selecao = selecao
+        self.arquivo_itens = armazem.arquivo_itens  # o das posições copiadas na seleção
+        self.gravados = None
+        self.sinais = SinaisTarefa()
+
+    def run(self):
+        try:
+            self.gravados = self.armazem.gravar_periodos(self.selecao, ao_progresso=self.sinais.progresso.emit,
+                                                         arquivo_itens=self.arquivo_itens)
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit(", ".join(sorted(self.gravados)))
+
+
+class TarefaAnalise(QRunnable):
+    """Monta a tabela de vendas (analise.montar_tabela) numa thread do QThreadPool.
+    Os pedidos abertos são copiados aqui, na thread da interface."""
+
+    def __init__(self, armazem, ids_clientes=None):
+        super().__init__()
+        self.armazem = armazem
+        self.abertos = [dict(p) for p in armazem.pedidos]
+        self.ids_clientes = ids_clientes
+        self.tabela = None
+        self.sinais = SinaisTarefa()
+
+    def run(self):
+        from analise import montar_tabela
+        try:
+            self.tabela = montar_tabela(self.armazem, self.abertos, ao_progresso=self.sinais.progresso.emit,
+                                       ids_clientes=self.ids_clientes)
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit(f"{len(self.tabela)} linhas")
+
+
+class TarefaIndice(QRunnable):
+    """Monta um índice de sugestões (preparar_sugestoes do catálogo ou da carteira)
+    numa thread do QThreadPool; a tela troca o índice quando ele fica pronto."""
+
+    def __init__(self, montar):
+        super().__init__()
+        self.montar = montar
+        self.indice = None
+        self.sinais = SinaisTarefa()
+
+    def run(self):
+        try:
+            self.indice = self.montar()
+        except Exception as e:
+            self.sinais.falhou.emit(str(e))
+        else:
+            self.sinais.concluido.emit("")
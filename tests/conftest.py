@@ -0,0 +1,26 @@
+import os
+import sys
+import tempfile
+
+# config.py exige a pasta de dados antes de qualquer import do sistema
+os.environ.setdefault("PERFIBRAS_DADOS", tempfile.mkdtemp(prefix="perfibras_testes_"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from persistencia import ArmazemPedidos
+
+
+@pytest.fixture
+def armazem(tmp_path):
+    armazem = ArmazemPedidos(tmp_path / "pedidos.json")
+    armazem.carregar()
+    yield armazem
+    armazem.fechar()
+
+
+def novo_pedido(data="10/01/2024", cliente="Fulano", itens=None):
+    return {"data": data, "cliente": {"id": cliente, "nome": cliente},
+            "itens": itens if itens is not None else [{"codigo": "P1", "qtd": 1, "peso_total": 2.0, "subtotal": 90.0}],
+            "total": 90.0}
@@ -0,0 +1,76 @@
+import random
+from collections import defaultdict
+from datetime import date
+
+import pytest
+
+from analise import TabelaVendas, METRICAS, SEM_CIDADE
+
+CLIENTES = [{"id": f"c{n}", "nome": f"Cliente {n}", "cidade": cidade, "estado": "SP"}
+            for n, cidade in enumerate(["Campinas", "Santos", "Campinas", ""])]
+
+
+def gerar_pedidos(quantos, semente=7):
+    aleatorio = random.Random(semente)
+    pedidos = []
+    for n in range(quantos):
+        itens = [{"codigo": aleatorio.choice(["P1", "P2", "P3"]), "qtd": aleatorio.randint(1, 9),
+                  "peso_total": round(aleatorio.uniform(0.1, 50), 3), "subtotal": round(aleatorio.uniform(1, 900), 2)}
+                 for _ in range(aleatorio.randint(1, 6))]
+        pedidos.append({"id": f"p{n}", "rev": 1, "cliente": aleatorio.choice(CLIENTES), "itens": itens,
+                        "data": f"{aleatorio.randint(1, 28):02d}/{aleatorio.randint(1, 12):02d}/{aleatorio.choice([2023, 2024])}"})
+    return pedidos
+
+
+def agrupar_ingenuo(pedidos, rotulo, metrica, de=None, ate=None):
+    totais = defaultdict(float)
+    for p in pedidos:
+        dia, mes, ano = (int(x) for x in p["data"].split("/"))
+        if (de and date(ano, mes, dia) < de) or (ate and date(ano, mes, dia) > ate):
+            continue
+        for item in p["itens"]:
+            totais[rotulo(p, item, ano, mes)] += item[metrica]
+    return totais
+
+
+ROTULOS = {
+    "cliente": lambda p, i, ano, mes: p["cliente"]["nome"],
+    "mes": lambda p, i, ano, mes: f"{ano:04d}-{mes:02d}",
+    "cidade": lambda p, i, ano, mes: (f"{p['cliente']['cidade']}/SP" if p["cliente"]["cidade"] else SEM_CIDADE).upper(),
+}
+
+
+@pytest.fixture
+def pedidos():
+    return gerar_pedidos(300)
+
+
+@pytest.mark.parametrize("dimensao", sorted(ROTULOS))
+@pytest.mark.parametrize("metrica", METRICAS)
+def test_agrupar_confere_com_soma_ingenua(pedidos, dimensao, metrica):
+    tabela = TabelaVendas().carregar((p, p["itens"]) for p in pedidos)
+    de, ate = date(2023, 3, 1), date(2024, 8, 31)
+    esperado = agrupar_ingenuo(pedidos, ROTULOS[dimensao], metrica, de, ate)
+    assert dict(tabela.agrupar(dimensao, de, ate, metrica)) == pytest.approx(esperado)
+
+
+def test_totais_materializados_apos_alterar_e_excluir(pedidos):
+    tabela = TabelaVendas().carregar((p, p["itens"]) for p in pedidos)
+    alterados = pedidos[:40]
+    for p in alterados:
+        p["rev"] += 1
+        p["itens"] = p["itens"][:1]
+        p["data"] = p["data"][:6] + "2024"
+        tabela.substituir(p, p["itens"])
+    for p in pedidos[40:220]:  # passa da metade: a tabela se compacta
+        tabela.remover(p["id"])
+    restantes = pedidos[:40] + pedidos[220:]
+
+    for ano in (2023, 2024):
+        por_cliente = agrupar_ingenuo(restantes, ROTULOS["cliente"], "peso_total",
+                                      date(ano, 1, 1), date(ano, 6, 30))
+        linhas = {l["rotulo"]: l["atual"] for l in tabela.comparar_anos("cliente", ano, "peso_total", ate_mes=6)}
+        assert linhas == pytest.approx({c: v for c, v in por_cliente.items() if abs(v) > 1e-9})
+        total = agrupar_ingenuo(restantes, lambda *a: "", "subtotal", date(ano, 1, 1), date(ano, 12, 31))[""]
+        assert tabela.total_ano(ano)[0][METRICAS.index("subtotal")] == pytest.approx(total)
+    assert len(tabela) == sum(len(p["itens"]) for p in restantes)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import zlib
+from datetime import datetime
+
+from backup import RepositorioBackup, FORMATO_GERACAO, BLOCO_MAX, dividir_em_blocos
+
+HOJE = datetime(2024, 6, 15, 20, 0)
+
+
+def criar_geracoes(pasta, instantes):
+    repo = RepositorioBackup(pasta)
+    os.makedirs(repo.pasta_geracoes)
+    for quando in instantes:
+        with open(os.path.join(repo.pasta_geracoes, quando.strftime(FORMATO_GERACAO) + ".json"), "w") as f:
+            json.dump({"criado": quando.isoformat(), "arquivos": {}}, f)
+    return repo
+
+
+def test_retencao_avo_pai_filho(tmp_path):
+    # Duas gerações por dia em junho e uma por mês (dia 10) de jan/2023 a mai/2024
+    diarias = [datetime(2024, 6, dia, hora) for dia in range(1, 16) for hora in (8, 18)]
+    mensais = [datetime(ano, mes, 10, 12)
+               for ano, mes in [(2023, m) for m in range(1, 13)] + [(2024, m) for m in range(1, 6)]]
+    repo = criar_geracoes(tmp_path, diarias + mensais)
+
+    removidas = repo.aplicar_retencao(diarios=7, semanais=4, mensais=12, hoje=HOJE)
+
+    manter = ([datetime(2024, 6, dia, 18) for dia in range(9, 16)]    # últimos 7 dias (a mais nova de cada)
+              + [datetime(2024, 6, 2, 18)]                             # semana de 27/05 a 02/06
+              + [datetime(ano, mes, 10, 12) for ano, mes in           # 11 meses anteriores a junho/2024
+                 [(2023, m) for m in range(7, 13)] + [(2024, m) for m in range(1, 6)]])
+    esperadas = sorted(q.strftime(FORMATO_GERACAO) for q in manter)
+    assert repo.geracoes() == esperadas
+    assert sorted(removidas) == sorted(set(q.strftime(FORMATO_GERACAO) for q in diarias + mensais) - set(esperadas))
+
+
+def test_retencao_nunca_remove_a_ultima(tmp_path):
+    repo = criar_geracoes(tmp_path, [datetime(2020, 1, 1, 8)])
+    assert repo.aplicar_retencao(diarios=1, semanais=0, mensais=0, hoje=HOJE) == []
+    assert repo.geracoes() == ["20200101_080000"]
+
+
+# --- Blocos, compressão e leitura ---
+def dados_json(quantos, alterado=None):
+    """JSON compacto como o dos pedidos; `alterado` troca o total de um registro."""
+    registros = [{"numero": 1001 + n, "cliente": f"Cliente {n % 37}", "total": 100.0 if n != alterado else 999.0}
+                 for n in range(quantos)]
+    return json.dumps(registros, separators=(",", ":")).encode("utf-8")
+
+
+def gravar(pasta, nome, dados):
+    caminho = os.path.join(pasta, nome)
+    with open(caminho, "wb") as f:
+        f.write(dados)
+    return caminho
+
+
+def envelhecer_blocos(repo):
+    for raiz, _, nomes in os.walk(repo.pasta_blocos):
+        for nome in nomes:
+            os.utime(os.path.join(raiz, nome), (0, 0))
+
+
+def test_blocos_remontam_o_arquivo_e_resistem_a_insercao():
+    dados = dados_json(20000)
+    blocos = dividir_em_blocos(dados)
+    assert b"".join(blocos) == dados
+    assert len(blocos) > 4 and all(len(b) <= BLOCO_MAX for b in blocos)
+
+    # Um registro a mais no meio só muda os blocos ao redor dele
+    meio = dados.index(b"},", len(dados) // 2) + 2
+    inserido = dados[:meio] + b'{"numero":1,"cliente":"Novo","total":1.0},' + dados[meio:]
+    novos = set(dividir_em_blocos(inserido)) - set(blocos)
+    assert len(novos) <= 2
+
+
+def test_geracao_volta_os_mesmos_bytes_comprimidos(tmp_path):
+    origem = tmp_path / "dados"
+    origem.mkdir()
+    dados = dados_json(20000)
+    repo = RepositorioBackup(tmp_path / "backup")
+    resumo = repo.criar_geracao({"pedidos.json": gravar(origem, "pedidos.json", dados)}, quando=HOJE)
+
+    entrada = repo.ler_manifesto(resumo["geracao"])["arquivos"]["pedidos.json"]
+    assert repo.ler_arquivo(entrada) == dados
+    # Blocos guardados com zlib: texto repetitivo ocupa bem menos que o original
+    for hash_bloco in entrada["blocos"]:
+        with open(repo._caminho_bloco(hash_bloco), "rb") as f:
+            assert hashlib.sha256(zlib.decompress(f.read())).hexdigest() == hash_bloco
+    assert resumo["bytes_novos"] < len(dados) / 4
+
+    repo.extrair(resumo["geracao"], tmp_path / "extraido")
+    assert (tmp_path / "extraido" / "pedidos.json").read_bytes() == dados
+
+
+def test_dados_sem_mudanca_nao_ocupam_espaco_de_novo(tmp_path):
+    origem = tmp_path / "dados"
+    origem.mkdir()
+    caminho = gravar(origem, "pedidos.json", dados_json(20000))
+    repo = RepositorioBackup(tmp_path / "backup")
+    primeira = repo.criar_geracao({"pedidos.json": caminho}, quando=HOJE)
+
+    segunda = repo.criar_geracao({"pedidos.json": caminho}, quando=HOJE)
+    assert segunda["bytes_novos"] == 0 and segunda["blocos_novos"] == 0
+    assert segunda["geracao"] != primeira["geracao"]
+
+    gravar(origem, "pedidos.json", dados_json(20000, alterado=10000))
+    terceira = repo.criar_geracao({"pedidos.json": caminho}, quando=HOJE)
+    assert 1 <= terceira["blocos_novos"] <= 2
+    assert terceira["bytes_novos"] < primeira["bytes_novos"] / 4
+
+
+def test_meses_conhecidos_sao_reaproveitados_sem_ler(tmp_path):
+    origem = tmp_path / "dados"
+    origem.mkdir()
+    nome = "pedidos.json.periodo.2024-01.abcd1234.gz"
+    dados = dados_json(500)
+    caminho = gravar(origem, nome, dados)
+    repo = RepositorioBackup(tmp_path / "backup")
+    primeira = repo.criar_geracao({nome: caminho}, quando=HOJE)
+
+    # Mesmo sha256 no manifesto dos meses: a entrada anterior vale, o arquivo nem é aberto
+    gravar(origem, nome, b"conteudo que nao seria lido")
+    conhecidos = {nome: hashlib.sha256(dados).hexdigest()}
+    segunda = repo.criar_geracao({nome: caminho}, quando=HOJE, conhecidos=conhecidos)
+    assert segunda["reaproveitados"] == 1 and segunda["bytes_lidos"] == 0
+    entrada = repo.ler_manifesto(segunda["geracao"])["arquivos"][nome]
+    assert entrada == repo.ler_manifesto(primeira["geracao"])["arquivos"][nome]
+    assert repo.ler_arquivo(entrada) == dados
+
+
+def test_coleta_mantem_blocos_das_geracoes_que_ficam(tmp_path):
+    origem = tmp_path / "dados"
+    origem.mkdir()
+    caminho = gravar(origem, "pedidos.json", dados_json(20000))
+    repo = RepositorioBackup(tmp_path / "backup")
+    antiga = repo.criar_geracao({"pedidos.json": caminho}, quando=datetime(2024, 6, 1, 8))
+    gravar(origem, "pedidos.json", dados_json(20000, alterado=10000))
+    nova = repo.criar_geracao({"pedidos.json": caminho}, quando=HOJE)
+    blocos_antigos = set(repo.ler_manifesto(antiga["geracao"])["arquivos"]["pedidos.json"]["blocos"])
+    blocos_novos = set(repo.ler_manifesto(nova["geracao"])["arquivos"]["pedidos.json"]["blocos"])
+    assert blocos_antigos & blocos_novos and blocos_antigos - blocos_novos
+
+    os.remove(os.path.join(repo.pasta_geracoes, antiga["geracao"] + ".json"))
+    # Blocos recém-gravados ficam protegidos (podem ser de uma geração em andamento)
+    assert repo.coletar_blocos_orfaos() == 0
+    envelhecer_blocos(repo)
+    assert repo.coletar_blocos_orfaos() == len(blocos_antigos - blocos_novos)
+
+    for hash_bloco in blocos_novos:
+        assert os.path.exists(repo._caminho_bloco(hash_bloco))
+    entrada = repo.ler_manifesto(nova["geracao"])["arquivos"]["pedidos.json"]
+    assert repo.ler_arquivo(entrada) == dados_json(20000, alterado=10000)
@@ -0,0 +1,55 @@
+import pytest
+
+from banco import ArmazemPedidosSQLite, Banco
+from tests.conftest import novo_pedido
+
+
+@pytest.fixture
+def armazem_sqlite(tmp_path):
+    banco = Banco(tmp_path / "perfibras.db")
+    armazem = ArmazemPedidosSQLite(banco)
+    armazem.carregar()
+    yield armazem
+    banco.fechar()
+
+
+def _pedido(data, nome, cpf_cnpj):
+    pedido = novo_pedido(data, nome)
+    pedido["cliente"]["cpf_cnpj"] = cpf_cnpj
+    return pedido
+
+
+def test_filtro_por_data_mes_e_documento_usa_os_indices(armazem_sqlite):
+    a = armazem_sqlite.inserir(_pedido("05/10/2026", "Ana", "123.456.789-00"))
+    b = armazem_sqlite.inserir(_pedido("31/10/2026", "Bruno", "12.345.678/0001-90"))
+    c = armazem_sqlite.inserir(_pedido("01/11/2026", "Ana", "123.456.789-00"))
+    d = armazem_sqlite.inserir(_pedido("05/12/2026", "Carla", "987.654.321-00"))
+
+    assert armazem_sqlite.filtrar("5/10/2026") == [a]
+    assert armazem_sqlite.filtrar("10/2026") == [a, b]
+    assert armazem_sqlite.filtrar("12/2026") == [d]  # dezembro: o fim da faixa vira o ano seguinte
+    assert armazem_sqlite.filtrar("12345678900") == [a, c]
+    assert armazem_sqlite.filtrar("12.345.678/0001-90") == [b]
+    # Texto livre, mês inválido e documento incompleto ficam com o índice em memória
+    assert armazem_sqlite.filtrar("ana") is None
+    assert armazem_sqlite.filtrar("13/2026") is None
+    assert armazem_sqlite.filtrar("123.456") is None
+
+    def plano(filtro, valor):
+        linhas = armazem_sqlite.banco.con.execute(
+            f"EXPLAIN QUERY PLAN SELECT id FROM pedidos WHERE {filtro} ORDER BY posicao", (valor,))
+        return " ".join(l["detail"] for l in linhas)
+
+    assert "ix_pedidos_data" in plano("data_iso = ?", "2026-10-05")
+    assert "ix_pedidos_cliente_documento" in plano("cliente_documento = ?", "12345678900")
+
+
+def test_filtro_ignora_pedido_de_outra_estacao_ainda_nao_sincronizado(armazem_sqlite):
+    outra = ArmazemPedidosSQLite(Banco(armazem_sqlite.banco.caminho))
+    outra.carregar()
+    outra.inserir(_pedido("05/10/2026", "Ana", "123.456.789-00"))
+    outra.banco.fechar()
+
+    assert armazem_sqlite.filtrar("05/10/2026") == []
+    armazem_sqlite.sincronizar()
+    assert [p["cliente"]["nome"] for p in armazem_sqlite.filtrar("05/10/2026")] == ["Ana"]
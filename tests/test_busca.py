@@ -0,0 +1,105 @@
+import copy
+import random
+
+from busca import IndiceBusca, campos_pedido
+from carteira import CarteiraClientes
+from catalogo import CatalogoAcessorios
+
+
+def test_sugestoes_montadas_em_segundo_plano_entram_se_a_lista_nao_mudou():
+    catalogo = CatalogoAcessorios([{"codigo": "TR-01", "nome": "Trilho superior", "peso": 1.2}])
+    montar, versao = catalogo.preparar_sugestoes()
+    assert catalogo.preparar_sugestoes() is None  # já está sendo montado
+    # Enquanto isso: código exato e descrições que começam com o texto
+    assert [i["codigo"] for i in catalogo.sugerir("tr-01")] == ["TR-01"]
+
+    assert catalogo.usar_sugestoes(montar(), versao)
+    assert catalogo.preparar_sugestoes() is None  # já existe
+    catalogo.adicionar({"codigo": "TR-02", "nome": "Trilho inferior", "peso": 1.1})
+    assert [i["codigo"] for i in catalogo.sugerir("trilho inf")] == ["TR-02"]
+
+
+def test_indice_montado_sobre_lista_que_mudou_e_descartado():
+    carteira = CarteiraClientes([{"nome": "Ana Souza", "cpf_cnpj": "123.456.789-00"}])
+    montar, versao = carteira.preparar_filtro()
+    carteira.adicionar({"nome": "Bruno Souza", "cpf_cnpj": "987.654.321-00"})
+
+    assert not carteira.usar_filtro(montar(), versao)
+    # Sem o índice descartado, o filtro monta o dele com a lista atual
+    assert [c["nome"] for c in carteira.filtrar("souza")] == ["Ana Souza", "Bruno Souza"]
+
+    montar, versao = carteira.preparar_sugestoes()
+    assert carteira.usar_sugestoes(montar(), versao)
+    assert carteira.sugerir("bruno")[0]["nome"] == "Bruno Souza"
+
+
+def _nomes(resultado):
+    return None if resultado is None else [p["cliente"]["nome"] for p in resultado]
+
+
+def _indice_pedidos(*nomes):
+    pedidos = [{"numero": 1000 + i, "data": "05/10/2026", "cliente": {"nome": nome}} for i, nome in enumerate(nomes)]
+    indice = IndiceBusca(campos_pedido)
+    indice.construir(pedidos)
+    return indice, pedidos
+
+
+def _copia(indice):
+    """Mesmo índice sem o resultado da última consulta: a busca parte do zero."""
+    copia = copy.copy(indice)
+    copia.esquecer_ultima()
+    return copia
+
+
+def test_busca_que_restringe_amplia_ou_apaga_letras_bate_com_a_busca_do_zero():
+    indice, _ = _indice_pedidos("Ana Souza", "Ana Lima", "Anabela Costa", "Bruno Souza")
+    sequencia = ["a", "an", "ana", "ana s", "ana so", "ana souza", "ana so", "ana", "anab", "ana", "souza", "souza b", ""]
+    for texto in sequencia:
+        esperado = _nomes(_copia(indice).buscar(texto))
+        assert _nomes(indice.buscar(texto)) == esperado, texto
+    assert _nomes(indice.buscar("ana s")) == ["Ana Souza"]
+    assert _nomes(indice.buscar("ana")) == ["Ana Souza", "Ana Lima", "Anabela Costa"]
+    assert indice.buscar("") is None
+
+
+def test_busca_nao_devolve_resultado_guardado_depois_de_alterar_o_indice():
+    indice, pedidos = _indice_pedidos("Ana Souza", "Bruno Souza")
+    assert _nomes(indice.buscar("souza")) == ["Ana Souza", "Bruno Souza"]
+
+    novo = {"numero": 2000, "data": "06/10/2026", "cliente": {"nome": "Carla Souza"}}
+    indice.adicionar(novo)
+    assert _nomes(indice.buscar("souza")) == ["Ana Souza", "Bruno Souza", "Carla Souza"]
+    # A consulta seguinte só restringe a anterior: parte do resultado já atualizado
+    assert _nomes(indice.buscar("souza c")) == ["Carla Souza"]
+
+    indice.remover(pedidos[0])
+    assert _nomes(indice.buscar("souza")) == ["Bruno Souza", "Carla Souza"]
+
+    pedidos[1]["cliente"] = {"nome": "Bruno Lima"}
+    indice.atualizar(pedidos[1])
+    assert _nomes(indice.buscar("souza")) == ["Carla Souza"]
+    assert _nomes(indice.buscar("lima")) == ["Bruno Lima"]
+
+    outro = {"numero": 2001, "data": "07/10/2026", "cliente": {"nome": "Carla Souza Lima"}}
+    indice.substituir(novo, outro)
+    assert _nomes(indice.buscar("lima")) == ["Bruno Lima", "Carla Souza Lima"]
+
+
+def test_busca_incremental_bate_com_a_busca_do_zero_em_sequencias_aleatorias():
+    sorteio = random.Random(7)
+    nomes = ["Ana", "Anabela", "Bruno", "Beatriz", "Carla", "Carlos", "Souza", "Santos", "Silva", "Lima"]
+    indice, pedidos = _indice_pedidos(*(" ".join(sorteio.sample(nomes, 2)) for _ in range(200)))
+    texto = ""
+    for _ in range(500):
+        acao = sorteio.random()
+        if acao < 0.5:
+            texto += sorteio.choice("abcilnorstuvz ")
+        elif acao < 0.8:
+            texto = texto[:-sorteio.randint(1, 3)]
+        elif acao < 0.9:
+            pedido = sorteio.choice(pedidos)
+            pedido["cliente"] = {"nome": " ".join(sorteio.sample(nomes, 2))}
+            indice.atualizar(pedido)
+        else:
+            texto = sorteio.choice(nomes)[:sorteio.randint(1, 4)].lower()
+        assert _nomes(indice.buscar(texto)) == _nomes(_copia(indice).buscar(texto)), texto
@@ -0,0 +1,74 @@
+import json
+
+from carteira import CarteiraClientes, chave_cliente, id_cliente_migrado
+from persistencia import ArmazemPedidos, ArquivoVersionado
+
+CADASTRO = {"nome": "Ana Souza", "cpf_cnpj": "123.456.789-00", "email": "ana@exemplo.com",
+            "telefone": "(62) 3333-0000", "endereco": "Rua 1", "numero": "10", "bairro": "Centro",
+            "cidade": "Goiânia", "estado": "GO", "ie": ""}
+
+
+def abrir_carteira(arquivo):
+    arquivo = ArquivoVersionado(arquivo, chave_cliente)
+    return CarteiraClientes(arquivo.carregar(), arquivo)
+
+
+def test_pedido_do_formato_2_carrega_so_a_referencia_do_cliente(tmp_path):
+    arquivo = tmp_path / "pedidos.json"
+    pedidos = [{"id": f"p{n}", "numero": 1001 + n, "data": "05/10/2024", "cliente": dict(CADASTRO),
+                "itens": [{"codigo": "P1", "qtd": 1, "subtotal": 90.0}], "total": 90.0} for n in range(3)]
+    arquivo.write_text(json.dumps({"formato": 2, "geracao": 0, "pedidos": pedidos}), encoding="utf-8")
+
+    armazem = ArmazemPedidos(arquivo)
+    armazem.carregar()
+    armazem.fechar()  # espera a compactação que grava a foto enxuta
+    referencia = {"id": id_cliente_migrado("12345678900"), "nome": "Ana Souza", "cpf_cnpj": "123.456.789-00",
+                  "cidade": "Goiânia", "estado": "GO", "telefone": "(62) 3333-0000"}
+    assert [p["cliente"] for p in armazem.pedidos] == [referencia] * 3
+    # Um dict só para os três pedidos do mesmo cliente
+    assert len({id(p["cliente"]) for p in armazem.pedidos}) == 1
+
+    nova = ArmazemPedidos(arquivo)
+    nova.carregar()
+    foto = json.loads(arquivo.read_text(encoding="utf-8"))
+    assert foto["formato"] == 5 and [p["cliente"] for p in foto["pedidos"]] == [referencia] * 3
+    assert [nova.itens(p)[0]["codigo"] for p in nova.pedidos] == ["P1"] * 3
+    nova.fechar()
+
+
+def test_duas_estacoes_migrando_chegam_aos_mesmos_ids(tmp_path):
+    arquivo = tmp_path / "clientes.json"
+    antigos = [dict(CADASTRO), {"nome": "Bruno Lima", "cpf_cnpj": ""},
+               dict(CADASTRO, nome="Ana S."), {"nome": "Carla", "cpf_cnpj": "98765432100"}]
+    arquivo.write_text(json.dumps(antigos), encoding="utf-8")
+    estacoes = [abrir_carteira(arquivo) for _ in range(2)]
+
+    assert [e.migrar_ids() for e in estacoes] == [4, 4]  # a segunda grava por cima do merge
+    gravados = abrir_carteira(arquivo).itens
+    assert len(gravados) == 4
+    assert [c["id"] for c in gravados] == [c["id"] for c in estacoes[0].itens] == [c["id"] for c in estacoes[1].itens]
+    assert [c["id"] for c in gravados] == [id_cliente_migrado("12345678900"), id_cliente_migrado("Bruno Lima"),
+                                           id_cliente_migrado("12345678900", 1), id_cliente_migrado("98765432100")]
+    assert abrir_carteira(arquivo).migrar_ids() == 0
+
+
+def test_editar_nome_ou_documento_mantem_os_pedidos_ligados_ao_cliente(tmp_path):
+    arquivo = tmp_path / "clientes.json"
+    arquivo.write_text(json.dumps([dict(CADASTRO)]), encoding="utf-8")
+    carteira = abrir_carteira(arquivo)
+    carteira.migrar_ids()
+    # Pedido antigo (cadastro inteiro, sem id) e pedido novo (referência com o id)
+    armazem = ArmazemPedidos(tmp_path / "pedidos.json")
+    armazem.carregar()
+    antigo = armazem.inserir({"data": "05/10/2024", "cliente": dict(CADASTRO), "itens": [], "total": 0})
+    novo = armazem.inserir({"data": "06/10/2024", "cliente": carteira.itens[0], "itens": [], "total": 0})
+
+    carteira.atualizar(0, dict(carteira.itens[0], nome="Ana Souza Lima", cpf_cnpj="111.222.333-44"))
+    carteira.salvar()
+
+    cliente = abrir_carteira(arquivo).itens[0]
+    assert (cliente["nome"], cliente["cpf_cnpj"]) == ("Ana Souza Lima", "111.222.333-44")
+    for pedido in (antigo, novo):
+        assert carteira.obter_por_id(pedido["cliente"]["id"]) is carteira.itens[0]
+        assert pedido["cliente"]["nome"] == "Ana Souza"  # a proposta continua com os dados da época
+    armazem.fechar()
@@ -0,0 +1,91 @@
+import os
+import threading
+
+from persistencia import ArmazemPedidos, arquivos_de_itens
+from tests.conftest import novo_pedido
+
+
+def numeros(pedidos):
+    return sorted(p["numero"] for p in pedidos)
+
+
+def inserir_em_paralelo(estacoes, quantos):
+    """Cada estação (um ArmazemPedidos no mesmo arquivo) insere `quantos` pedidos na sua thread."""
+    erros = []
+
+    def inserir(estacao, n):
+        try:
+            for i in range(quantos):
+                estacao.inserir(novo_pedido(cliente=f"E{n}-{i}"))
+        except Exception as e:  # a thread não levanta para o teste
+            erros.append(e)
+
+    threads = [threading.Thread(target=inserir, args=(e, n)) for n, e in enumerate(estacoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erros
+
+
+def abrir(arquivo, **kwargs):
+    estacao = ArmazemPedidos(arquivo, **kwargs)
+    estacao.carregar()
+    return estacao
+
+
+def test_insercoes_simultaneas_tem_numeros_unicos(armazem):
+    outra = abrir(armazem.arquivo)
+    inserir_em_paralelo([armazem, outra], 40)
+
+    esperado = list(range(1001, 1081))
+    for estacao in (armazem, outra):
+        estacao.sincronizar()
+        assert numeros(estacao.pedidos) == esperado
+    nova = abrir(armazem.arquivo)
+    assert numeros(nova.pedidos) == esperado
+    assert nova.proximo_numero() == 1081
+    for estacao in (outra, nova):
+        estacao.fechar()
+
+
+def test_compactacao_durante_gravacao(tmp_path):
+    # Diário pequeno: as duas estações compactam várias vezes enquanto a outra grava
+    arquivo = tmp_path / "pedidos.json"
+    estacoes = [abrir(arquivo, limite_diario=4000) for _ in range(2)]
+    inserir_em_paralelo(estacoes, 60)
+    for estacao in estacoes:
+        estacao.fechar()
+
+    assert len([n for n in os.listdir(tmp_path) if ".diario." in n]) < 60
+    nova = abrir(arquivo)
+    assert numeros(nova.pedidos) == list(range(1001, 1121))
+    assert {p["cliente"]["nome"] for p in nova.pedidos} == {f"E{n}-{i}" for n in range(2) for i in range(60)}
+    assert all(nova.itens(p)[0]["codigo"] == "P1" for p in nova.pedidos)
+    nova.fechar()
+
+
+def test_compactacao_reescreve_arquivo_de_itens(tmp_path):
+    arquivo = tmp_path / "pedidos.json"
+    armazem = abrir(arquivo, limite_diario=1000)
+    for i in range(20):
+        armazem.inserir(novo_pedido(cliente=f"C{i}"))
+    armazem.compactar(aguardar=True)
+    for rodada in range(5):
+        for pedido in list(armazem.pedidos):
+            dados = armazem.completo(pedido)
+            dados["itens"] = dados["itens"] + [{"codigo": f"R{rodada}", "qtd": 1}]
+            armazem.atualizar(pedido["id"], dados, pedido["rev"])
+        armazem.compactar(aguardar=True)
+        armazem.sincronizar()
+
+    em_uso = [os.path.getsize(c) for c in arquivos_de_itens(arquivo) if c == armazem.arquivo_itens]
+    usados = sum(p["itens_pos"][1] for p in armazem.pedidos if "itens_pos" in p)
+    assert em_uso and em_uso[0] <= 2 * max(usados, 1000)
+    assert len(arquivos_de_itens(arquivo)) <= 2
+
+    nova = abrir(arquivo)
+    for pedido in armazem.pedidos:
+        assert [i["codigo"] for i in nova.itens(nova.obter(pedido["id"]))] == ["P1", "R0", "R1", "R2", "R3", "R4"]
+    nova.fechar()
+    armazem.fechar()
@@ -0,0 +1,67 @@
+import math
+import random
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+from modelos import ModeloItensPedido
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def item(peso_unit, qtd, preco_kg=45.3):
+    return {"codigo": "P1", "nome": "Perfil", "peso_unit": peso_unit, "qtd": qtd,
+            "peso_total": peso_unit * qtd, "subtotal": peso_unit * qtd * preco_kg, "preco_kg_na_epoca": preco_kg}
+
+
+def conferir(modelo, emitidos):
+    valor = math.fsum(i["subtotal"] for i in modelo.itens)
+    peso = math.fsum(i["peso_total"] for i in modelo.itens)
+    assert modelo.totais() == (valor, peso)
+    assert modelo.total_valor == pytest.approx(valor, abs=1e-6)
+    assert modelo.total_peso == pytest.approx(peso, abs=1e-6)
+    assert emitidos[-1] == (modelo.total_valor, modelo.total_peso)
+
+
+def test_totais_mantidos_batem_com_a_soma_da_lista(app):
+    modelo = ModeloItensPedido()
+    emitidos = []
+    modelo.totais_alterados.connect(lambda valor, peso: emitidos.append((valor, peso)))
+    sorteio = random.Random(13)
+    for _ in range(2000):
+        acao = sorteio.random()
+        if acao < 0.5 or not modelo.itens:
+            modelo.adicionar(item(sorteio.choice([0.1, 0.333, 1.27, 2.5]), sorteio.randint(1, 40)))
+        elif acao < 0.75:
+            modelo.remover(sorteio.randrange(len(modelo.itens)))
+        else:
+            qtd = sorteio.choice(["0", "3", "7,5", "12"])
+            assert modelo.setData(modelo.index(sorteio.randrange(len(modelo.itens)), modelo.COL_QTD), qtd)
+        conferir(modelo, emitidos)
+
+
+def test_editar_quantidade_e_remover_a_ultima_linha(app):
+    modelo = ModeloItensPedido()
+    emitidos = []
+    modelo.totais_alterados.connect(lambda valor, peso: emitidos.append((valor, peso)))
+    modelo.adicionar(item(1.5, 10))
+    modelo.adicionar(item(0.1, 3))
+
+    qtd = modelo.index(0, modelo.COL_QTD)
+    assert modelo.setData(qtd, "4")
+    assert modelo.itens[0]["peso_total"] == 6.0
+    assert modelo.setData(qtd, "0")
+    assert modelo.itens[0]["subtotal"] == 0.0 and modelo.rowCount() == 2
+    conferir(modelo, emitidos)
+    # Quantidade inválida ou outra coluna: nada muda
+    for indice, valor in ((qtd, "abc"), (qtd, "-1"), (qtd, "nan"), (modelo.index(0, 1), "Outro")):
+        assert not modelo.setData(indice, valor)
+    assert modelo.itens[0]["qtd"] == 0.0 and modelo.itens[0]["nome"] == "Perfil"
+
+    modelo.remover(1)
+    modelo.remover(0)
+    assert (modelo.total_valor, modelo.total_peso) == (0.0, 0.0) == modelo.totais()
+    assert emitidos[-1] == (0.0, 0.0)
@@ -0,0 +1,109 @@
+import glob
+import os
+import shutil
+import threading
+from datetime import date
+
+import pytest
+
+from config import ARQUIVO_PEDIDOS
+from persistencia import ArmazemPedidos
+from tests.conftest import novo_pedido
+
+
+def abrir(arquivo):
+    estacao = ArmazemPedidos(arquivo)
+    estacao.carregar()
+    return estacao
+
+
+def test_duas_estacoes_nunca_dao_o_mesmo_numero(armazem):
+    outra = abrir(armazem.arquivo)
+    dados = {id(armazem): [], id(outra): []}  # números recebidos por estação
+    largada = threading.Barrier(2)
+
+    def inserir(estacao):
+        largada.wait()
+        for i in range(30):
+            dados[id(estacao)].append(estacao.inserir(novo_pedido(cliente=f"C{i}"))["numero"])
+            if i % 10 == 9:
+                # Excluir o último dado não devolve o número para a sequência
+                ultimo = estacao.por_numero(dados[id(estacao)][-1])
+                estacao.remover(ultimo["id"], ultimo["rev"])
+
+    threads = [threading.Thread(target=inserir, args=(e,)) for e in (armazem, outra)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sorted(dados[id(armazem)] + dados[id(outra)]) == list(range(1001, 1061))
+    assert armazem.proximo_numero() == outra.proximo_numero() == 1061
+    outra.fechar()
+
+
+def test_ultimo_numero_sobrevive_a_compactacao(armazem):
+    for _ in range(3):
+        armazem.inserir(novo_pedido())
+    ultimo = armazem.por_numero(1003)
+    armazem.remover(ultimo["id"], ultimo["rev"])
+    armazem.compactar(aguardar=True)
+
+    nova = abrir(armazem.arquivo)
+    assert nova.proximo_numero() == 1004
+    assert nova.inserir(novo_pedido())["numero"] == 1004
+    nova.fechar()
+
+
+@pytest.fixture
+def dados_limpos():
+    """Pasta de dados do config.py sem pedidos (a restauração trabalha nela)."""
+    def limpar():
+        for caminho in glob.glob(f"{ARQUIVO_PEDIDOS}*") + glob.glob(os.path.join(os.path.dirname(ARQUIVO_PEDIDOS),
+                                                                                 "restaura*")):
+            if os.path.isdir(caminho):
+                shutil.rmtree(caminho)
+            else:
+                os.remove(caminho)
+    limpar()
+    yield
+    limpar()
+
+
+def test_ultimo_numero_sobrevive_a_restauracao(tmp_path, dados_limpos):
+    from restauracao import aplicar_restauracao, preparar_restauracao
+
+    armazem = abrir(ARQUIVO_PEDIDOS)
+    for _ in range(3):
+        armazem.inserir(novo_pedido())
+    armazem.compactar(aguardar=True)
+    backup = tmp_path / "backup"
+    backup.mkdir()
+    for caminho in glob.glob(f"{ARQUIVO_PEDIDOS}*"):
+        shutil.copy(caminho, backup)
+    for _ in range(2):
+        armazem.inserir(novo_pedido())  # 1004 e 1005: dados depois do backup
+
+    aplicar_restauracao(preparar_restauracao(str(backup)), armazem)
+
+    assert sorted(p["numero"] for p in armazem.pedidos) == [1001, 1002, 1003]
+    # Os números dados depois do backup continuam usados
+    assert armazem.inserir(novo_pedido())["numero"] == 1006
+    nova = abrir(ARQUIVO_PEDIDOS)
+    assert nova.proximo_numero() == 1007
+    for estacao in (armazem, nova):
+        estacao.fechar()
+
+
+def test_numero_de_mes_fechado_e_localizado_por_outra_estacao(armazem):
+    for data in ("05/01/2024", "20/01/2024", "03/02/2024", "10/06/2024"):
+        armazem.inserir(novo_pedido(data))
+    assert sorted(armazem.arquivar_periodos(date(2024, 6, 15))) == ["2024-01", "2024-02"]
+
+    outra = abrir(armazem.arquivo)
+    assert outra.por_numero(1003) is None  # fora da lista aberta
+    assert outra.localizar_numero(1003)["data"] == "03/02/2024"
+    assert outra.localizar_numero("1002")["data"] == "20/01/2024"
+    assert outra.localizar_numero(1004)["data"] == "10/06/2024"
+    assert outra.localizar_numero(1005) is None
+    outra.fechar()
@@ -0,0 +1,87 @@
+import os
+from datetime import date
+
+import pytest
+
+from persistencia import ArmazemPedidos
+from tests.conftest import novo_pedido
+
+HOJE = date(2024, 6, 15)
+
+
+def numeros(pedidos):
+    return sorted(p["numero"] for p in pedidos)
+
+
+def test_arquivar_tira_da_lista_aberta(armazem):
+    for dia in (5, 6, 7):
+        armazem.inserir(novo_pedido(f"{dia:02d}/01/2024"))
+    armazem.inserir(novo_pedido("01/06/2024"))
+    assert list(armazem.arquivar_periodos(HOJE)) == ["2024-01"]
+    assert numeros(armazem.pedidos) == [1004]
+    assert numeros(armazem.pedidos_fechados()) == [1001, 1002, 1003]
+    assert armazem.localizar_numero(1002)["itens"][0]["codigo"] == "P1"
+
+    outra = ArmazemPedidos(armazem.arquivo)
+    outra.carregar()
+    assert numeros(outra.pedidos) == [1004]
+    assert outra.quantidade_fechados() == 3
+    outra.fechar()
+
+
+def test_excluido_durante_o_arquivamento_nao_volta(armazem):
+    for dia in (5, 6, 7):
+        armazem.inserir(novo_pedido(f"{dia:02d}/01/2024"))
+    gravados = armazem.gravar_periodos(armazem.selecionar_para_arquivar(HOJE))
+    excluido = armazem.por_numero(1001)
+    armazem.remover(excluido["id"], excluido["rev"])
+    armazem.concluir_arquivamento(gravados)
+
+    assert numeros(armazem.pedidos_fechados()) == [1002, 1003]
+    assert armazem.quantidade_fechados() == 2
+    assert armazem.localizar_numero(1001) is None
+
+    outra = ArmazemPedidos(armazem.arquivo)
+    outra.carregar()
+    assert numeros(outra.pedidos_fechados()) == [1002, 1003]
+    outra.fechar()
+
+
+def test_alterado_durante_o_arquivamento_fica_aberto(armazem):
+    for dia in (5, 6):
+        armazem.inserir(novo_pedido(f"{dia:02d}/01/2024"))
+    gravados = armazem.gravar_periodos(armazem.selecionar_para_arquivar(HOJE))
+    alterado = armazem.por_numero(1001)
+    armazem.atualizar(alterado["id"], {"total": 50.0}, alterado["rev"])
+    armazem.concluir_arquivamento(gravados)
+
+    assert numeros(armazem.pedidos) == [1001]
+    assert numeros(armazem.pedidos_fechados()) == [1002]
+
+    # Excluído depois, enquanto aberto: a cópia antiga do arquivo do mês não reaparece
+    alterado = armazem.por_numero(1001)
+    armazem.remover(alterado["id"], alterado["rev"])
+    assert numeros(armazem.pedidos_fechados()) == [1002]
+
+    # Regravar o mês descarta de vez os escondidos
+    armazem.inserir(novo_pedido("20/01/2024"))
+    armazem.arquivar_periodos(HOJE)
+    entrada = armazem.periodos.entradas["2024-01"]
+    assert "excluidos" not in entrada and entrada["pedidos"] == 2
+    assert numeros(armazem.pedidos_fechados()) == [1002, 1003]
+
+
+def test_gravar_periodos_nao_recarrega_o_armazem(armazem):
+    # Fora da thread da interface: arquivo de itens sumido vira erro, sem recarregar a lista
+    for dia in (5, 6):
+        armazem.inserir(novo_pedido(f"{dia:02d}/01/2024"))
+    armazem.compactar(aguardar=True)
+    selecao = armazem.selecionar_para_arquivar(HOJE)
+    arquivo_itens = armazem.arquivo_itens
+    os.remove(arquivo_itens)
+    avisos, lista = [], armazem.pedidos
+    armazem.ao_aplicar = lambda op, pedido: avisos.append(op)
+
+    with pytest.raises(FileNotFoundError):
+        armazem.gravar_periodos(selecao, arquivo_itens=arquivo_itens)
+    assert avisos == [] and armazem.pedidos is lista and numeros(lista) == [1001, 1002]
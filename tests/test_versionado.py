@@ -0,0 +1,55 @@
+import pytest
+
+from persistencia import ArquivoVersionado, ConflitoDeVersao
+
+
+def abrir(arquivo):
+    lista = ArquivoVersionado(arquivo, lambda r: r["codigo"])
+    return lista, lista.carregar()
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    arquivo = tmp_path / "acessorios.json"
+    lista, _ = abrir(arquivo)
+    lista.salvar([{"codigo": "A", "preco": 1}, {"codigo": "B", "preco": 2}, {"codigo": "C", "preco": 3}])
+    return arquivo
+
+
+def test_alteracoes_em_registros_diferentes_sao_mescladas(arquivo):
+    janela1, dados1 = abrir(arquivo)
+    janela2, dados2 = abrir(arquivo)
+    dados1[0]["preco"] = 10
+    janela1.salvar(dados1)
+    dados2[1]["preco"] = 20
+    dados2.append({"codigo": "D", "preco": 4})
+    gravados = janela2.salvar(dados2)
+
+    assert [(r["codigo"], r["preco"]) for r in gravados] == [("A", 10), ("B", 20), ("C", 3), ("D", 4)]
+    assert abrir(arquivo)[1] == gravados
+
+
+def test_mesmo_registro_alterado_nos_dois_lados_e_conflito(arquivo):
+    janela1, dados1 = abrir(arquivo)
+    janela2, dados2 = abrir(arquivo)
+    dados1[0]["preco"] = 10
+    janela1.salvar(dados1)
+    dados2[0]["preco"] = 11
+    with pytest.raises(ConflitoDeVersao):
+        janela2.salvar(dados2)
+    assert abrir(arquivo)[1][0]["preco"] == 10
+
+
+def test_excluido_aqui_e_alterado_la_e_conflito(arquivo):
+    janela1, dados1 = abrir(arquivo)
+    janela2, dados2 = abrir(arquivo)
+    dados1[2]["preco"] = 30
+    janela1.salvar(dados1)
+    with pytest.raises(ConflitoDeVersao):
+        janela2.salvar(dados2[:2])
+
+    # Sem alteração do outro lado no registro excluído, a exclusão vale e o resto é mesclado
+    janela3, dados3 = abrir(arquivo)
+    janela1.salvar([dict(r, preco=r["preco"] + 1) if r["codigo"] == "A" else r for r in dados1])
+    gravados = janela3.salvar(dados3[:2])
+    assert [(r["codigo"], r["preco"]) for r in gravados] == [("A", 2), ("B", 2)]